@@ -0,0 +1,35 @@
+import logging
+import jets
+
+# Micro-benchmark of the per-step parton work done in timekeeper.time_loop:
+# one propagation, the momentum kicks, and the p_T / beta / angle lookups.
+# Run as "python bench_parton.py [baseline_jets.py]" to compare jets.parton against another parton implementation,
+# e.g. an older jets.py checked out with "git show <rev>:jets.py > baseline_jets.py".
+def bench_step(parton_class, steps=100000):
+    import time
+    part = parton_class(x_0=0.1, y_0=-0.2, phi_0=1.0, p_T0=50, part='u')
+    start = time.perf_counter()
+    for i in range(steps):
+        part.prop(tau=0.1)
+        for j in range(4):
+            part.add_q_par(q_par=-1e-4)
+        for j in range(3):
+            part.add_q_perp(q_perp=1e-5)
+        part.p_T()
+        part.beta()
+        part.polar_mom_coords()
+    return (time.perf_counter() - start) / steps
+
+
+if __name__ == '__main__':
+    import sys
+    import importlib.util
+    logging.disable(logging.INFO)
+    per_step = bench_step(jets.parton)
+    print('jets.parton: {:.3f} us / step'.format(per_step * 1e6))
+    if len(sys.argv) > 1:
+        spec = importlib.util.spec_from_file_location('jets_baseline', sys.argv[1])
+        baseline = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(baseline)
+        base_step = bench_step(baseline.parton)
+        print('baseline parton: {:.3f} us / step ({:.1f}x slower)'.format(base_step * 1e6, base_step / per_step))
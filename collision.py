@@ -9,6 +9,9 @@ except:
 import h5py
 import math
 import os
+import shutil
+import tempfile
+import multiprocessing
 import logging
 import utilities
 import config
@@ -674,6 +677,83 @@ def generate_event(grid_max_target=config.transport.GRID_MAX_TARGET, grid_step=c
         return event_dataframe, results
 
 
+# Function run by the event_pipeline background process to generate events ahead of their use
+# Each event is generated in a new directory under location. Puts (event number, directory, event dataframe,
+# observables, error) on the queue for each event from first_event on, and None once num_events (if nonzero) events
+# are done. Waits for a free slot before starting each event. Stops after the first failed event.
+def produce_events(queue, slots, run_seed, num_events, location, first_event=0):
+    event_no = first_event
+    while num_events == 0 or event_no < num_events:
+        slots.acquire()
+        event_dir = tempfile.mkdtemp(prefix='JMA_', dir=location)
+        os.chdir(event_dir)
+        logging.info('Pipeline generating event {} in {}'.format(event_no, event_dir))
+        event_seed = utilities.stream_seed(run_seed, event_no, high=10000000000000000)
+        try:
+            event_dataframe, event_observables = generate_event(working_dir=None, seed=event_seed)
+        except Exception as error:
+            queue.put((event_no, event_dir, None, None, error))
+            return
+        queue.put((event_no, event_dir, event_dataframe, event_observables, None))
+        event_no += 1
+    queue.put(None)
+
+
+# Class to run generate_event for upcoming events in a background process while the current event is in use
+# Events are seeded from run_seed by event number, as in the serial event loop, starting from first_event. At most
+# depth events are generated ahead of the one in use, counting the one being generated, so depth 1 already overlaps
+# generating the next event with using the current one. The event in use holds its slot until released by done()
+# once its files are cleaned up. next() returns (event number, directory, event dataframe, observables), re-raises
+# the producer's errors, and raises StopIteration after the last event. Event directories are made in a 'pipeline'
+# directory under location, and are deleted by close(). Those left by a run killed before closing its pipeline are
+# deleted when a later pipeline there is closed.
+class event_pipeline():
+    # Instantiation statement
+    def __init__(self, run_seed, num_events=0, depth=2, location=None, first_event=0):
+        if depth < 1:
+            raise ValueError('Event pipeline depth must be at least 1, not {}'.format(depth))
+        context = multiprocessing.get_context('fork')
+        if location is None:
+            location = os.getcwd()
+        self.location = os.path.join(location, 'pipeline')
+        os.makedirs(self.location, exist_ok=True)
+        self.slots = context.Semaphore(depth + 1)
+        self.queue = context.Queue()
+        self.process = context.Process(target=produce_events, daemon=True,
+                                       args=(self.queue, self.slots, run_seed, num_events, self.location,
+                                             first_event))
+        self.process.start()
+        logging.info('Started event pipeline, depth {}, in {}'.format(depth, self.location))
+
+    # Method to wait for and return the next generated event
+    def next(self):
+        item = self.queue.get()
+        if item is None:
+            raise StopIteration
+        event_no, event_dir, event_dataframe, event_observables, error = item
+        if error is not None:
+            raise error
+        return event_no, event_dir, event_dataframe, event_observables
+
+    # Method to release the slot of an event that is finished with
+    def done(self):
+        self.slots.release()
+
+    # Method to stop the background process and delete all event directories it made
+    # Directories in keep -- e.g. that of an interrupted event checkpointed for resuming -- are left in place.
+    def close(self, keep=()):
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        keep = [os.path.realpath(event_dir) for event_dir in keep]
+        for entry in os.listdir(self.location):
+            event_dir = os.path.join(self.location, entry)
+            if os.path.realpath(event_dir) not in keep:
+                shutil.rmtree(event_dir, ignore_errors=True)
+        if not os.listdir(self.location):
+            os.rmdir(self.location)
+
+
 # Function that defines a normalized 2D PDF array for a given interpolated temperature
 # function's 0.5 fs (or given) timestep.
 def jetprodPDF(temp_func, resolution=100, plot=False, initialTime=0.5):
@@ -786,7 +866,7 @@ def jetProdPDF_Function(temp_func, resolution=100, plot=False, initialTime=0.5):
 
 # Function to rejection sample a given interpolated temperature function^6 for jet production.
 # Returns an accepted (x, y) sample point as a numpy array.
-def temp_6th_sample(event, maxAttempts=5, time='i', batch=1000):
+def temp_6th_sample(event, maxAttempts=5, time='i', batch=1000, rng=None):
     # Get temperature function
     temp_func = event.temp
 
@@ -811,7 +891,7 @@ def temp_6th_sample(event, maxAttempts=5, time='i', batch=1000):
     while attempt < maxAttempts:
         # Generate random point in 3D box of l = w = gridWidth and height maximum temp.^6
         # Origin at center of bottom of box
-        pointArray = cube_random(num = batch, boxSize=gridWidth, maxProb=maxTemp ** 6)
+        pointArray = cube_random(num = batch, boxSize=gridWidth, maxProb=maxTemp ** 6, rng=rng)
 
         for point in pointArray:
             targetTemp = temp_func(np.array([time, point[0], point[1]]))**6
@@ -833,10 +913,10 @@ def temp_6th_sample(event, maxAttempts=5, time='i', batch=1000):
 
 # Function to generate a given number of jet production points
 # sampled from the temperature^6 profile.
-def generate_jet_seed_point(event, num=1):
+def generate_jet_seed_point(event, num=1, rng=None):
     pointArray = np.array([])
     for i in np.arange(0, num):
-        newPoint = temp_6th_sample(event)
+        newPoint = temp_6th_sample(event, rng=rng)
         if i == 0:
             pointArray = newPoint
         else:
@@ -19,6 +19,7 @@ with open(project_path + '/config.yml', 'r') as ymlfile:
 class EBE:
     NUM_EVENTS = int(cfg['mode']['NUM_EVENTS'])
     NUM_SAMPLES = int(cfg['mode']['NUM_SAMPLES'])
+    WORKERS = int(cfg['mode']['WORKERS'])
 
 
 # Mode configuration
@@ -26,6 +27,13 @@ class mode:
     VARY_POINT = bool(cfg['mode']['VARY_POINT'])
     KEEP_EVENT = bool(cfg['mode']['KEEP_EVENT'])
     KEEP_RECORD = bool(cfg['mode']['KEEP_RECORD'])
+    CASE_BATCH = bool(cfg['mode']['CASE_BATCH'])
+    CHECKPOINT = bool(cfg['mode']['CHECKPOINT'])
+    PIPELINE_DEPTH = int(cfg['mode']['PIPELINE_DEPTH'])
+    try:
+        SEED = int(cfg['mode']['SEED'])
+    except (ValueError, TypeError):
+        SEED = None
 
 
 class transport:
@@ -69,9 +77,16 @@ class transport:
 class jet:
     PTHATMIN = float(cfg['jet']['PTHATMIN'])
     PTHATMAX = float(cfg['jet']['PTHATMAX'])
+    if cfg['jet']['SCATTERING_BANK'] in (None, 'None'):
+        SCATTERING_BANK = None
+    else:
+        # Relative paths are taken from the project directory, as jobs run in temporary directories
+        SCATTERING_BANK = os.path.join(project_path, str(cfg['jet']['SCATTERING_BANK']))
     DTAU = float(cfg['jet']['DTAU'])
+    PATH_INTEGRAL = str(cfg['jet']['PATH_INTEGRAL'])
     T_HRG = float(cfg['jet']['T_HRG'])
     T_UNHYDRO = float(cfg['jet']['T_UNHYDRO'])
+    PHASE_ROOTS = bool(cfg['jet']['PHASE_ROOTS'])
     K_F_DRIFT = float(cfg['jet']['K_F_DRIFT'])
     K_FG_DRIFT = float(cfg['jet']['K_FG_DRIFT'])
     K_BBMG = 1  #float(cfg['jet']['K_BBMG'])
@@ -1,4 +1,6 @@
 import os
+import glob
+import multiprocessing
 import numpy as np
 import pandas as pd
 import logging
@@ -9,40 +11,52 @@ import config
 import utilities
 from utilities import tempDir
 import timekeeper
-import pythia
+import scattering_bank
 import fragmentation
 import traceback
+try:
+    import pythia
+except ImportError:
+    logging.warning('pythia not found -- hard scatterings must come from a scattering bank.')
 
 lund_string = False
 
-# Function to downcast datatypes to minimum memory size for each column
-def downcast_numerics(df, verbose=True):
-    numerics = ['int16', 'int32', 'int64', 'float16', 'float32', 'float64']
-    start_mem = df.memory_usage(deep=True).sum() / 1024**2
-    for col in df.columns:
-        col_type = df[col].dtypes
-        if col_type in numerics:
-            c_min = df[col].min()
-            c_max = df[col].max()
-            if str(col_type)[:3] == 'int':  # for integers
-                if c_min > np.iinfo(np.int8).min and c_max < np.iinfo(np.int8).max:
-                    df[col] = df[col].astype(np.int8)
-                elif c_min > np.iinfo(np.int16).min and c_max < np.iinfo(np.int16).max:
-                    df[col] = df[col].astype(np.int16)
-                elif c_min > np.iinfo(np.int32).min and c_max < np.iinfo(np.int32).max:
-                    df[col] = df[col].astype(np.int32)
-                elif c_min > np.iinfo(np.int64).min and c_max < np.iinfo(np.int64).max:
-                    df[col] = df[col].astype(np.int64)
-            else:  # for floats.
-                if c_min > np.finfo(np.float16).min and c_max < np.finfo(np.float16).max:
-                    df[col] = df[col].astype(np.float16)
-                elif c_min > np.finfo(np.float32).min and c_max < np.finfo(np.float32).max:
-                    df[col] = df[col].astype(np.float32)
-                else:
-                    df[col] = df[col].astype(np.float64)
-    end_mem = df.memory_usage(deep=True).sum() / 1024**2
-    if verbose: print('Mem. usage decreased to {:5.2f} Mb ({:.1f}% reduction)'.format(end_mem, 100 * (start_mem - end_mem) / start_mem))
-    return df
+# Physics cases run for each jet seed
+CASES = [0, 1, 2, 3]
+
+# Parton species for jet seed PDG ids
+PILOT_PARTONS = {21: 'g', 1: 'd', -1: 'dbar', 2: 'u', -2: 'ubar', 3: 's', -3: 'sbar'}
+
+# Columns recorded for each parton alongside its time loop summary, with their types
+PARTON_COLUMNS = {
+    'process': int,
+    'z': float,
+    'pp_z': float,
+    'hadron_pt_f': float,
+    'hadron_pt_0': float,
+    'process_run': int
+}
+
+
+# Function to return the physics settings for a case
+# Returns a dict of time_loop physics flags and the coupling g for the case.
+def case_settings(case):
+    if case == 0:
+        return {'el': True, 'cel': False, 'drift': False, 'fg': False, 'fgqhat': False,
+                'g': config.constants.G_RAD}
+    elif case == 1:
+        return {'el': True, 'cel': False, 'drift': True, 'fg': False, 'fgqhat': False,
+                'g': config.constants.G_RAD}
+    elif case == 2:
+        return {'el': True, 'cel': True, 'drift': False, 'fg': False, 'fgqhat': False,
+                'g': config.constants.G_COL}
+    elif case == 3:
+        return {'el': True, 'cel': True, 'drift': True, 'fg': False, 'fgqhat': False,
+                'g': config.constants.G_COL}
+    else:
+        return {'el': True, 'cel': False, 'drift': True, 'fg': False, 'fgqhat': False,
+                'g': config.constants.G_RAD}
+
 
 # Computes angular distance-ish quantity
 def delta_R(phi1, phi2, y1, y2):
@@ -52,8 +66,11 @@ def delta_R(phi1, phi2, y1, y2):
     drap = y1 - y2
     return np.sqrt(dphi * dphi + drap * drap)
 
-# Exits temporary directory, saves dataframe to pickle, and dumps all temporary data.
-def safe_exit(resultsDataFrame, event_obs, temp_dir, filename, identifier, hadrons_df=None, keep_event=False):
+# Exits temporary directory, appends new results rows to the results files, and dumps all temporary data.
+# resultsDataFrame and hadrons_df hold only rows not yet written -- e.g. the latest event's.
+# keep_dir keeps the temporary directory, e.g. so an interrupted event can be resumed from a checkpoint.
+def safe_exit(resultsDataFrame, event_obs, temp_dir, filename, identifier, hadrons_df=None, keep_event=False,
+              keep_dir=False):
     # Save hydro event file
     if keep_event:
         logging.info('Saving event hydro data...')
@@ -79,32 +96,24 @@ def safe_exit(resultsDataFrame, event_obs, temp_dir, filename, identifier, hadro
         logging.info("Failed to copy UrQMD file: {}".format(type(error).__name__))  # An error occurred: NameError
         traceback.print_exc()
 
-    # Save the dataframe into the identified results folder
+    # Append the new rows to the results files in the identified results folder
     logging.info('Saving progress...')
     logging.info('Partons...')
     logging.debug(resultsDataFrame)
-    logging.info('Converting datatypes to reasonable formats...')
-    resultsDataFrame = resultsDataFrame.convert_dtypes()
-    logging.info('Downcasting numeric values to minimum memory size...')
-    resultsDataFrame = downcast_numerics(resultsDataFrame)
+    partons_writer.append(resultsDataFrame)
 
     if lund_string:
         logging.info('LS Hadrons...')
         logging.debug(hadrons_df)
-        logging.info('Converting datatypes to reasonable formats...')
-        hadrons_df = hadrons_df.convert_dtypes()
-        logging.info('Downcasting numeric values to minimum memory size...')
-        hadrons_df = downcast_numerics(hadrons_df)
-
-    logging.info('Writing pickles...')
-    resultsDataFrame.to_pickle(results_path + '/{}.pickle'.format(filename))  # Save dataframe to pickle
-    if lund_string:
-        hadrons_df.to_pickle(results_path + '/{}_hadrons.pickle'.format(filename))
+        hadrons_writer.append(hadrons_df)
 
     # Return to the directory in which we ran the script.
     os.chdir(home_path)
 
     # Clear everything in the temporary directory and delete it, thereby deleting all event files.
+    if keep_dir:
+        logging.info('Keeping temporary directory for resuming...')
+        return
     logging.info('Cleaning temporary directory...')
     logging.debug('This dumps all of the event data!')
     try:
@@ -113,12 +122,345 @@ def safe_exit(resultsDataFrame, event_obs, temp_dir, filename, identifier, hadro
         pass
 
 
-# Function to generate a new HIC event and sample config.NUM_SAMPLES jets in it.
-def run_event(eventNo):
+# Saves the state of the run between events to the checkpoint, if checkpointing
+# The results writers number their blocks, so an event appended after this save but before the next -- e.g. by a run
+# preempted in between -- is overwritten, not duplicated, when the event is rerun on resuming.
+def checkpoint_run():
+    if checkpoints is not None:
+        checkpoints.save('run', {'identifier': identifierString, 'run_seed': run_seed, 'part': part,
+                                 'eventNo': eventNo, 'partons_writer': partons_writer,
+                                 'hadrons_writer': hadrons_writer})
+
+
+# Function to run a single jet seed process in a plasma event: one hard scattering, propagated at num_phi angles
+# under each physics case. Returns the process parton summary records and list of case hadron dataframes.
+def run_process(event, event_dataframe, seed, process_num, num_phi):
+    # Derive the random stream for this process
+    process_rng = utilities.stream_rng(seed, process_num)
+
+    # Create unique jet seed tag
+    process_tag = int(process_rng.uniform(0, 1000000000000))
+    logging.info('- Jet Seed Process {} Start -'.format(process_num))
+
+    process_partons = timekeeper.summary_buffer(capacity=2 * num_phi * len(CASES), extra_columns=PARTON_COLUMNS)
+    process_hadrons = []
+
+    try:
+        #########################
+        # Create new scattering #
+        #########################
+        # Draw it from the scattering bank, if given, or else generate it with Pythia
+        if config.jet.SCATTERING_BANK is not None:
+            particles, weight = scattering_bank.open_bank(config.jet.SCATTERING_BANK).draw(rng=process_rng)
+        else:
+            particles, weight = pythia.scattering(seed=int(process_rng.integers(1, 900000000)))
+        particle_tags = process_rng.uniform(0, 1000000000000, len(particles)).astype(int)
+
+        # Select jet seed production point
+        if not config.mode.VARY_POINT:
+            x0 = 0
+            y0 = 0
+        else:
+            newPoint = collision.generate_jet_seed_point(event, rng=process_rng)
+            x0, y0 = newPoint[0], newPoint[1]
+
+        process_run = 0
+
+        # Random azimuthal sampling
+        # phi_values = phi_rng.uniform(0, 2 * np.pi, num_phi)
+
+        # Uniform azimuthal sampling
+        phi_values = np.linspace(start=0, stop=2*np.pi, num=num_phi, endpoint=False) #+ psi_2
+
+        for phi_index, phi_val in enumerate(phi_values):
+            # phi_val = np.mod(np.random.uniform(phi_center - phi_res/2, phi_center + phi_res/2), 2*np.pi)
+
+            # Propagate each jet seed under all physics cases at once, sharing medium lookups between cases
+            if config.mode.CASE_BATCH and not config.mode.KEEP_RECORD:
+                case_results = {}
+                jet_seed_num = -1
+                for i, (index, particle) in enumerate(particles.iterrows()):
+                    if particle['status'] != 23:
+                        continue
+                    jet_seed_num += 1
+                    if jet_seed_num == 0:
+                        phi_0 = phi_val
+                    else:
+                        phi_0 = np.mod(phi_val + np.pi, 2*np.pi)
+                    seed_parton = jets.parton(x_0=x0, y_0=y0, phi_0=phi_0, p_T0=particle['pt'],
+                                              tag=int(particle_tags[i]), no=jet_seed_num,
+                                              part=PILOT_PARTONS[particle['id']], weight=weight)
+                    logging.info('Running Jet {}, all cases'.format(str(process_num)))
+                    case_results[jet_seed_num] = timekeeper.time_loop_cases(
+                        event=event, parton=seed_parton, cases=[case_settings(case) for case in CASES],
+                        el_model='num_GLV', as_records=True)
+            else:
+                case_results = None
+
+            for case in CASES:
+                case_partons = timekeeper.summary_buffer(capacity=2, extra_columns=PARTON_COLUMNS)
+                # Derive the random stream for this angle and case
+                case_rng = utilities.stream_rng(seed, process_num, phi_index, case)
+                # Determine case details
+                settings = case_settings(case)
+                el = settings['el']
+                cel = settings['cel']
+                drift = settings['drift']
+                fg = settings['fg']
+                fgqhat = settings['fgqhat']
+                config.constants.G = settings['g']
+
+                i = 0
+                jet_seed_num = -1
+                for index, particle in particles.iterrows():
+                    # Only do the things for the particle output
+                    particle_status = particle['status']
+                    particle_tag = int(particle_tags[i])
+                    if particle_status != 23:
+                        i += 1
+                        continue
+                    jet_seed_num += 1
+                    # Read jet seed particle properties
+                    chosen_e = particle['pt']
+                    chosen_weight = weight
+                    particle_pid = particle['id']
+                    chosen_pilot = PILOT_PARTONS[particle_pid]
+
+                    # Select jet seed particle angle from sample
+                    if jet_seed_num == 0:
+                        phi_0 = phi_val
+                    else:
+                        phi_0 = np.mod(phi_val + np.pi, 2*np.pi)
+
+                    # Read jet production angle
+                    #phi_0 = np.arctan2(particle['py'], particle['px']) + np.pi
+
+                    # Yell about your selected jet
+                    logging.info('Pilot parton: {}, pT: {} GeV'.format(chosen_pilot, chosen_e))
+
+                    el_model = 'num_GLV'
+
+                    # Log jet number and case description
+                    logging.info('Running Jet {}, case {}'.format(str(process_num), case))
+                    logging.info('Energy Loss: {}, Vel Drift: {}, FG Drift: {}, FG Qhat: {}'.format(el, drift, fg,
+                                                                                                    fgqhat))
+
+                    # Create the jet object
+                    parton = jets.parton(x_0=x0, y_0=y0, phi_0=phi_0, p_T0=chosen_e, tag=particle_tag, no=jet_seed_num, part=chosen_pilot,
+                                      weight=chosen_weight)
+
+                    # Perform pp-level fragmentation
+                    pp_frag_z = fragmentation.frag(parton, rng=case_rng)
+
+                    # Run the time loop
+                    # Take results from the case-batched transport, if run. Otherwise, without drift, partons
+                    # travel in straight lines, so we take the eikonal fast path unless we need the step-by-step
+                    # trajectory record.
+                    if case_results is not None:
+                        seed_records, seed_partons = case_results[jet_seed_num]
+                        jet_records = seed_records[[CASES.index(case)]]
+                        parton.x = seed_partons[CASES.index(case)].x
+                        parton.y = seed_partons[CASES.index(case)].y
+                        parton.p_x = seed_partons[CASES.index(case)].p_x
+                        parton.p_y = seed_partons[CASES.index(case)].p_y
+                        jet_xarray = None
+                    elif not drift and not fg and not config.mode.KEEP_RECORD:
+                        jet_records = timekeeper.time_loop_eikonal(event=event, parton=parton, el=el,
+                                                                   cel=cel, fgqhat=fgqhat, el_model=el_model,
+                                                                   as_records=True)
+                        jet_xarray = None
+                    else:
+                        jet_records, jet_xarray = timekeeper.time_loop(event=event, parton=parton, drift=drift,
+                                                                       el=el, cel=cel, fg=fg, fgqhat=fgqhat,
+                                                                       el_model=el_model,
+                                                                       keep_record=config.mode.KEEP_RECORD,
+                                                                       as_records=True)
+
+                    # Save the xarray trajectory file
+                    # Note we are currently in a temp directory... Save record in directory above.
+                    if config.mode.KEEP_RECORD:
+                        jet_xarray.to_netcdf('../{}_record.nc'.format(process_tag))
+
+                    logging.info('FF Fragmentation')
+                    # Perform ff fragmentation
+                    frag_z = fragmentation.frag(parton, rng=case_rng)
+                    pion_pt = parton.p_T() * frag_z
+                    pion_pt_0 = parton.p_T0 * pp_frag_z
+
+                    # Save jet pair
+                    # Select by jet seed number, not Pythia record row, as scattering banks hold only the outgoing pair
+                    if jet_seed_num == 0:
+                        parton1 = parton
+                    elif jet_seed_num == 1:
+                        parton2 = parton
+
+                    # Append current parton summary, with the scattering process tag and fragmentation results,
+                    # to the case partons
+                    case_partons.append(jet_records, process=process_tag, z=frag_z, pp_z=pp_frag_z,
+                                        hadron_pt_f=pion_pt, hadron_pt_0=pion_pt_0, process_run=process_run)
+
+                    i += 1
+
+                if lund_string:
+                    logging.info('Hadronizing...')
+                    # Hadronize jet pair
+                    scale = particles['scaleIn'].to_numpy()[-1]  # use last particle to set hard process scale
+                    case_hadrons = pythia.fragment(jet1=parton1, jet2=parton2, scaleIn=scale, weight=chosen_weight,
+                                                   rng=case_rng)
+
+                    logging.info('Appending event dataframe to hadrons')
+                    # Tack case, event, and process details onto the hadron dataframe
+                    num_hadrons = len(case_hadrons)
+                    event_mult = event_dataframe['mult']
+                    event_e2 = event_dataframe['e2']
+                    event_psi_e2 = event_dataframe['psi_e2']
+                    event_v2 = event_dataframe['v_2']
+                    event_psi_2 = event_dataframe['psi_2']
+                    event_e3 = event_dataframe['e3']
+                    event_psi_e3 = event_dataframe['psi_e3']
+                    event_v3 = event_dataframe['v_3']
+                    event_psi_3 = event_dataframe['psi_3']
+                    event_b = event_dataframe['b']
+                    event_ncoll = event_dataframe['ncoll']
+                    detail_df = pd.DataFrame(
+                        {
+                            'hadron_tag': case_rng.uniform(0, 1000000000000, num_hadrons).astype(int),
+                            'drift': np.full(num_hadrons, drift),
+                            'el': np.full(num_hadrons, el),
+                            'fg': np.full(num_hadrons, fg),
+                            'process': np.full(num_hadrons, process_tag),
+                            'e_2': np.full(num_hadrons, event_e2),
+                            'psi_e2': np.full(num_hadrons, event_psi_e2),
+                            'v_2': np.full(num_hadrons, event_v2),
+                            'psi_2': np.full(num_hadrons, event_psi_2),
+                            'e_3': np.full(num_hadrons, event_e3),
+                            'psi_e3': np.full(num_hadrons, event_psi_e3),
+                            'v_3': np.full(num_hadrons, event_v3),
+                            'psi_3': np.full(num_hadrons, event_psi_3),
+                            'mult': np.full(num_hadrons, event_mult),
+                            'ncoll': np.full(num_hadrons, event_ncoll),
+                            'b': np.full(num_hadrons, event_b),
+                            'parent_id': np.empty(num_hadrons),
+                            'parent_pt': np.empty(num_hadrons),
+                            'parent_pt_f': np.empty(num_hadrons),
+                            'parent_phi': np.empty(num_hadrons),
+                            'parent_tag': np.empty(num_hadrons),
+                            'z': np.empty(num_hadrons)
+                        }
+                    )
+                    case_hadrons = pd.concat([case_hadrons, detail_df], axis=1)
+
+                    logging.info('Hadron z_mean value')
+                    # Compute a rough z value for each hadron
+                    mean_part_pt = np.mean([parton1.p_T(), parton2.p_T()])
+                    case_hadrons['z_mean'] = case_hadrons['pt'] / mean_part_pt
+
+                    logging.info('Hadron phi value')
+                    # Compute a phi angle for each hadron
+                    case_hadrons['phi_f'] = np.arctan2(case_hadrons['py'].to_numpy().astype(float),
+                                                       case_hadrons['px'].to_numpy().astype(float)) + np.pi
+
+                    logging.info('CA-type parent finder')
+                    # Apply simplified Cambridge-Aachen-type algorithm to find parent parton
+                    for index in case_hadrons.index:
+                        min_dR = 10000
+                        parent = None
+
+                        # Check the Delta R to each jet
+                        # Set parent to the minimum Delta R jet
+                        for parton in [parton1, parton2]:
+                            jet_rho, jet_phi = parton.polar_mom_coords()
+                            dR = delta_R(phi1=case_hadrons.loc[index, 'phi_f'], phi2=jet_phi,
+                                         y1=case_hadrons.loc[index, 'y'], y2=0)
+                            if dR < min_dR:
+                                min_dR = dR
+                                parent = parton
+
+                        # Save parent info to hadron dataframe
+                        case_hadrons.at[index, 'parent_id'] = parent.id
+                        case_hadrons.at[index, 'parent_pt'] = parent.p_T0
+                        case_hadrons.at[index, 'parent_pt_f'] = parent.p_T()
+                        parent_rho, parent_phi = parent.polar_mom_coords()
+                        case_hadrons.at[index, 'parent_phi'] = parent_phi
+                        case_hadrons.at[index, 'parent_tag'] = parent.tag
+                        case_hadrons.at[index, 'z'] = case_hadrons.loc[index, 'pt'] / parent.p_T()  # "Actual" z-value
+
+                logging.info('Appending case results to process results')
+                if lund_string:
+                    process_hadrons.append(case_hadrons)
+                # Jets were prepended to the case results, so the case's jets are written in reverse order
+                process_partons.append(case_partons.rows()[::-1])
+                process_run += 1
+
+    except Exception as error:
+        logging.info("An error occurred: {}".format(type(error).__name__))  # An error occurred: NameError
+        logging.info('- Jet Process Failed -')
+        traceback.print_exc()
+
+    # Declare jet complete
+    logging.info('- Jet Process ' + str(process_num) + ' Complete -')
+
+    return process_partons.rows(), process_hadrons
+
+
+# Event state inherited by forked jet process workers
+_pool_event = {}
+
+
+# Function run by forked workers to run a jet seed process in the event held in _pool_event
+def _pool_process(process_num):
+    return run_process(process_num=process_num, **_pool_event)
+
+
+# Function to return an iterator over the (process number, records, hadrons) results of the jet seed processes in an
+# event, in process order, skipping the process numbers in skip.
+# With more than one worker, a pool of processes is forked after the plasma event exists, so the workers inherit the
+# event's grids copy-on-write. The persistent Pythia engines (or the scattering bank) are set up in this process
+# before the fork, so the workers inherit them too, rather than each initialising Pythia for every event. Processes are
+# handed out to the workers in chunks.
+def process_results(event, event_dataframe, seed, num_phi, workers=1, skip=()):
+    process_nums = [process_num for process_num in range(0, config.EBE.NUM_SAMPLES) if process_num not in skip]
+    if workers == 0:
+        workers = os.cpu_count()
+    workers = min(workers, len(process_nums))
 
-    # Generate empty results frame
-    event_partons = pd.DataFrame({})
-    event_hadrons = pd.DataFrame({})
+    if workers <= 1:
+        for process_num in process_nums:
+            yield (process_num,) + run_process(event=event, event_dataframe=event_dataframe, seed=seed,
+                                               process_num=process_num, num_phi=num_phi)
+        return
+
+    logging.info('Running jet seed processes on {} workers...'.format(workers))
+    if config.jet.SCATTERING_BANK is not None:
+        scattering_bank.open_bank(config.jet.SCATTERING_BANK)
+    else:
+        pythia.get_scattering_generator()
+    if lund_string:
+        pythia.get_hadronizer()
+    _pool_event.update(event=event, event_dataframe=event_dataframe, seed=seed, num_phi=num_phi)
+    chunksize = max(1, len(process_nums) // (4 * workers))
+    try:
+        with multiprocessing.get_context('fork').Pool(processes=workers) as pool:
+            for process_num, results in zip(process_nums, pool.imap(_pool_process, process_nums,
+                                                                   chunksize=chunksize)):
+                yield (process_num,) + results
+    finally:
+        _pool_event.clear()
+
+
+# Function to generate a new HIC event and sample config.NUM_SAMPLES jets in it.
+# seed sets the event's trento seed, if given. All random streams within the event are keyed by the event seed,
+# process number, angle index, and case, so results do not depend on the order in which the work is done.
+# hydro, if given, is the (event dataframe, observables) of an event already generated in the working directory.
+# checkpoints, if given, is a utilities.checkpoint holding the results of the event's completed processes, which are
+# not rerun, and to which the results of each newly completed process are saved.
+def run_event(eventNo, seed=None, hydro=None, checkpoints=None):
+
+    # Generate empty results buffer and frame
+    num_phi = 11  # We select a prime number so this can't (?) influence v_n =/= v_{num_phi}
+    event_partons = timekeeper.summary_buffer(capacity=2 * num_phi * len(CASES) * config.EBE.NUM_SAMPLES,
+                                              extra_columns=PARTON_COLUMNS)
+    event_hadrons = []
 
     ###############################
     # Generate new event geometry #
@@ -126,13 +468,16 @@ def run_event(eventNo):
 
     logging.info('Generating new event...')
 
-    # Run event generation using config setttings
+    # Run event generation using config setttings, unless already done
     # Note that we need write permissions in the working directory
-    event_dataframe, event_observables = collision.generate_event(working_dir=None)
+    if hydro is None:
+        event_dataframe, event_observables = collision.generate_event(working_dir=None, seed=seed)
+    else:
+        event_dataframe, event_observables = hydro
     rmax = event_dataframe.iloc[0]['rmax']
 
     # Record seed selected
-    seed = event_dataframe.iloc[0]['seed']
+    seed = int(event_dataframe.iloc[0]['seed'])
 
     # Record event psi_2
     psi_2 = event_dataframe.iloc[0]['psi_2']
@@ -151,275 +496,42 @@ def run_event(eventNo):
     # Select angular bin centers fixed at elliptic flow attractors and repulsors.
     # phi_res = np.pi/2
     # phi_bin_centers = np.arange(0, 2*np.pi, phi_res) + psi_2
-    phi_rng = np.random.default_rng()
-    num_phi = 11  # We select a prime number so this can't (?) influence v_n =/= v_{num_phi}
 
-    # Oversample the background with jet seeds
-    for process_num in range(0, config.EBE.NUM_SAMPLES):
-        # Create unique jet seed tag
-        process_tag = int(np.random.uniform(0, 1000000000000))
-        logging.info('- Jet Seed Process {} Start -'.format(process_num))
-
-        try:
-            #########################
-            # Create new scattering #
-            #########################
-            particles, weight = pythia.scattering()
-            particle_tags = np.random.default_rng().uniform(0, 1000000000000, len(particles)).astype(int)
-            process_partons = pd.DataFrame({})
-            process_hadrons = pd.DataFrame({})
-
-            # Select jet seed production point
-            if not config.mode.VARY_POINT:
-                x0 = 0
-                y0 = 0
-            else:
-                newPoint = collision.generate_jet_seed_point(event)
-                x0, y0 = newPoint[0], newPoint[1]
-
-            process_run = 0
-
-            # Random azimuthal sampling
-            # phi_values = phi_rng.uniform(0, 2 * np.pi, num_phi)
-
-            # Uniform azimuthal sampling
-            phi_values = np.linspace(start=0, stop=2*np.pi, num=num_phi, endpoint=False) #+ psi_2
-
-            for phi_val in phi_values:
-                # phi_val = np.mod(np.random.uniform(phi_center - phi_res/2, phi_center + phi_res/2), 2*np.pi)
-
-                for case in [0, 1, 2, 3]:
-                    case_partons = pd.DataFrame({})
-                    # Determine case details
-                    if case == 0:
-                        el = True
-                        cel = False
-                        drift = False
-                        fg = False
-                        fgqhat = False
-                        config.constants.G = config.constants.G_RAD
-                    elif case == 1:
-                        el = True
-                        cel = False
-                        drift = True
-                        fg = False
-                        fgqhat = False
-                        config.constants.G = config.constants.G_RAD
-                    elif case == 2:
-                        el = True
-                        cel = True
-                        drift = False
-                        fg = False
-                        fgqhat = False
-                        config.constants.G = config.constants.G_COL
-                    elif case == 3:
-                        el = True
-                        cel = True
-                        drift = True
-                        fg = False
-                        fgqhat = False
-                        config.constants.G = config.constants.G_COL
-                    else:
-                        el = True
-                        cel = False
-                        drift = True
-                        fg = False
-                        fgqhat = False
-                        config.constants.G = config.constants.G_RAD
-
-                    i = 0
-                    jet_seed_num = -1
-                    for index, particle in particles.iterrows():
-                        # Only do the things for the particle output
-                        particle_status = particle['status']
-                        particle_tag = int(particle_tags[i])
-                        if particle_status != 23:
-                            i += 1
-                            continue
-                        jet_seed_num += 1
-                        # Read jet seed particle properties
-                        chosen_e = particle['pt']
-                        chosen_weight = weight
-                        particle_pid = particle['id']
-                        if particle_pid == 21:
-                            chosen_pilot = 'g'
-                        elif particle_pid == 1:
-                            chosen_pilot = 'd'
-                        elif particle_pid == -1:
-                            chosen_pilot = 'dbar'
-                        elif particle_pid == 2:
-                            chosen_pilot = 'u'
-                        elif particle_pid == -2:
-                            chosen_pilot = 'ubar'
-                        elif particle_pid == 3:
-                            chosen_pilot = 's'
-                        elif particle_pid == -3:
-                            chosen_pilot = 'sbar'
-
-                        # Select jet seed particle angle from sample
-                        if jet_seed_num == 0:
-                            phi_0 = phi_val
-                        else:
-                            phi_0 = np.mod(phi_val + np.pi, 2*np.pi)
-
-                        # Read jet production angle
-                        #phi_0 = np.arctan2(particle['py'], particle['px']) + np.pi
-
-                        # Yell about your selected jet
-                        logging.info('Pilot parton: {}, pT: {} GeV'.format(chosen_pilot, chosen_e))
-
-                        el_model = 'num_GLV'
-
-                        # Log jet number and case description
-                        logging.info('Running Jet {}, case {}'.format(str(process_num), case))
-                        logging.info('Energy Loss: {}, Vel Drift: {}, FG Drift: {}, FG Qhat: {}'.format(el, drift, fg,
-                                                                                                        fgqhat))
-
-                        # Create the jet object
-                        parton = jets.parton(x_0=x0, y_0=y0, phi_0=phi_0, p_T0=chosen_e, tag=particle_tag, no=jet_seed_num, part=chosen_pilot,
-                                          weight=chosen_weight)
-
-                        # Perform pp-level fragmentation
-                        pp_frag_z = fragmentation.frag(parton)
-
-                        # Run the time loop
-                        jet_dataframe, jet_xarray = timekeeper.time_loop(event=event, parton=parton, drift=drift,
-                                                                         el=el, cel=cel, fg=fg, fgqhat=fgqhat,
-                                                                         el_model=el_model)
-
-                        # Save the xarray trajectory file
-                        # Note we are currently in a temp directory... Save record in directory above.
-                        if config.mode.KEEP_RECORD:
-                            jet_xarray.to_netcdf('../{}_record.nc'.format(process_tag))
-
-                        # Add scattering process tag
-                        jet_dataframe['process'] = process_tag
-
-                        # Merge the event and jet dataframe lines
-                        current_parton = pd.concat([jet_dataframe, event_dataframe], axis=1)
-
-                        logging.info('FF Fragmentation')
-                        # Perform ff fragmentation
-                        frag_z = fragmentation.frag(parton)
-                        pion_pt = parton.p_T() * frag_z
-                        pion_pt_0 = parton.p_T0 * pp_frag_z
-                        current_parton['z'] = frag_z
-                        current_parton['pp_z'] = pp_frag_z
-                        current_parton['hadron_pt_f'] = pion_pt
-                        current_parton['hadron_pt_0'] = pion_pt_0
-                        current_parton['process_run'] = process_run
-
-                        # Save jet pair
-                        if i == 4:
-                            parton1 = parton
-                        elif i == 5:
-                            parton2 = parton
-
-                        # Append current partons to the case partons
-                        case_partons = pd.concat([current_parton, case_partons], axis=0)
-
-                        i += 1
-
-                    if lund_string:
-                        logging.info('Hadronizing...')
-                        # Hadronize jet pair
-                        scale = particles['scaleIn'].to_numpy()[-1]  # use last particle to set hard process scale
-                        case_hadrons = pythia.fragment(jet1=parton1, jet2=parton2, scaleIn=scale, weight=chosen_weight)
-
-                        logging.info('Appending event dataframe to hadrons')
-                        # Tack case, event, and process details onto the hadron dataframe
-                        num_hadrons = len(case_hadrons)
-                        event_mult = event_dataframe['mult']
-                        event_e2 = event_dataframe['e2']
-                        event_psi_e2 = event_dataframe['psi_e2']
-                        event_v2 = event_dataframe['v_2']
-                        event_psi_2 = event_dataframe['psi_2']
-                        event_e3 = event_dataframe['e3']
-                        event_psi_e3 = event_dataframe['psi_e3']
-                        event_v3 = event_dataframe['v_3']
-                        event_psi_3 = event_dataframe['psi_3']
-                        event_b = event_dataframe['b']
-                        event_ncoll = event_dataframe['ncoll']
-                        detail_df = pd.DataFrame(
-                            {
-                                'hadron_tag': np.random.default_rng().uniform(0, 1000000000000, num_hadrons).astype(int),
-                                'drift': np.full(num_hadrons, drift),
-                                'el': np.full(num_hadrons, el),
-                                'fg': np.full(num_hadrons, fg),
-                                'process': np.full(num_hadrons, process_tag),
-                                'e_2': np.full(num_hadrons, event_e2),
-                                'psi_e2': np.full(num_hadrons, event_psi_e2),
-                                'v_2': np.full(num_hadrons, event_v2),
-                                'psi_2': np.full(num_hadrons, event_psi_2),
-                                'e_3': np.full(num_hadrons, event_e3),
-                                'psi_e3': np.full(num_hadrons, event_psi_e3),
-                                'v_3': np.full(num_hadrons, event_v3),
-                                'psi_3': np.full(num_hadrons, event_psi_3),
-                                'mult': np.full(num_hadrons, event_mult),
-                                'ncoll': np.full(num_hadrons, event_ncoll),
-                                'b': np.full(num_hadrons, event_b),
-                                'parent_id': np.empty(num_hadrons),
-                                'parent_pt': np.empty(num_hadrons),
-                                'parent_pt_f': np.empty(num_hadrons),
-                                'parent_phi': np.empty(num_hadrons),
-                                'parent_tag': np.empty(num_hadrons),
-                                'z': np.empty(num_hadrons)
-                            }
-                        )
-                        case_hadrons = pd.concat([case_hadrons, detail_df], axis=1)
-
-                        logging.info('Hadron z_mean value')
-                        # Compute a rough z value for each hadron
-                        mean_part_pt = np.mean([parton1.p_T(), parton2.p_T()])
-                        case_hadrons['z_mean'] = case_hadrons['pt'] / mean_part_pt
-
-                        logging.info('Hadron phi value')
-                        # Compute a phi angle for each hadron
-                        case_hadrons['phi_f'] = np.arctan2(case_hadrons['py'].to_numpy().astype(float),
-                                                           case_hadrons['px'].to_numpy().astype(float)) + np.pi
-
-                        logging.info('CA-type parent finder')
-                        # Apply simplified Cambridge-Aachen-type algorithm to find parent parton
-                        for index in case_hadrons.index:
-                            min_dR = 10000
-                            parent = None
-
-                            # Check the Delta R to each jet
-                            # Set parent to the minimum Delta R jet
-                            for parton in [parton1, parton2]:
-                                jet_rho, jet_phi = parton.polar_mom_coords()
-                                dR = delta_R(phi1=case_hadrons.loc[index, 'phi_f'], phi2=jet_phi,
-                                             y1=case_hadrons.loc[index, 'y'], y2=0)
-                                if dR < min_dR:
-                                    min_dR = dR
-                                    parent = parton
-
-                            # Save parent info to hadron dataframe
-                            case_hadrons.at[index, 'parent_id'] = parent.id
-                            case_hadrons.at[index, 'parent_pt'] = parent.p_T0
-                            case_hadrons.at[index, 'parent_pt_f'] = parent.p_T()
-                            parent_rho, parent_phi = parent.polar_mom_coords()
-                            case_hadrons.at[index, 'parent_phi'] = parent_phi
-                            case_hadrons.at[index, 'parent_tag'] = parent.tag
-                            case_hadrons.at[index, 'z'] = case_hadrons.loc[index, 'pt'] / parent.p_T()  # "Actual" z-value
-
-                    logging.info('Appending case results to process results')
-                    if lund_string:
-                        process_hadrons = pd.concat([process_hadrons, case_hadrons], axis=0)
-                    process_partons = pd.concat([process_partons, case_partons], axis=0)
-                    process_run += 1
-
-        except Exception as error:
-            logging.info("An error occurred: {}".format(type(error).__name__))  # An error occurred: NameError
-            logging.info('- Jet Process Failed -')
-            traceback.print_exc()
+    # Take the results of any processes completed before an interruption
+    completed = {}
+    if checkpoints is not None:
+        for name in checkpoints.names(prefix='process_'):
+            completed[int(name[len('process_'):])] = checkpoints.load(name)
+        if len(completed) > 0:
+            logging.info('Resuming event with {} jet seed processes complete...'.format(len(completed)))
 
+    # Oversample the background with jet seeds
+    for process_num, process_records, process_hadrons in process_results(event=event, event_dataframe=event_dataframe,
+                                                                         seed=seed, num_phi=num_phi,
+                                                                         workers=config.EBE.WORKERS, skip=completed):
+        completed[process_num] = (process_records, process_hadrons)
+        if checkpoints is not None:
+            checkpoints.save('process_{:06d}'.format(process_num), completed[process_num])
+
+    for process_num in sorted(completed):
+        process_records, process_hadrons = completed[process_num]
         if lund_string:
-            event_hadrons = pd.concat([event_hadrons, process_hadrons], axis=0)
-        event_partons = pd.concat([event_partons, process_partons], axis=0)
-
-        # Declare jet complete
-        logging.info('- Jet Process ' + str(process_num) + ' Complete -')
+            event_hadrons.extend(process_hadrons)
+        event_partons.append(process_records)
+
+    # Create the event's parton dataframe, merging in the event properties for every parton
+    logging.info('Creating event parton dataframe...')
+    event_partons = event_partons.to_dataframe()
+    jet_columns = list(timekeeper.SUMMARY_COLUMNS) + ['process']
+    event_columns = event_dataframe.loc[event_dataframe.index.repeat(len(event_partons))].reset_index(drop=True)
+    event_partons = pd.concat([event_partons[jet_columns], event_columns,
+                               event_partons.drop(columns=jet_columns)], axis=1)
+
+    # Create the event's hadron dataframe from all case hadron dataframes at once
+    if len(event_hadrons) > 0:
+        event_hadrons = pd.concat(event_hadrons, axis=0)
+    else:
+        event_hadrons = pd.DataFrame({})
 
     return event_partons, event_hadrons, event_observables
 
@@ -432,21 +544,40 @@ def run_event(eventNo):
 part = 0
 eventNo = 0
 
-# Set up results frame and filename.
+# Set up frames of results not yet written and filename.
 temp_dir = None  # Instantiates object for interrupt before temp_dir created.
 results = pd.DataFrame({})
 hadrons = pd.DataFrame({})
 identifierString = str(int(np.random.uniform(0, 9999999999999)))
-resultsFilename = 'results' + identifierString + 'p' + str(part)
 
 # Set running location as current directory - whatever the pwd was when running the script
 project_path = os.path.dirname(os.path.realpath(__file__))  # Gets directory the EBE.py script is located in
 home_path = os.getcwd()  # Gets working directory when script was run - results directory will be placed here
+
+# Find the most recent unfinished checkpointed run in the results directory, if checkpointing, to resume it
+run_state = None
+if config.mode.CHECKPOINT:
+    for run_file in sorted(glob.glob(home_path + '/results/*/checkpoint/run.pickle'), key=os.path.getmtime):
+        run_state = utilities.checkpoint(os.path.dirname(run_file)).load('run')
+    if run_state is not None:
+        identifierString = run_state['identifier']
+        part = run_state['part']
+        eventNo = run_state['eventNo']
+
+resultsFilename = 'results' + identifierString + 'p' + str(part)
 results_path = home_path + '/results/{}'.format(identifierString)  # Absolute path of dir where results files will live
 
 # Make results directory
 os.makedirs(results_path, exist_ok=True)
 
+# Set up incremental results writers, carrying on with those of a resumed run
+if run_state is not None:
+    partons_writer = run_state['partons_writer']
+    hadrons_writer = run_state['hadrons_writer']
+else:
+    partons_writer = utilities.results_writer(path=results_path, name=resultsFilename)
+    hadrons_writer = utilities.results_writer(path=results_path, name=resultsFilename + '_hadrons')
+
 # Create log file & configure logging to be handled into the file AND stdout
 logging.basicConfig(
     level=logging.DEBUG,
@@ -461,33 +592,109 @@ logging.info('Copying config.yml to results...')
 utilities.run_cmd(*['cp', project_path + 'config.yml', results_path + '/config_{}.yml'.format(identifierString)],
                   quiet=True)
 
+# Set the run seed, from which every event seed is derived
+if run_state is not None:
+    run_seed = run_state['run_seed']
+    logging.info('Resuming run {} from checkpoint at event {}'.format(identifierString, eventNo))
+elif config.mode.SEED is not None:
+    run_seed = config.mode.SEED
+else:
+    run_seed = np.random.SeedSequence().entropy
+logging.info('Run seed: {}'.format(run_seed))
+
+# Set up the checkpoint of the run's progress, if checkpointing
+if config.mode.CHECKPOINT:
+    checkpoints = utilities.checkpoint(results_path + '/checkpoint')
+    checkpoint_run()
+else:
+    checkpoints = None
+
+# Delete the event directories left behind by an interrupted run, e.g. that of an event interrupted while its hydro
+# was running, or those of events the pipeline generated ahead, keeping only that of the checkpointed event to resume
+if run_state is not None:
+    kept_event = checkpoints.load('event')
+    for stale_dir in glob.glob(results_path + '/JMA_*'):
+        if (kept_event is not None and kept_event['eventNo'] == eventNo
+                and os.path.abspath(stale_dir) == os.path.abspath(kept_event['event_dir'])):
+            continue
+        logging.info('Removing stale event directory {}'.format(stale_dir))
+        utilities.adoptedTempDir(stale_dir).cleanup()
+
+# Event pipeline is started at the first new event, if pipelined
+pipeline = None
+
 # Run event loop
 try:
     while config.EBE.NUM_EVENTS == 0 or eventNo < config.EBE.NUM_EVENTS:
-        # Create and move to temporary directory
-        temp_dir = tempDir(location=results_path)
-        logging.info(os.getcwd())
-
-        # Generate a new HIC event and sample config.NUM_SAMPLES jets in it
-        # Append returned dataframe to current dataframe
-        event_results, event_hadrons, event_observables = run_event(eventNo=int(identifierString))
-        results = pd.concat([results, event_results], axis=0)
+        event_seed = utilities.stream_seed(run_seed, eventNo, high=10000000000000000)
+
+        # Find the event in progress when the run was interrupted, if it is this event and its directory remains
+        event_state = None
+        if checkpoints is not None:
+            event_state = checkpoints.load('event')
+            if event_state is not None and (event_state['eventNo'] != eventNo
+                                            or not os.path.isdir(event_state['event_dir'])):
+                event_state = None
+
+        if event_state is not None:
+            # Move to the interrupted event's directory and take up its generated event
+            logging.info('Resuming event {} from checkpoint...'.format(eventNo))
+            temp_dir = tempDir(name=event_state['event_dir'])
+            hydro = event_state['hydro']
+        elif config.mode.PIPELINE_DEPTH > 0:
+            # Take the next event from the pipeline and move to its directory
+            if pipeline is None:
+                pipeline = collision.event_pipeline(run_seed=run_seed, num_events=config.EBE.NUM_EVENTS,
+                                                    depth=config.mode.PIPELINE_DEPTH, location=results_path,
+                                                    first_event=eventNo)
+            try:
+                _, event_dir, event_dataframe, event_observables = pipeline.next()
+            except StopIteration:
+                break
+            temp_dir = tempDir(name=event_dir)
+            hydro = (event_dataframe, event_observables)
+        else:
+            # Create and move to temporary directory, kept on exit if checkpointing, and generate a new HIC event
+            temp_dir = tempDir(location=results_path, persistent=checkpoints is not None)
+            logging.info(os.getcwd())
+            hydro = collision.generate_event(working_dir=None, seed=event_seed)
+
+        # Checkpoint the new event, dropping any processes saved for an event that could not be resumed
+        if checkpoints is not None and event_state is None:
+            checkpoints.clear(prefix='process_')
+            checkpoints.save('event', {'eventNo': eventNo, 'event_dir': temp_dir.name, 'hydro': hydro})
+
+        # Sample config.NUM_SAMPLES jets in the event
+        event_results, event_hadrons, event_observables = run_event(eventNo=int(identifierString), hydro=hydro,
+                                                                    checkpoints=checkpoints)
+        results = event_results
         if lund_string:
-            hadrons = pd.concat([hadrons, event_hadrons], axis=0)
+            hadrons = event_hadrons
 
-        # Exits directory, saves all current data, and dumps temporary files.
+        # Exits directory, appends the event's results, and dumps temporary files.
         safe_exit(resultsDataFrame=results, hadrons_df=hadrons, event_obs=event_observables, temp_dir=temp_dir,
                   filename=resultsFilename, identifier=identifierString,
                   keep_event=config.mode.KEEP_EVENT)
-
-        if len(results) > 10000:
+        results = pd.DataFrame({})
+        hadrons = pd.DataFrame({})
+        if pipeline is not None:
+            pipeline.done()
+        if checkpoints is not None:
+            checkpoints.clear(prefix='process_')
+            checkpoints.clear(prefix='event')
+
+        if partons_writer.rows > 10000:
             part += 1
             resultsFilename = 'results' + identifierString + 'p' + str(part)
-            results = pd.DataFrame({})
-            hadronssFilename = 'results' + identifierString + 'p' + str(part)
-            hadronss = pd.DataFrame({})
+            partons_writer = utilities.results_writer(path=results_path, name=resultsFilename)
+            hadrons_writer = utilities.results_writer(path=results_path, name=resultsFilename + '_hadrons')
 
         eventNo += 1
+        checkpoint_run()
+
+    # The run is complete, so it is not to be resumed
+    if checkpoints is not None:
+        checkpoints.remove()
 
 except KeyboardInterrupt as error:
     logging.exception('Interrupted!!!: {}'.format(str(error)))
@@ -495,7 +702,8 @@ except KeyboardInterrupt as error:
 
     # Clean up and get everything sorted
     safe_exit(resultsDataFrame=results, hadrons_df=hadrons, temp_dir=temp_dir, filename=resultsFilename, identifier=identifierString,
-              keep_event=config.mode.KEEP_EVENT, event_obs=event_observables)
+              keep_event=config.mode.KEEP_EVENT, event_obs=event_observables,
+              keep_dir=checkpoints is not None)
 
 except collision.StopEvent as error:
     logging.exception('HIC event error: {}'.format(str(error)))
@@ -503,7 +711,8 @@ except collision.StopEvent as error:
 
     # Clean up and get everything sorted
     safe_exit(resultsDataFrame=results, hadrons_df=hadrons, temp_dir=temp_dir, filename=resultsFilename, identifier=identifierString,
-              keep_event=config.mode.KEEP_EVENT, event_obs=event_observables)
+              keep_event=config.mode.KEEP_EVENT, event_obs=event_observables,
+              keep_dir=checkpoints is not None)
 
 except MemoryError as error:
     logging.exception('Memory error: {}'.format(str(error)))
@@ -511,7 +720,8 @@ except MemoryError as error:
 
     # Clean up and get everything sorted
     safe_exit(resultsDataFrame=results, hadrons_df=hadrons, temp_dir=temp_dir, filename=resultsFilename, identifier=identifierString,
-              keep_event=config.mode.KEEP_EVENT, event_obs=event_observables)
+              keep_event=config.mode.KEEP_EVENT, event_obs=event_observables,
+              keep_dir=checkpoints is not None)
 
 except BaseException as error:
     logging.exception('Unhandled error: {}'.format(str(error)))
@@ -519,7 +729,13 @@ except BaseException as error:
 
     # Clean up and get everything sorted
     safe_exit(resultsDataFrame=results, hadrons_df=hadrons, temp_dir=temp_dir, filename=resultsFilename, identifier=identifierString,
-              keep_event=config.mode.KEEP_EVENT, event_obs=event_observables)
+              keep_event=config.mode.KEEP_EVENT, event_obs=event_observables,
+              keep_dir=checkpoints is not None)
+
+# Stop the event pipeline and delete any events it generated ahead, keeping an interrupted event to be resumed
+if pipeline is not None:
+    kept_event = checkpoints.load('event') if checkpoints is not None else None
+    pipeline.close(keep=[kept_event['event_dir']] if kept_event is not None else [])
 
 logging.info('Results identifier: {}'.format(identifierString))
 logging.info('Successful clean exit!')
@@ -1,7 +1,9 @@
 import numpy as np
 import lhapdf
 
-def frag(parton):
+# Function to sample a fragmentation z value for the parton
+# Draws from rng, if given, or a fresh unseeded generator.
+def frag(parton, rng=None):
     # Get jet properties
     jet_pt = parton.p_T()
     jet_pid = parton.id
@@ -10,8 +12,9 @@ def frag(parton):
     z_min = 0.01
     z_max = 1
 
-    # Start an rng instance
-    rng = np.random.default_rng()
+    # Start an rng instance, if none given
+    if rng is None:
+        rng = np.random.default_rng()
 
     # Define probability distribution of z values
     def frag_p_z(ff, pid, pt_part):
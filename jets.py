@@ -1,4 +1,5 @@
 import numpy as np
+import math
 import logging
 
 # Parton object class. Useful for plotting and simplifying everything.
@@ -6,6 +7,11 @@ import logging
 # Note parton velocity (v0) in fraction of speed of light
 # Note parton angle (theta0) in radians
 class parton:
+    # Fixed attribute layout. Momentum is held privately so that |p|, phi, and beta can be cached
+    # and recomputed only when p_x or p_y change.
+    __slots__ = ('phi_0', 'p_T0', 'x_0', 'y_0', 'part', 'weight', 'm', 'id', 'tag', 'no', 'record',
+                 'beta_0', 'x', 'y', '_p_x', '_p_y', '_p_T', '_phi', '_beta')
+
     # Instantiation statement. All parameters optional.
     def __init__(self, x_0=0, y_0=0, phi_0=0, p_T0=100, part=None, tag=None, no=None, weight=1):
         logging.info('Creating new parton...')
@@ -61,8 +67,8 @@ class parton:
         self.record = None
 
         # Muck about with your coordinates
-        self.p_x = self.p_T0 * np.cos(self.phi_0)
-        self.p_y = self.p_T0 * np.sin(self.phi_0)
+        self.p_x = self.p_T0 * math.cos(self.phi_0)
+        self.p_y = self.p_T0 * math.sin(self.phi_0)
 
         # Set calculated properties
         self.beta_0 = self.beta()
@@ -71,6 +77,43 @@ class parton:
         self.x = self.x_0
         self.y = self.y_0
 
+    # Momentum components are properties so that any change, from inside or outside the class,
+    # drops the cached |p|, momentum angle, and velocity.
+    @property
+    def p_x(self):
+        return self._p_x
+
+    @p_x.setter
+    def p_x(self, value):
+        self._p_x = value
+        self._p_T = None
+
+    @property
+    def p_y(self):
+        return self._p_y
+
+    @p_y.setter
+    def p_y(self, value):
+        self._p_y = value
+        self._p_T = None
+
+    # Recompute |p|, momentum angle, and velocity after a momentum change
+    def _update_mom(self):
+        p_x = float(self._p_x)
+        p_y = float(self._p_y)
+        p_T = math.sqrt(p_x * p_x + p_y * p_y)
+        self._phi = math.atan2(p_y, p_x) % (2 * math.pi)
+        # On-shell condition with c=1: p = gamma * m * beta
+        # beta = p / sqrt(m^2 + p^2)
+        # A massless parton with no momentum is taken to be at rest.
+        if p_T > 0 or self.m > 0:
+            beta = p_T / math.sqrt(self.m * self.m + p_T * p_T)
+        else:
+            beta = 0.0
+        # Cached as NumPy scalars so callers keep NumPy division semantics (inf / nan rather than raising)
+        self._beta = np.float64(beta)
+        self._p_T = np.float64(p_T)
+
     # Method to obtain the current 2D coordinates of the parton
     def coords(self):
         return np.array([self.x, self.y])
@@ -81,66 +124,67 @@ class parton:
 
     # Method to obtain the current polar coordinates of the parton
     def polar_coords(self):
-        phi = np.mod(np.arctan2(self.y, self.x), 2 * np.pi)
-        rho = np.sqrt(self.x ** 2 + self.y ** 2)
+        phi = math.atan2(self.y, self.x) % (2 * math.pi)
+        rho = math.sqrt(self.x ** 2 + self.y ** 2)
         return np.array([rho, phi])
 
     # Method to obtain the current polar coordinates of the parton
     def polar_mom_coords(self):
-        phi = np.mod(np.arctan2(float(self.p_y), float(self.p_x)), 2 * np.pi)
-        rho = np.sqrt(self.p_x ** 2 + self.p_y ** 2)
-        return np.array([rho, phi])
+        if self._p_T is None:
+            self._update_mom()
+        return np.array([self._p_T, self._phi])
 
     # Method to add a given momentum in xy coordinates to the parton
     def add_q(self, dp_x=0, dp_y=0):
-        self.p_x = float(self.p_x + dp_x)
-        self.p_y = float(self.p_y + dp_y)
+        self.p_x = float(self._p_x + dp_x)
+        self.p_y = float(self._p_y + dp_y)
 
     # Method to add given relative perpendicular momentum to the parton
     def add_q_perp(self, q_perp):
-        angle = self.polar_mom_coords()[1] + (np.pi / 2)
-        dp_x = q_perp * np.cos(angle)
-        dp_y = q_perp * np.sin(angle)
-        self.add_q(dp_x=dp_x, dp_y=dp_y)
+        if self._p_T is None:
+            self._update_mom()
+        angle = self._phi + (math.pi / 2)
+        self.add_q(dp_x=q_perp * math.cos(angle), dp_y=q_perp * math.sin(angle))
 
     # Method to add given relative parallel momentum to the parton
     def add_q_par(self, q_par):
-        angle = self.polar_mom_coords()[1]
-        dp_x = q_par * np.cos(angle)
-        dp_y = q_par * np.sin(angle)
-        self.add_q(dp_x=dp_x, dp_y=dp_y)
+        if self._p_T is None:
+            self._update_mom()
+        angle = self._phi
+        self.add_q(dp_x=q_par * math.cos(angle), dp_y=q_par * math.sin(angle))
 
     # Method to propagate the parton for time tau
     def prop(self, tau=0):
-        rho, phi = self.polar_mom_coords()
-        self.x = float(self.x + self.beta() * np.cos(phi) * tau)
-        self.y = float(self.y + self.beta() * np.sin(phi) * tau)
+        if self._p_T is None:
+            self._update_mom()
+        step = float(self._beta) * tau
+        self.x = float(self.x + step * math.cos(self._phi))
+        self.y = float(self.y + step * math.sin(self._phi))
 
     # Method to obtain the coordinates of the parton in tau amount of time
     def coords_in(self, tau=0):
-        rho, phi = self.polar_mom_coords()
-        new_x = self.x + self.beta() * np.cos(phi) * tau
-        new_y = self.y + self.beta() * np.sin(phi) * tau
+        if self._p_T is None:
+            self._update_mom()
+        step = float(self._beta) * tau
+        new_x = self.x + step * math.cos(self._phi)
+        new_y = self.y + step * math.sin(self._phi)
         return np.array([new_x, new_y])
 
     # Method to obtain the coordinates of the parton in tau amount of time
     # given the current trajectory
     def coords3_in(self, tau=0, time=0):
-        rho, phi = self.polar_mom_coords()
-        new_x = self.x + self.beta() * np.cos(phi) * tau
-        new_y = self.y + self.beta() * np.sin(phi) * tau
+        new_x, new_y = self.coords_in(tau=tau)
         return np.array([time, new_x, new_y])
 
     # Method to obtain parton p_T
     def p_T(self):
-        return np.sqrt(self.p_x**2 + self.p_y**2)
+        if self._p_T is None:
+            self._update_mom()
+        return self._p_T
 
     # Method to obtain parton velocity (fraction of light speed)
     # Uses relativistic on-shell condition
     def beta(self):
-        # On-shell condition with c=1: p = gamma * m * beta
-        # beta is fraction of speed of light
-        # beta = p / sqrt(m^2 + p^2)
-        return self.p_T() / np.sqrt(self.m**2 + self.p_T()**2)
-
-
+        if self._p_T is None:
+            self._update_mom()
+        return self._beta
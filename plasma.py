@@ -7,6 +7,7 @@ try:
 except:
     print('NO MATPLOTLIB')
 from scipy.interpolate import RegularGridInterpolator
+from multiprocessing import shared_memory
 import config
 import logging
 
@@ -353,6 +354,19 @@ class osu_hydro_file:
 
         return minTemp
 
+# Gridded fields of a plasma event, as named in plasma_event and its constructor
+SHARED_FIELDS = {
+    'temp': 'temp_func',
+    'x_vel': 'x_vel_func',
+    'y_vel': 'y_vel_func',
+    'temp_grad_x': 'grad_x_func',
+    'temp_grad_y': 'grad_y_func',
+    'grad_x_u_x': 'grad_x_u_x_func',
+    'grad_x_u_y': 'grad_x_u_y_func',
+    'grad_y_u_x': 'grad_y_u_x_func',
+    'grad_y_u_y': 'grad_y_u_y_func'
+}
+
 
 # Plasma object as used for integration and muckery
 class plasma_event:
@@ -414,8 +428,72 @@ class plasma_event:
             raise Exception
 
         self.rmax = rmax
+        self.cold_horizons = {}
+
+
+
+    # Method to find the cold horizon of the event for a given temperature threshold
+    # Returns the grid times and, for each, the radius outside of which the temperature stays at or below the
+    # threshold from that time on (-inf once the whole event is at or below it), or None if the temperature is not
+    # a gridded interpolator. The radii are padded by a cell diagonal, as the interpolated temperature within a cell
+    # can only exceed the threshold if one of its corners does.
+    def cold_horizon(self, threshold):
+        if threshold in self.cold_horizons:
+            return self.cold_horizons[threshold]
+
+        try:
+            t_space, x_space, y_space = self.temp.grid
+            temp_values = np.asarray(self.temp.values)
+        except AttributeError:
+            return None
+
+        # Find radius of the hot region in each time slice
+        radius = np.sqrt(x_space[:, np.newaxis] ** 2 + y_space[np.newaxis, :] ** 2)
+        hot = temp_values > threshold
+        hot_radius = np.amax(np.where(hot, radius, -np.inf), axis=(1, 2))
+
+        # Take the largest hot radius at this or any later time
+        horizon = np.maximum.accumulate(hot_radius[::-1])[::-1]
+        horizon = horizon + np.sqrt(np.amax(np.diff(x_space)) ** 2 + np.amax(np.diff(y_space)) ** 2)
+
+        self.cold_horizons[threshold] = (np.asarray(t_space), horizon)
+        return self.cold_horizons[threshold]
+
+    # Method to return the cold horizon radius at a given time (see cold_horizon), or None if there is none
+    def horizon_radius(self, time, threshold):
+        horizon = self.cold_horizon(threshold=threshold)
+        if horizon is None:
+            return None
+        t_space, radii = horizon
+        index = np.clip(np.searchsorted(t_space, time, side='right') - 1, 0, len(t_space) - 1)
+        return radii[index]
+
+    # Method to publish the event's gridded fields into a single shared memory block
+    # Returns a shared_plasma handle, which can be pickled to other processes and attached there to rebuild an
+    # equivalent event that reads the grids in place. The fields must all be interpolators on the temperature grid.
+    # The caller owns the block and must release it with the handle's unlink() once all consumers are done.
+    def share(self):
+        grid = tuple(np.asarray(axis, dtype=np.float64) for axis in self.temp.grid)
+        fields = []
+        for field in SHARED_FIELDS:
+            interpolator = getattr(self, field)
+            try:
+                same_grid = all(np.array_equal(axis, grid_axis) for axis, grid_axis in zip(interpolator.grid, grid))
+            except AttributeError:
+                same_grid = False
+            if not same_grid:
+                raise ValueError('Plasma field {} is not an interpolator on the temperature grid'.format(field))
+            fields.append(field)
 
+        shape = (len(fields),) + tuple(len(axis) for axis in grid)
+        block = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * np.dtype(np.float64).itemsize)
+        values = np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+        for i, field in enumerate(fields):
+            values[i] = getattr(self, field).values
+        del values
 
+        return shared_plasma(block=block, fields=fields, shape=shape, grid=grid, name=self.name,
+                             timestep=self.timestep, gridstep=getattr(self, 'gridstep', None), rmax=self.rmax)
 
     # Method to get array on space domain of event with given resolution
     def xspace(self, resolution=100, fraction=1):
@@ -815,6 +893,69 @@ class plasma_event:
         return temps, vels, grads, tempcb, velcb, gradcb
 
 
+# Handle to a plasma event's gridded fields in shared memory, as made by plasma_event.share()
+# Pickles to the block name and the (small) grid axes, so it is cheap to send to worker processes. attach() rebuilds
+# an equivalent plasma_event whose interpolators are views onto the shared block, so any number of processes hold a
+# single copy of the grids. Attached events keep the block open for as long as they exist.
+class shared_plasma:
+    def __init__(self, block, fields, shape, grid, name=None, timestep=None, gridstep=None, rmax=None):
+        self.block = block
+        self.block_name = block.name
+        self.fields = list(fields)
+        self.shape = tuple(shape)
+        self.grid = grid
+        self.name = name
+        self.timestep = timestep
+        self.gridstep = gridstep
+        self.rmax = rmax
+
+    # Only the block name travels with the handle
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['block'] = None
+        return state
+
+    # Method to open the shared block, without tracking it for cleanup in this process where possible
+    def open_block(self):
+        if self.block is None:
+            try:
+                self.block = shared_memory.SharedMemory(name=self.block_name, track=False)
+            except TypeError:
+                # Python < 3.13 always registers the block with the resource tracker
+                self.block = shared_memory.SharedMemory(name=self.block_name)
+        return self.block
+
+    # Method to rebuild a plasma_event reading its fields from the shared block
+    def attach(self):
+        block = self.open_block()
+        values = np.ndarray(self.shape, dtype=np.float64, buffer=block.buf)
+        values.flags.writeable = False
+        interpolators = {SHARED_FIELDS[field]: RegularGridInterpolator(self.grid, values[i])
+                         for i, field in enumerate(self.fields)}
+        event = plasma_event(name=self.name, rmax=self.rmax, **interpolators)
+        event.timestep = self.timestep
+        if self.gridstep is not None:
+            event.gridstep = self.gridstep
+        event.shared_block = block
+        return event
+
+    # Method to close this process's view of the block
+    # The view stays open while attached events from this handle still exist.
+    def close(self):
+        if self.block is not None:
+            try:
+                self.block.close()
+            except BufferError:
+                logging.debug('Shared plasma block still in use by attached events')
+            self.block = None
+
+    # Method to free the shared block, called once by its owner when all consumers are done
+    def unlink(self):
+        block = self.open_block()
+        block.unlink()
+        self.close()
+
+
 # Takes callable functions that take parameters (t, x, y) for the temperature and velocities
 # and returns plasma_event objects generated from them.
 def functional_plasma(temp_func=None, x_vel_func=None, y_vel_func=None, name=None,
@@ -61,6 +61,27 @@ def inv_lambda(event, parton, point, med_parton='all'):
     else:
         return sigma(event, parton, point, med_parton=med_parton) * event.rho(point, med_parton=med_parton)
 
+# Function to average a function of the medium over a parton's next step
+# Uses the same step points as sample_medium for config.jet.PATH_INTEGRAL, so the scalar integrands integrate each step
+# as the batched kernels do: 'samples' takes the utilities.dtau_avg points, while 'cells' takes the quadrature points
+# of utilities.cell_traversal_points (falling back to 'samples' for events not defined on a grid). As in
+# sample_medium, the average over a step leaving the event bounds is zero.
+def step_avg(event, func, point, phi, dtau, beta):
+    grid = getattr(event.temp, 'grid', None)
+    if config.jet.PATH_INTEGRAL != 'cells' or grid is None:
+        return utilities.dtau_avg(func=func, point=point, phi=phi, dtau=dtau, beta=beta)
+
+    points, weights = utilities.cell_traversal_points(t=point[0], x=point[1], y=point[2], phi=phi, beta=beta,
+                                                      dtau=dtau, grid=grid)
+    step_end = np.array([point[0] + dtau, point[1] + beta * dtau * np.cos(phi), point[2] + beta * dtau * np.sin(phi)])
+    for step_point in [point, step_end]:
+        if not (event.t0 <= step_point[0] <= event.tf and event.xmin <= step_point[1] <= event.xmax
+                and event.ymin <= step_point[2] <= event.ymax):
+            return 0
+    used = weights[0] > 0
+    return np.sum(func(points[0][used]) * weights[0][used])
+
+
 # Define integrand for mean q_drift (k=0 moment)
 def drift_integrand(event, parton, time):
     FmGeV = 1/0.19732687
@@ -72,14 +93,14 @@ def drift_integrand(event, parton, time):
     beta = parton.beta()
 
     # Average medium parameters
-    u_perp = utilities.dtau_avg(func=lambda x : event.u_perp(point=x, phi=p_phi), point=point, phi=p_phi,
-                                dtau=config.jet.DTAU, beta=beta)
-    u_tau = utilities.dtau_avg(func=lambda x : event.u_par(point=x, phi=p_phi), point=point, phi=p_phi,
-                                dtau=config.jet.DTAU, beta=beta)
-    mu = utilities.dtau_avg(func=lambda x : event.mu(point=x), point=point, phi=p_phi,
-                            dtau=config.jet.DTAU, beta=beta)
-    inv_lambda_val = utilities.dtau_avg(func=lambda x : inv_lambda(event=event, parton=parton, point=x),
-                                        point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
+    u_perp = step_avg(event=event, func=lambda x : event.u_perp(point=x, phi=p_phi), point=point, phi=p_phi,
+                      dtau=config.jet.DTAU, beta=beta)
+    u_tau = step_avg(event=event, func=lambda x : event.u_par(point=x, phi=p_phi), point=point, phi=p_phi,
+                     dtau=config.jet.DTAU, beta=beta)
+    mu = step_avg(event=event, func=lambda x : event.mu(point=x), point=point, phi=p_phi,
+                  dtau=config.jet.DTAU, beta=beta)
+    inv_lambda_val = step_avg(event=event, func=lambda x : inv_lambda(event=event, parton=parton, point=x),
+                              point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
 
     # Source link? -- Converts factor of fermi from integral to factor of GeV^{-1}
     return ((FmGeV) * (1 / parton.p_T()) * config.jet.K_F_DRIFT
@@ -99,17 +120,17 @@ def flowgrad_T_integrand(event, parton, time):
     beta = parton.beta()
 
     # Average medium parameters
-    T = utilities.dtau_avg(func=event.temp, point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
-    u_perp = utilities.dtau_avg(func=lambda x: event.u_perp(point=x, phi=p_phi), point=point, phi=p_phi,
-                                dtau=config.jet.DTAU, beta=beta)
-    u_tau = utilities.dtau_avg(func=lambda x: event.u_par(point=x, phi=p_phi), point=point, phi=p_phi,
-                               dtau=config.jet.DTAU, beta=beta)
-    mu = utilities.dtau_avg(func=lambda x: event.mu(point=x), point=point, phi=p_phi,
-                            dtau=config.jet.DTAU, beta=beta)
-    inv_lambda_val = utilities.dtau_avg(func=lambda x: inv_lambda(event=event, parton=parton, point=x),
-                                        point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
-    grad_perp_temp = utilities.dtau_avg(func=lambda x: event.grad_perp_T(point=x, phi=p_phi),
-                                        point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
+    T = step_avg(event=event, func=event.temp, point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
+    u_perp = step_avg(event=event, func=lambda x: event.u_perp(point=x, phi=p_phi), point=point, phi=p_phi,
+                      dtau=config.jet.DTAU, beta=beta)
+    u_tau = step_avg(event=event, func=lambda x: event.u_par(point=x, phi=p_phi), point=point, phi=p_phi,
+                     dtau=config.jet.DTAU, beta=beta)
+    mu = step_avg(event=event, func=lambda x: event.mu(point=x), point=point, phi=p_phi,
+                  dtau=config.jet.DTAU, beta=beta)
+    inv_lambda_val = step_avg(event=event, func=lambda x: inv_lambda(event=event, parton=parton, point=x),
+                              point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
+    grad_perp_temp = step_avg(event=event, func=lambda x: event.grad_perp_T(point=x, phi=p_phi),
+                              point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
 
     return - ((FmGeV) * (3 / E) * config.jet.K_FG_DRIFT * (time - event.t0)
               * 3 * grad_perp_temp * ((u_perp**2)/((1 - u_tau)**2)) * (1/T)
@@ -128,16 +149,16 @@ def flowgrad_utau_integrand(event, parton, time):
 
     # Average medium parameters
     #T = utilities.dtau_avg(func=event.temp, point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
-    u_perp = utilities.dtau_avg(func=lambda x: event.u_perp(point=x, phi=p_phi), point=point, phi=p_phi,
-                                dtau=config.jet.DTAU, beta=beta)
-    u_tau = utilities.dtau_avg(func=lambda x: event.u_par(point=x, phi=p_phi), point=point, phi=p_phi,
-                               dtau=config.jet.DTAU, beta=beta)
-    mu = utilities.dtau_avg(func=lambda x: event.mu(point=x), point=point, phi=p_phi,
-                            dtau=config.jet.DTAU, beta=beta)
-    inv_lambda_val = utilities.dtau_avg(func=lambda x: inv_lambda(event=event, parton=parton, point=x),
-                                        point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
-    grad_perp_u_tau = utilities.dtau_avg(func=lambda x: event.grad_perp_u_par(point=x, phi=p_phi),
-                                        point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
+    u_perp = step_avg(event=event, func=lambda x: event.u_perp(point=x, phi=p_phi), point=point, phi=p_phi,
+                      dtau=config.jet.DTAU, beta=beta)
+    u_tau = step_avg(event=event, func=lambda x: event.u_par(point=x, phi=p_phi), point=point, phi=p_phi,
+                     dtau=config.jet.DTAU, beta=beta)
+    mu = step_avg(event=event, func=lambda x: event.mu(point=x), point=point, phi=p_phi,
+                  dtau=config.jet.DTAU, beta=beta)
+    inv_lambda_val = step_avg(event=event, func=lambda x: inv_lambda(event=event, parton=parton, point=x),
+                              point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
+    grad_perp_u_tau = step_avg(event=event, func=lambda x: event.grad_perp_u_par(point=x, phi=p_phi),
+                               point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
 
     # Source link? -- Converts factor of fermi from integral to factor of GeV^{-1}
     return - ((FmGeV) * (3 / E) * config.jet.K_FG_DRIFT * (time - event.t0)
@@ -157,16 +178,16 @@ def flowgrad_uperp_integrand(event, parton, time):
 
     # Average medium parameters
     # T = utilities.dtau_avg(func=event.temp, point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
-    u_perp = utilities.dtau_avg(func=lambda x: event.u_perp(point=x, phi=p_phi), point=point, phi=p_phi,
-                                dtau=config.jet.DTAU, beta=beta)
-    u_tau = utilities.dtau_avg(func=lambda x: event.u_par(point=x, phi=p_phi), point=point, phi=p_phi,
-                               dtau=config.jet.DTAU, beta=beta)
-    mu = utilities.dtau_avg(func=lambda x: event.mu(point=x), point=point, phi=p_phi,
-                            dtau=config.jet.DTAU, beta=beta)
-    inv_lambda_val = utilities.dtau_avg(func=lambda x: inv_lambda(event=event, parton=parton, point=x),
-                                        point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
-    grad_perp_u_perp = utilities.dtau_avg(func=lambda x: event.grad_perp_u_perp(point=x, phi=p_phi),
-                                          point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
+    u_perp = step_avg(event=event, func=lambda x: event.u_perp(point=x, phi=p_phi), point=point, phi=p_phi,
+                      dtau=config.jet.DTAU, beta=beta)
+    u_tau = step_avg(event=event, func=lambda x: event.u_par(point=x, phi=p_phi), point=point, phi=p_phi,
+                     dtau=config.jet.DTAU, beta=beta)
+    mu = step_avg(event=event, func=lambda x: event.mu(point=x), point=point, phi=p_phi,
+                  dtau=config.jet.DTAU, beta=beta)
+    inv_lambda_val = step_avg(event=event, func=lambda x: inv_lambda(event=event, parton=parton, point=x),
+                              point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
+    grad_perp_u_perp = step_avg(event=event, func=lambda x: event.grad_perp_u_perp(point=x, phi=p_phi),
+                                point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
 
     # Source link? -- Converts factor of fermi from integral to factor of GeV^{-1}
     return - ((FmGeV) * (3 / E) * config.jet.K_FG_DRIFT * (time - event.t0)
@@ -175,41 +196,26 @@ def flowgrad_uperp_integrand(event, parton, time):
               * np.log(E / mu))
 
 # Function to sample ebe fluctuation zeta parameter for energy loss integral
-def zeta(q=0, maxAttempts=5, batch=1000):
-    # Special cases making things easier
-    if q == 0:
+# The PDF P(x) = ((1 + q) / (q + 2)^(1 + q)) * (q + 2 - x)^q on [0, q + 2] has the closed form CDF
+# F(x) = 1 - ((q + 2 - x) / (q + 2))^(1 + q), so we sample by inverting it on uniform random numbers.
+# Returns a single float if num is None, else an array of num samples.
+def zeta(q=0, num=None, rng=None):
+    # Special case making things easier
+    if q == -1:
+        if num is None:
+            return 1
+        return np.ones(num)
+
+    if rng is None:
         rng = np.random.default_rng()
-        return rng.random() * 2
-    elif q == -1:
-        return 1
-
-    attempt = 0
-    while attempt < maxAttempts:
-        # Generate random point in 3D box of l = w = gridWidth and height maximum temp.^6
-        # Origin at center of bottom of box
-        pointArray = utilities.random_2d(num=batch, boxSize=q + 2, maxProb=1)
-        for point in pointArray:
-            x = point[0]
-            y = point[1]
-            targetVal = ((1 + q) / ((q + 2) ** (1 + q))) * ((q + 2 - x) ** q)
-
-            # Check if point under 2D temp PDF curve
-            if float(y) < float(targetVal):
-                # If under curve, accept point and return
-                # print("Attempt " + str(attempt) + " successful with point " + str(i) + "!!!")
-                # print(point)
-                # print("Random height: " + str(zPoints[i]))
-                # print("Target <= height: " + str(float(targetTemp)))
-                return x
-        print("Zeta Parameter Sample Attempt: " + str(attempt) + " failed.")
-        attempt += 1
-    print("Catastrophic error in zeta parameter sampling!")
-    print("AHHHHHHHHHHHHHHH!!!!!!!!!!!")
-    return 0
+
+    u = rng.random(num)
+    return (q + 2) * (1 - (1 - u) ** (1 / (1 + q)))
 
 
 # Integrand for energy loss
-def energy_loss_integrand(event, parton, time, tau, model='BBMG', fgqhat=False, mean_el_rate=0):
+# zeta_val is a pre-sampled BBMG fluctuation parameter (see zeta()) -- if None, fluctuations are off (q = -1).
+def energy_loss_integrand(event, parton, time, tau, model='BBMG', fgqhat=False, mean_el_rate=0, zeta_val=None):
     FmGeV = 1/0.19732687
 
     # Get parton coordinates
@@ -219,18 +225,21 @@ def energy_loss_integrand(event, parton, time, tau, model='BBMG', fgqhat=False,
     beta = parton.beta()
 
     # Average medium parameters
-    T = utilities.dtau_avg(func=event.temp, point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
-    mu = utilities.dtau_avg(func=lambda x: event.mu(point=x), point=point, phi=p_phi,
-                            dtau=config.jet.DTAU, beta=beta)
-    inv_lambda_val = utilities.dtau_avg(func=lambda x: inv_lambda(event=event, parton=parton, point=x),
-                                        point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
-    vel = utilities.dtau_avg(func=event.vel, point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
+    T = step_avg(event=event, func=event.temp, point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
+    mu = step_avg(event=event, func=lambda x: event.mu(point=x), point=point, phi=p_phi,
+                  dtau=config.jet.DTAU, beta=beta)
+    inv_lambda_val = step_avg(event=event, func=lambda x: inv_lambda(event=event, parton=parton, point=x),
+                              point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
+    vel = step_avg(event=event, func=event.vel, point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
+
+    if zeta_val is None:
+        zeta_val = zeta(q=-1)
 
     # Select energy loss model and return appropriate energy loss
     if model == 'BBMG':
         # Note that we apply FERMI GeV twice... Once for the t factor, once for the (int dt).
         return (config.jet.K_BBMG * (-1) * ((FmGeV) ** 2) * time * (T ** 3)
-                * zeta(q=-1) * (1 / np.sqrt(1 - (vel**2)))
+                * zeta_val * (1 / np.sqrt(1 - (vel**2)))
                 * (1))
     elif model == 'GLV':
         # https://inspirehep.net/literature/539404
@@ -315,13 +324,13 @@ def fg_T_qhat_mod_factor(event, parton, time):
     beta = parton.beta()
 
     # Average medium parameters
-    T = utilities.dtau_avg(func=event.temp, point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
-    u_perp = utilities.dtau_avg(func=lambda x: event.u_perp(point=x, phi=p_phi), point=point, phi=p_phi,
-                                dtau=config.jet.DTAU, beta=beta)
-    u_tau = utilities.dtau_avg(func=lambda x: event.u_par(point=x, phi=p_phi), point=point, phi=p_phi,
-                               dtau=config.jet.DTAU, beta=beta)
-    grad_perp_temp = utilities.dtau_avg(func=lambda x: event.grad_perp_T(point=x, phi=p_phi),
-                                          point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
+    T = step_avg(event=event, func=event.temp, point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
+    u_perp = step_avg(event=event, func=lambda x: event.u_perp(point=x, phi=p_phi), point=point, phi=p_phi,
+                      dtau=config.jet.DTAU, beta=beta)
+    u_tau = step_avg(event=event, func=lambda x: event.u_par(point=x, phi=p_phi), point=point, phi=p_phi,
+                     dtau=config.jet.DTAU, beta=beta)
+    grad_perp_temp = step_avg(event=event, func=lambda x: event.grad_perp_T(point=x, phi=p_phi),
+                              point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
 
     return (-1) * (time - event.t0) * (3 * grad_perp_temp * (u_perp / (1-u_tau)) * (1/T))
 
@@ -334,12 +343,12 @@ def fg_utau_qhat_mod_factor(event, parton, time):
     beta = parton.beta()
 
     # Average medium parameters
-    u_perp = utilities.dtau_avg(func=lambda x: event.u_perp(point=x, phi=p_phi), point=point, phi=p_phi,
-                                dtau=config.jet.DTAU, beta=beta)
-    u_tau = utilities.dtau_avg(func=lambda x: event.u_par(point=x, phi=p_phi), point=point, phi=p_phi,
-                               dtau=config.jet.DTAU, beta=beta)
-    grad_perp_u_tau = utilities.dtau_avg(func=lambda x: event.grad_perp_u_par(point=x, phi=p_phi),
-                                         point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
+    u_perp = step_avg(event=event, func=lambda x: event.u_perp(point=x, phi=p_phi), point=point, phi=p_phi,
+                      dtau=config.jet.DTAU, beta=beta)
+    u_tau = step_avg(event=event, func=lambda x: event.u_par(point=x, phi=p_phi), point=point, phi=p_phi,
+                     dtau=config.jet.DTAU, beta=beta)
+    grad_perp_u_tau = step_avg(event=event, func=lambda x: event.grad_perp_u_par(point=x, phi=p_phi),
+                               point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
 
     return (-1) * (time - event.t0) * (grad_perp_u_tau * (u_perp / ((1-u_tau)**2)))
 
@@ -351,39 +360,45 @@ def fg_uperp_qhat_mod_factor(event, parton, time):
     beta = parton.beta()
 
     # Average medium parameters
-    u_perp = utilities.dtau_avg(func=lambda x: event.u_perp(point=x, phi=p_phi), point=point, phi=p_phi,
-                                dtau=config.jet.DTAU, beta=beta)
-    u_tau = utilities.dtau_avg(func=lambda x: event.u_par(point=x, phi=p_phi), point=point, phi=p_phi,
-                               dtau=config.jet.DTAU, beta=beta)
-    grad_perp_u_perp = utilities.dtau_avg(func=lambda x: event.grad_perp_u_perp(point=x, phi=p_phi),
-                                          point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
+    u_perp = step_avg(event=event, func=lambda x: event.u_perp(point=x, phi=p_phi), point=point, phi=p_phi,
+                      dtau=config.jet.DTAU, beta=beta)
+    u_tau = step_avg(event=event, func=lambda x: event.u_par(point=x, phi=p_phi), point=point, phi=p_phi,
+                     dtau=config.jet.DTAU, beta=beta)
+    grad_perp_u_perp = step_avg(event=event, func=lambda x: event.grad_perp_u_perp(point=x, phi=p_phi),
+                                point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
 
     return (-1) * (time - event.t0) * (grad_perp_u_perp * (1 / (1-u_tau)))
 
 class num_eloss_interpolator():
     # Instantiation statement. All parameters optional.
-    def __init__(self):
+    # g selects the tables for the given coupling, defaulting to config.constants.G.
+    def __init__(self, g=None):
         logging.info('Loading numerical energy loss tables...')
+        if g is None:
+            g = config.constants.G
+        self.g = g
         # Find directory of this file
         project_path = os.path.dirname(os.path.realpath(__file__))
 
         # Load tables of computed brick energy loss
-        if config.constants.G == 1.7:
-            self.g_table = np.load(project_path + '/e_loss_tables/g1.7_deltaE_samples_g_1subdiv.npz')
-            self.q_table = np.load(project_path + '/e_loss_tables/g1.7_deltaE_samples_q_1subdiv.npz')
-        elif config.constants.G == 1.8:
-            self.g_table = np.load(project_path + '/e_loss_tables/g1.8_deltaE_samples_g_1subdiv.npz')
-            self.q_table = np.load(project_path + '/e_loss_tables/g1.8_deltaE_samples_q_1subdiv.npz')
-        elif config.constants.G == 1.9:
-            self.g_table = np.load(project_path + '/e_loss_tables/g1.9_deltaE_samples_g_1subdiv.npz')
-            self.q_table = np.load(project_path + '/e_loss_tables/g1.9_deltaE_samples_q_1subdiv.npz')
-        elif config.constants.G == 2:
-            self.g_table = np.load(project_path + '/e_loss_tables/g2.0_deltaE_samples_g_1subdiv.npz')
-            self.q_table = np.load(project_path + '/e_loss_tables/g2.0_deltaE_samples_q_1subdiv.npz')
-        elif config.constants.G == 2.1:
-            self.g_table = np.load(project_path + '/e_loss_tables/g2.1_deltaE_samples_g_1subdiv.npz')
-            self.q_table = np.load(project_path + '/e_loss_tables/g2.1_deltaE_samples_q_1subdiv.npz')
-        else:
+        # Tables built by adaptive grid refinement (e_loss_tables/generate_tables.py) cover the full range of
+        # (E, T, L) queried in the time loop, so we prefer them over the fixed-grid tables, where available.
+        # Of the fixed-grid tables, we prefer those from the Gauss-Legendre backend ('gauss') over the adaptive ones.
+        self.g_table = None
+        self.q_table = None
+        # Tables are tabulated in steps of 0.1 in the coupling
+        table_tags = ['refined', 'gauss', '1subdiv'] if np.isclose(self.g, round(self.g, 1)) else []
+        for table_tag in table_tags:
+            g_table_path = project_path + '/e_loss_tables/g{:.1f}_deltaE_samples_g_{}.npz'.format(self.g,
+                                                                                                table_tag)
+            q_table_path = project_path + '/e_loss_tables/g{:.1f}_deltaE_samples_q_{}.npz'.format(self.g,
+                                                                                                table_tag)
+            if os.path.exists(g_table_path) and os.path.exists(q_table_path):
+                logging.info('Using {} energy loss tables for g={}'.format(table_tag, self.g))
+                self.g_table = np.load(g_table_path)
+                self.q_table = np.load(q_table_path)
+                break
+        if self.g_table is None or self.q_table is None:
             logging.error('No suitable energy loss table!!!')
             raise Exception
 
@@ -419,7 +434,7 @@ class num_eloss_interpolator():
         p_rho, p_phi = parton.polar_mom_coords()
 
         # Get medium properties averaged over timestep
-        T = utilities.dtau_avg(func=event.temp, point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
+        T = step_avg(event=event, func=event.temp, point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
         L = (2*(time - event.t0) + config.jet.DTAU)/2
 
         # Return energy loss rate for appropriate identity
@@ -431,6 +446,25 @@ class num_eloss_interpolator():
             part = 'q'
             return (-1) * float(self.q_dE_dx(np.array([E, T, L])))
 
+    # Batched eloss_rate for arrays of parton energy, velocity, angle, position, and PDG id (see batched kernels below)
+    def eloss_rate_batch(self, event, E, beta, phi, x, y, t, pid, medium=None):
+        E, pid = np.asarray(E, dtype=float), np.asarray(pid)
+        medium = get_medium(event, medium, ['temp'], t, x, y, phi, beta)
+
+        # Get medium properties averaged over timestep
+        T = medium_avg(medium, medium['temp'])
+        L = np.broadcast_to((2*(np.asarray(t) - event.t0) + config.jet.DTAU)/2, E.shape)
+
+        # Return energy loss rate for appropriate identity
+        # Note minus sign - positive values in table correspond to energy loss
+        rate = np.zeros_like(E)
+        gluon = pid == 21
+        if np.any(gluon):
+            rate[gluon] = (-1) * self.g_dE_dx(np.stack([E[gluon], T[gluon], L[gluon]], axis=-1))
+        if np.any(~gluon):
+            rate[~gluon] = (-1) * self.q_dE_dx(np.stack([E[~gluon], T[~gluon], L[~gluon]], axis=-1))
+        return rate
+
 # Integrand for energy loss
 # https://journals.aps.org/prd/pdf/10.1103/PhysRevD.44.R2625
 def coll_energy_loss_integrand(event, parton, time):
@@ -444,7 +478,7 @@ def coll_energy_loss_integrand(event, parton, time):
     beta = parton.beta()
 
     # Average medium parameters
-    T = utilities.dtau_avg(func=event.temp, point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
+    T = step_avg(event=event, func=event.temp, point=point, phi=p_phi, dtau=config.jet.DTAU, beta=beta)
     # Set C_R, "quadratic Casimir of the representation R of SU(3) for the parton"
     if parton.part == 'g':
         # For a gluon it's the adjoint representation C_A = N_c = 3
@@ -462,3 +496,348 @@ def coll_energy_loss_integrand(event, parton, time):
     return (-1) * FmGeV * CR * (3 / 4) * (8 * np.pi * (ALPHAS ** 2) / 3) * (1 + (nf / 6)) * (T ** 2) * np.log(
         (2 ** (nf / (2 * (6 + nf)))) * 0.920 * (np.sqrt(E * T) / mg))
 
+
+
+###########################
+# Batched parton kernels #
+###########################
+# Array-in/array-out versions of the integrands above, evaluating the rates for many partons at once.
+# Each kernel takes arrays of parton energy E, velocity beta, momentum angle phi, position (x, y), PDG id pid,
+# and the time t (scalar or array). The coupling g may be a scalar or per-parton array. Medium samples along each
+# parton's step can be precomputed with sample_medium() and passed in as medium, so that several kernels share a
+# single set of grid lookups.
+
+# Medium fields sampled for the drift & energy loss kernels
+MEDIUM_FIELDS = ('temp', 'x_vel', 'y_vel')
+
+# Medium fields sampled for the flow-gradient kernels
+FG_MEDIUM_FIELDS = ('grad_x_u_x', 'grad_x_u_y', 'grad_y_u_x', 'grad_y_u_y')
+
+# Medium fields sampled for the temperature-gradient kernels
+FG_T_MEDIUM_FIELDS = ('temp_grad_x', 'temp_grad_y')
+
+
+# Function to sample medium fields along the next step of many partons
+# Returns a dict of (N, S) arrays of each field at the sample points of each step, along with the mask 'valid' of
+# partons whose step lies entirely within the event bounds. As in utilities.dtau_avg, the average of any quantity
+# over a step leaving the event bounds is zero.
+# path selects how steps are sampled, defaulting to config.jet.PATH_INTEGRAL:
+# 'samples' -- the num_samples dtau_avg points along each step, averaged evenly.
+# 'cells' -- Gauss-Legendre points on each piece of the step within a grid cell (utilities.cell_traversal_points),
+#            averaged with the quadrature 'weights' also returned. This integrates the interpolated fields exactly.
+#            Falls back to 'samples' for events not defined on a grid.
+# If share_tol is given, partons whose steps start and end at the same points within share_tol share one set of
+# samples.
+def sample_medium(event, t, x, y, phi, beta, fields=MEDIUM_FIELDS, dtau=None, num_samples=10, share_tol=None,
+                  path=None):
+    if dtau is None:
+        dtau = config.jet.DTAU
+    if path is None:
+        path = config.jet.PATH_INTEGRAL
+    grid = getattr(event.temp, 'grid', None)
+
+    t, x, y, phi, beta = np.broadcast_arrays(*[np.atleast_1d(np.asarray(val, dtype=float))
+                                               for val in [t, x, y, phi, beta]])
+    step_ends = np.stack([t, x, y, x + beta * dtau * np.cos(phi), y + beta * dtau * np.sin(phi)], axis=-1)
+
+    if share_tol is not None:
+        unique, inverse = utilities.unique_rows(step_ends, tol=share_tol)
+        if len(unique) < len(x):
+            medium = sample_medium(event=event, t=t[unique], x=x[unique], y=y[unique], phi=phi[unique],
+                                   beta=beta[unique], fields=fields, dtau=dtau, num_samples=num_samples, path=path)
+            return {key: value[inverse] for key, value in medium.items()}
+
+    if path == 'cells' and grid is not None:
+        points, weights = utilities.cell_traversal_points(t=t, x=x, y=y, phi=phi, beta=beta, dtau=dtau, grid=grid)
+        # The quadrature points lie between the ends of each step, so only the ends need be in bounds
+        step_start = np.stack([t, x, y], axis=-1)
+        step_end = np.stack([t + dtau, step_ends[:, 3], step_ends[:, 4]], axis=-1)
+        bound_points = np.stack([step_start, step_end], axis=1)
+    else:
+        points = utilities.dtau_sample_points(t=t, x=x, y=y, phi=phi, beta=beta, dtau=dtau, num_samples=num_samples)
+        weights = None
+        bound_points = points
+    valid = np.all((bound_points[..., 0] >= event.t0) & (bound_points[..., 0] <= event.tf)
+                   & (bound_points[..., 1] >= event.xmin) & (bound_points[..., 1] <= event.xmax)
+                   & (bound_points[..., 2] >= event.ymin) & (bound_points[..., 2] <= event.ymax), axis=1)
+
+    # Look up only the points used -- unused quadrature points take the value of the first used point of the step,
+    # so per-sample functions of the fields stay finite
+    if weights is None:
+        used = np.broadcast_to(valid[:, np.newaxis], points.shape[:2])
+    else:
+        used = valid[:, np.newaxis] & (weights > 0)
+
+    medium = {'valid': valid}
+    if weights is not None:
+        medium['weights'] = weights
+    for field in fields:
+        values = np.zeros(points.shape[:2])
+        if np.any(used):
+            values[used] = getattr(event, field)(points[used])
+        if weights is not None:
+            first = values[np.arange(len(values)), np.argmax(weights > 0, axis=1)]
+            values = np.where(weights > 0, values, first[:, np.newaxis])
+        medium[field] = values
+
+    return medium
+
+
+# Function to fetch the medium samples needed by a batched kernel, sampling any that were not supplied
+def get_medium(event, medium, fields, t, x, y, phi, beta):
+    if medium is None:
+        return sample_medium(event=event, t=t, x=x, y=y, phi=phi, beta=beta, fields=fields)
+    missing = [field for field in fields if field not in medium]
+    if missing:
+        medium = dict(medium)
+        medium.update(sample_medium(event=event, t=t, x=x, y=y, phi=phi, beta=beta, fields=missing))
+    return medium
+
+
+# Function to average per-sample values of a quantity over each parton's step
+# Uses the quadrature weights of the samples, if given, or else the plain mean.
+def medium_avg(medium, values):
+    if 'weights' in medium:
+        return np.where(medium['valid'], np.sum(values * medium['weights'], axis=1), 0)
+    return np.where(medium['valid'], np.mean(values, axis=1), 0)
+
+
+# Function to return the Debye mass from sampled temperatures, as in plasma_event.mu
+def mu_batch(T):
+    Nf = 2  # Number of light quark flavors
+    return config.constants.G_MU * T * np.sqrt(1 + Nf / 6)
+
+
+# Function to return inverse QGP drift mean free path from sampled temperatures, as in inv_lambda
+# pid broadcasts against T -- gluons (pid 21) scatter with gg & qg cross-sections, quarks with qg & qq.
+def inv_lambda_batch(T, pid, g=None):
+    if g is None:
+        g = config.constants.G
+    mu = mu_batch(T)
+    rho_g = 1.202056903159594 * 16 * (1 / (np.pi ** 2)) * T ** 3
+    rho_q = 1.202056903159594 * (3 / 4) * 24 * (1 / (np.pi ** 2)) * T ** 3
+    sigma_gg_gg = (9 / (32 * np.pi)) * g ** 4 / (mu ** 2)
+    sigma_qg_qg = (1 / (8 * np.pi)) * g ** 4 / (mu ** 2)
+    sigma_qq_qq = (1 / (18 * np.pi)) * g ** 4 / (mu ** 2)
+    return np.where(pid == 21,
+                    sigma_gg_gg * rho_g + sigma_qg_qg * rho_q,
+                    sigma_qg_qg * rho_g + sigma_qq_qq * rho_q)
+
+
+# Function to return the coupling for each parton, given as a scalar or per-parton array
+# Defaults to config.constants.G for all partons.
+def coupling_batch(g, E):
+    if g is None:
+        g = config.constants.G
+    return np.broadcast_to(np.asarray(g, dtype=float), np.shape(E))
+
+
+# Function to return the quadratic Casimir C_R for each parton
+# C_A = N_c = 3 for gluons, C_F = 4/3 for quarks
+def casimir_batch(pid):
+    return np.where(pid == 21, 3, 4 / 3)
+
+
+# Batched drift_integrand
+def drift_integrand_batch(event, E, beta, phi, x, y, t, pid, g=None, medium=None):
+    FmGeV = 1/0.19732687
+    E, phi, pid = np.asarray(E, dtype=float), np.asarray(phi, dtype=float), np.asarray(pid)
+    g = coupling_batch(g, E)
+    medium = get_medium(event, medium, MEDIUM_FIELDS, t, x, y, phi, beta)
+    sin_phi = np.sin(phi)[:, np.newaxis]
+    cos_phi = np.cos(phi)[:, np.newaxis]
+
+    # Average medium parameters
+    u_perp = medium_avg(medium, -medium['x_vel'] * sin_phi + medium['y_vel'] * cos_phi)
+    u_tau = medium_avg(medium, medium['x_vel'] * cos_phi + medium['y_vel'] * sin_phi)
+    mu = medium_avg(medium, mu_batch(medium['temp']))
+    inv_lambda_val = medium_avg(medium, inv_lambda_batch(medium['temp'], pid[:, np.newaxis], g=g[:, np.newaxis]))
+
+    return ((FmGeV) * (1 / E) * config.jet.K_F_DRIFT
+            * (3 * np.log(E/mu)
+               * (u_perp / (1 - u_tau))
+               * (mu**2)
+               * inv_lambda_val))
+
+
+# Batched energy_loss_integrand
+def energy_loss_integrand_batch(event, E, beta, phi, x, y, t, pid, model='BBMG', zeta_val=None, g=None,
+                                medium=None):
+    FmGeV = 1/0.19732687
+    E, phi, pid = np.asarray(E, dtype=float), np.asarray(phi, dtype=float), np.asarray(pid)
+    g = coupling_batch(g, E)
+    medium = get_medium(event, medium, MEDIUM_FIELDS, t, x, y, phi, beta)
+
+    # Average medium parameters
+    T = medium_avg(medium, medium['temp'])
+    mu = medium_avg(medium, mu_batch(medium['temp']))
+    inv_lambda_val = medium_avg(medium, inv_lambda_batch(medium['temp'], pid[:, np.newaxis], g=g[:, np.newaxis]))
+    vel = medium_avg(medium, np.sqrt(medium['x_vel'] ** 2 + medium['y_vel'] ** 2))
+
+    if zeta_val is None:
+        zeta_val = zeta(q=-1)
+
+    if model == 'BBMG':
+        return (config.jet.K_BBMG * (-1) * ((FmGeV) ** 2) * t * (T ** 3)
+                * zeta_val * (1 / np.sqrt(1 - (vel**2)))
+                * (1))
+    elif model == 'GLV':
+        alphas = (g**2) / (4*np.pi)
+        return (-1)*(casimir_batch(pid) * alphas / 2) * (((1 / FmGeV) ** 2)
+                                                         * (t - event.t0)
+                                                         * (mu**2)
+                                                         * inv_lambda_val
+                                                         * np.log(E / mu))
+    else:
+        return np.zeros_like(E)
+
+
+# Batched coll_energy_loss_integrand
+def coll_energy_loss_integrand_batch(event, E, beta, phi, x, y, t, pid, g=None, medium=None):
+    FmGeV = 1/0.19732687
+    nf = 2  # Source?
+    E, phi, pid = np.asarray(E, dtype=float), np.asarray(phi, dtype=float), np.asarray(pid)
+    g = coupling_batch(g, E)
+    medium = get_medium(event, medium, MEDIUM_FIELDS, t, x, y, phi, beta)
+
+    # Average medium parameters
+    T = medium_avg(medium, medium['temp'])
+    CR = casimir_batch(pid)
+    ALPHAS = (g**2) / (4*np.pi)
+
+    mg = (g * T / np.sqrt(3)) * np.sqrt(1 + (nf / 6))  # Thermal gluon mass, see paper
+    return (-1) * FmGeV * CR * (3 / 4) * (8 * np.pi * (ALPHAS ** 2) / 3) * (1 + (nf / 6)) * (T ** 2) * np.log(
+        (2 ** (nf / (2 * (6 + nf)))) * 0.920 * (np.sqrt(E * T) / mg))
+
+
+# Function to return per-sample (u_perp, u_tau, grad_perp u_tau, grad_perp u_perp) for the flow-gradient kernels
+def flowgrad_samples(medium, phi):
+    sin_phi = np.sin(phi)[:, np.newaxis]
+    cos_phi = np.cos(phi)[:, np.newaxis]
+    u_perp = -medium['x_vel'] * sin_phi + medium['y_vel'] * cos_phi
+    u_tau = medium['x_vel'] * cos_phi + medium['y_vel'] * sin_phi
+    grad_perp_u_tau = (- medium['grad_x_u_x'] * sin_phi * cos_phi
+                       + medium['grad_y_u_x'] * (cos_phi**2)
+                       - medium['grad_x_u_y'] * (sin_phi**2)
+                       + medium['grad_y_u_y'] * sin_phi * cos_phi)
+    grad_perp_u_perp = (medium['grad_x_u_x'] * (sin_phi**2)
+                        - medium['grad_y_u_x'] * sin_phi * cos_phi
+                        - medium['grad_x_u_y'] * sin_phi * cos_phi
+                        + medium['grad_y_u_y'] * (cos_phi**2))
+    return u_perp, u_tau, grad_perp_u_tau, grad_perp_u_perp
+
+
+# Function to return per-sample (u_perp, u_tau, grad_perp T) for the temperature-gradient kernels
+def flowgrad_T_samples(medium, phi):
+    sin_phi = np.sin(phi)[:, np.newaxis]
+    cos_phi = np.cos(phi)[:, np.newaxis]
+    u_perp = -medium['x_vel'] * sin_phi + medium['y_vel'] * cos_phi
+    u_tau = medium['x_vel'] * cos_phi + medium['y_vel'] * sin_phi
+    grad_perp_temp = -sin_phi * medium['temp_grad_x'] + cos_phi * medium['temp_grad_y']
+    return u_perp, u_tau, grad_perp_temp
+
+
+# Batched flowgrad_T_integrand
+def flowgrad_T_integrand_batch(event, E, beta, phi, x, y, t, pid, g=None, medium=None):
+    FmGeV = 1/0.19732687
+    E, phi, pid = np.asarray(E, dtype=float), np.asarray(phi, dtype=float), np.asarray(pid)
+    g = coupling_batch(g, E)
+    medium = get_medium(event, medium, MEDIUM_FIELDS + FG_T_MEDIUM_FIELDS, t, x, y, phi, beta)
+    u_perp, u_tau, grad_perp_temp = flowgrad_T_samples(medium, phi)
+
+    # Average medium parameters
+    T = medium_avg(medium, medium['temp'])
+    u_perp = medium_avg(medium, u_perp)
+    u_tau = medium_avg(medium, u_tau)
+    mu = medium_avg(medium, mu_batch(medium['temp']))
+    inv_lambda_val = medium_avg(medium, inv_lambda_batch(medium['temp'], pid[:, np.newaxis], g=g[:, np.newaxis]))
+    grad_perp_temp = medium_avg(medium, grad_perp_temp)
+
+    return - ((FmGeV) * (3 / E) * config.jet.K_FG_DRIFT * (t - event.t0)
+              * 3 * grad_perp_temp * ((u_perp**2)/((1 - u_tau)**2)) * (1/T)
+              * (mu**2) * inv_lambda_val
+              * np.log(E / mu))
+
+
+# Batched flowgrad_utau_integrand
+def flowgrad_utau_integrand_batch(event, E, beta, phi, x, y, t, pid, g=None, medium=None):
+    FmGeV = 1/0.19732687
+    E, phi, pid = np.asarray(E, dtype=float), np.asarray(phi, dtype=float), np.asarray(pid)
+    g = coupling_batch(g, E)
+    medium = get_medium(event, medium, MEDIUM_FIELDS + FG_MEDIUM_FIELDS, t, x, y, phi, beta)
+    u_perp, u_tau, grad_perp_u_tau, grad_perp_u_perp = flowgrad_samples(medium, phi)
+
+    # Average medium parameters
+    u_perp = medium_avg(medium, u_perp)
+    u_tau = medium_avg(medium, u_tau)
+    mu = medium_avg(medium, mu_batch(medium['temp']))
+    inv_lambda_val = medium_avg(medium, inv_lambda_batch(medium['temp'], pid[:, np.newaxis], g=g[:, np.newaxis]))
+    grad_perp_u_tau = medium_avg(medium, grad_perp_u_tau)
+
+    return - ((FmGeV) * (3 / E) * config.jet.K_FG_DRIFT * (t - event.t0)
+              * 2 * grad_perp_u_tau * ((u_perp**2)/((1 - u_tau)**3))
+              * (mu**2) * inv_lambda_val
+              * np.log(E / mu))
+
+
+# Batched flowgrad_uperp_integrand
+def flowgrad_uperp_integrand_batch(event, E, beta, phi, x, y, t, pid, g=None, medium=None):
+    FmGeV = 1/0.19732687
+    E, phi, pid = np.asarray(E, dtype=float), np.asarray(phi, dtype=float), np.asarray(pid)
+    g = coupling_batch(g, E)
+    medium = get_medium(event, medium, MEDIUM_FIELDS + FG_MEDIUM_FIELDS, t, x, y, phi, beta)
+    u_perp, u_tau, grad_perp_u_tau, grad_perp_u_perp = flowgrad_samples(medium, phi)
+
+    # Average medium parameters
+    u_perp = medium_avg(medium, u_perp)
+    u_tau = medium_avg(medium, u_tau)
+    mu = medium_avg(medium, mu_batch(medium['temp']))
+    inv_lambda_val = medium_avg(medium, inv_lambda_batch(medium['temp'], pid[:, np.newaxis], g=g[:, np.newaxis]))
+    grad_perp_u_perp = medium_avg(medium, grad_perp_u_perp)
+
+    return - ((FmGeV) * (3 / E) * config.jet.K_FG_DRIFT * (t - event.t0)
+              * 2 * grad_perp_u_perp * (u_perp/((1 - u_tau)**2))
+              * (mu**2) * inv_lambda_val
+              * np.log(E / mu))
+
+
+# Batched fg_utau_qhat_mod_factor
+def fg_utau_qhat_mod_factor_batch(event, beta, phi, x, y, t, medium=None):
+    phi = np.asarray(phi, dtype=float)
+    medium = get_medium(event, medium, MEDIUM_FIELDS + FG_MEDIUM_FIELDS, t, x, y, phi, beta)
+    u_perp, u_tau, grad_perp_u_tau, grad_perp_u_perp = flowgrad_samples(medium, phi)
+
+    # Average medium parameters
+    u_perp = medium_avg(medium, u_perp)
+    u_tau = medium_avg(medium, u_tau)
+    grad_perp_u_tau = medium_avg(medium, grad_perp_u_tau)
+
+    return (-1) * (t - event.t0) * (grad_perp_u_tau * (u_perp / ((1-u_tau)**2)))
+
+
+# Batched fg_uperp_qhat_mod_factor
+def fg_uperp_qhat_mod_factor_batch(event, beta, phi, x, y, t, medium=None):
+    phi = np.asarray(phi, dtype=float)
+    medium = get_medium(event, medium, MEDIUM_FIELDS + FG_MEDIUM_FIELDS, t, x, y, phi, beta)
+    u_perp, u_tau, grad_perp_u_tau, grad_perp_u_perp = flowgrad_samples(medium, phi)
+
+    # Average medium parameters
+    u_tau = medium_avg(medium, u_tau)
+    grad_perp_u_perp = medium_avg(medium, grad_perp_u_perp)
+
+    return (-1) * (t - event.t0) * (grad_perp_u_perp * (1 / (1-u_tau)))
+
+
+# Batched fg_T_qhat_mod_factor
+def fg_T_qhat_mod_factor_batch(event, beta, phi, x, y, t, medium=None):
+    phi = np.asarray(phi, dtype=float)
+    medium = get_medium(event, medium, MEDIUM_FIELDS + FG_T_MEDIUM_FIELDS, t, x, y, phi, beta)
+    u_perp, u_tau, grad_perp_temp = flowgrad_T_samples(medium, phi)
+
+    # Average medium parameters
+    T = medium_avg(medium, medium['temp'])
+    u_perp = medium_avg(medium, u_perp)
+    u_tau = medium_avg(medium, u_tau)
+    grad_perp_temp = medium_avg(medium, grad_perp_temp)
+
+    return (-1) * (t - event.t0) * (3 * grad_perp_temp * (u_perp / (1-u_tau)) * (1/T))
@@ -3,8 +3,217 @@ import numpy as np
 import pandas as pd
 import config
 
+# Particle properties extracted from Pythia event records, with their types
+PARTICLE_COLUMNS = {
+    'id': int,
+    'status': int,
+    'mother1': int,
+    'mother2': int,
+    'daughter1': int,
+    'daughter2': int,
+    'col': int,
+    'acol': int,
+    'px': float,
+    'py': float,
+    'pz': float,
+    'pt': float,
+    'y': float,
+    'e': float,
+    'm': float,
+    'scaleIn': float
+}
+
+# Columns of scattering particle dataframes
+SCATTERING_COLUMNS = ['id', 'status', 'mother1', 'mother2', 'daughter1', 'daughter2', 'col', 'acol', 'px', 'py', 'pz',
+                      'pt', 'e', 'm', 'scaleIn']
+
+
+# Function to extract the properties of all particles in a Pythia event record (e.g. pythia.process or pythia.event)
+# Walks the record once, filling preallocated arrays. Returns a dict of arrays by PARTICLE_COLUMNS name.
+def particle_columns(record):
+    num = record.size()
+    columns = {name: np.empty(num, dtype=dtype) for name, dtype in PARTICLE_COLUMNS.items()}
+    for i in range(num):
+        particle = record[i]
+        columns['id'][i] = particle.id()
+        columns['status'][i] = particle.status()
+        columns['mother1'][i] = particle.mother1()
+        columns['mother2'][i] = particle.mother2()
+        columns['daughter1'][i] = particle.daughter1()
+        columns['daughter2'][i] = particle.daughter2()
+        columns['col'][i] = particle.col()
+        columns['acol'][i] = particle.acol()
+        columns['px'][i] = particle.px()
+        columns['py'][i] = particle.py()
+        columns['pz'][i] = particle.pz()
+        columns['pt'][i] = particle.pT()
+        columns['y'][i] = particle.y()
+        columns['e'][i] = particle.e()
+        columns['m'][i] = particle.m()
+        columns['scaleIn'][i] = particle.scale()
+    return columns
+
+
+# Function to return a dataframe of the given columns for the particles of a Pythia event record, built in one go
+# select, if given, is a function of the particle columns returning a mask of the particles to keep.
+def particle_frame(record, columns=SCATTERING_COLUMNS, select=None):
+    values = particle_columns(record)
+    if select is not None:
+        mask = select(values)
+        return pd.DataFrame({name: values[name][mask] for name in columns})
+    return pd.DataFrame({name: values[name] for name in columns})
+
+
+# Seed with which scattering generators initialise Pythia, so initialisation is the same in every process
+INIT_SEED = 1
+
+# Scattering generators already initialised in this process, by pTHat range
+_scattering_generators = {}
+
+
+# User hooks for hard scatterings: keep only 2 -> 2 processes at mid-rapidity, within y_res
+class midrapidity_hooks(pythia8.UserHooks):
+
+    # Constructor to make a user hook, checking process rapidity with the info of the given Pythia instance
+    def __init__(self, pythia_process, y_res=0.5):
+        pythia8.UserHooks.__init__(self)
+        self.pythia_process = pythia_process
+        self.y_res = y_res
+
+    # Allow process cross section to be modified...
+    def canModifySigma(self):
+        return True
+
+    # ...which gives access to the event at the trial level, before selection.
+    def multiplySigmaBy(self, sigmaProcessPtr, phaseSpacePtr, inEvent):
+
+        # All events should be 2 -> 2, kill them if not.
+        if sigmaProcessPtr.nFinal() != 2: return 0.
+
+        # Here we do not modify 2 -> 2 cross sections.
+        return 1.
+
+    # Allow a veto after process selection.
+    def canVetoProcessLevel(self):
+        return True
+
+    # Veto events that do not fit the desired requirements
+    def doVetoProcessLevel(self, process):
+        # Get info
+        info = self.pythia_process.infoPython()
+
+        # Get only events at mid-rapidity, within my chosen y_res
+        if np.abs(info.y()) < self.y_res:  # and np.abs(chosen_pt -np.abs(info.pTHat())) < pt_hat_res:
+            return False  # Do not veto the event
+        else:
+            return True  # Veto the event
+
+
+# Class to generate pp hard scatterings at sqrt(s) = config.constants.ROOT_S from one persistent Pythia instance
+# Pythia is set up and initialised once, which is the expensive part, then generates any number of scatterings.
+# Each scattering may be given its own seed (see utilities.stream_seed), with which the Pythia random number
+# generator is reseeded, so a scattering depends on its seed rather than on the scatterings generated before it.
+class scattering_generator():
+    # Instantiation statement
+    def __init__(self, pThatmin=config.jet.PTHATMIN, pThatmax=config.jet.PTHATMAX, y_res=0.5, seed=INIT_SEED):
+        #################
+        # Set up Pythia #
+        #################
+        self.pythia_process = pythia8.Pythia("", False)  # Print header = False
+
+        # Use given seed
+        self.pythia_process.readString("Random:setSeed = on")
+        self.pythia_process.readString("Random:seed = {}".format(int(seed)))
+
+        # # Set beam energy - in GeV
+        self.pythia_process.readString("Beams:eCM = {}".format(config.constants.ROOT_S))
+
+        # Set particles in each beam - defaults to proton (2212), if nothing set
+        self.pythia_process.readString("Beams:idA = 2212")
+        self.pythia_process.readString("Beams:idB = 2212")
+
+        # Only do the parton level stuff
+        self.pythia_process.readString("ProcessLevel:all = on")
+        self.pythia_process.readString("PartonLevel:all = off")
+        self.pythia_process.readString("HadronLevel:all = off")
+
+        # Turn on all hard QCD processes
+        self.pythia_process.readString("HardQCD:all = on")
+
+        # Set a phase space cut for particle pT.
+        '''
+        The HardQCD 2->2 processes are divergent as pT -> 0, so we need some cut here.
+        Note that this parton-level cut does not necessarily put a cut on jet phase space.
+        intermediate parton showers, MPIs, hadronization effects, and jet finders will distort the original simple
+        process
+        '''
+        self.pythia_process.readString("PhaseSpace:pTHatMin = {}".format(pThatmin))  # Cuts are on hard process pTHat
+        self.pythia_process.readString("PhaseSpace:pTHatMax = {}".format(pThatmax))
+
+        # Here we bias the selection of pTHat for the process by a given power of pTHat (Here pTHat^4)
+        # This is more or less equivalent to sampling from a uniform distribution in pTHat
+        # and recording an appropriate true pTHat-dependent weight from a known weight distribution
+        self.pythia_process.readString("PhaseSpace:bias2Selection = on")
+        self.pythia_process.readString("PhaseSpace:bias2SelectionPow = 4")
+
+        # Set up to do a user veto and send it in.
+        self.hooks = midrapidity_hooks(self.pythia_process, y_res=y_res)
+        self.pythia_process.setUserHooksPtr(self.hooks)
+
+        # Tell Pythia to "do the thing" (run with the configurations above)
+        self.pythia_process.init()
+
+        self.failed_events = 0
+
+    # Method to generate a scattering, reseeding Pythia with seed first, if given
+    # Returns a dataframe of the process particles and the event weight.
+    def next(self, seed=None):
+        if seed is not None:
+            self.pythia_process.rndm.init(int(seed))
+
+        # Generate event. Skip if error.
+        """
+        When we call pythia.next(), we generate the next event. If this returns "False", an error occured, so we try
+        again.
+        """
+        while not self.pythia_process.next():
+            self.failed_events += 1
+
+        ################################
+        # Package and output particles #
+        ################################
+        weight = self.pythia_process.infoPython().weight()
+        particles = particle_frame(self.pythia_process.process, select=lambda columns: columns['id'] != 90)
+
+        return particles, weight
+
+    # Method to generate a batch of num scatterings, one for each of seeds, if given
+    # Returns a list of (particles, weight) tuples.
+    def batch(self, num=None, seeds=None):
+        if seeds is None:
+            return [self.next() for _ in range(num)]
+        return [self.next(seed=seed) for seed in seeds]
+
+
+# Function to return the scattering generator for a pTHat range, initialising it on first use in this process
+def get_scattering_generator(pThatmin=config.jet.PTHATMIN, pThatmax=config.jet.PTHATMAX):
+    key = (pThatmin, pThatmax)
+    if key not in _scattering_generators:
+        _scattering_generators[key] = scattering_generator(pThatmin=pThatmin, pThatmax=pThatmax)
+    return _scattering_generators[key]
+
+
+# Function to generate a pp hard scattering at sqrt(s) = 5.02 TeV
+# Pythia is reseeded with seed, if given (see utilities.stream_seed), or else with a fresh random seed.
+# Scatterings come from a persistent scattering_generator, so Pythia is only initialised once per process.
+def scattering(pThatmin=config.jet.PTHATMIN, pThatmax=config.jet.PTHATMAX, seed=None):
+    if seed is None:
+        seed = np.random.default_rng().integers(1, 900000000)
+    return get_scattering_generator(pThatmin=pThatmin, pThatmax=pThatmax).next(seed=seed)
+
+
 # Function to generate a pp hard scattering at sqrt(s) = 5.02 TeV
-def scattering(pThatmin=config.jet.PTHATMIN, pThatmax=config.jet.PTHATMAX):
+def pp_shower():
     ############
     # Settings #
     ############
@@ -62,7 +271,7 @@ def scattering(pThatmin=config.jet.PTHATMIN, pThatmax=config.jet.PTHATMAX):
     pythia_process.readString("Random:seed = 0")
 
     # # Set beam energy - in GeV
-    pythia_process.readString("Beams:eCM = {}".format(config.constants.ROOT_S))
+    pythia_process.readString("Beams:eCM = 5020.")
 
     # Set particles in each beam - defaults to proton (2212), if nothing set
     pythia_process.readString("Beams:idA = 2212")
@@ -70,7 +279,7 @@ def scattering(pThatmin=config.jet.PTHATMIN, pThatmax=config.jet.PTHATMAX):
 
     # Only do the parton level stuff
     pythia_process.readString("ProcessLevel:all = on")
-    pythia_process.readString("PartonLevel:all = off")
+    pythia_process.readString("PartonLevel:all = on")
     pythia_process.readString("HadronLevel:all = off")
 
     # Turn on all hard QCD processes
@@ -91,8 +300,8 @@ def scattering(pThatmin=config.jet.PTHATMIN, pThatmax=config.jet.PTHATMAX):
     Note that this parton-level cut does not necessarily put a cut on jet phase space.
     intermediate parton showers, MPIs, hadronization effects, and jet finders will distort the original simple process
     '''
-    pythia_process.readString("PhaseSpace:pTHatMin = {}".format(pThatmin))  # Phase space cuts are on hard process pTHat
-    pythia_process.readString("PhaseSpace:pTHatMax = {}".format(pThatmax))
+    pythia_process.readString("PhaseSpace:pTHatMin = 1")  # Phase space cuts are on hard process pTHat
+    pythia_process.readString("PhaseSpace:pTHatMax = 100")
 
     # Here we bias the selection of pTHat for the process by a given power of pTHat (Here pTHat^4)
     # This is more or less equivalent to sampling from a uniform distribution in pTHat
@@ -141,205 +350,104 @@ def scattering(pThatmin=config.jet.PTHATMIN, pThatmax=config.jet.PTHATMAX):
     # Package and output particles #
     ################################
     weight = pythia_process.infoPython().weight()
-    particles = pd.DataFrame({})
-
-    for particle in pythia_process.process:
-        if particle.id() != 90:
-            properties = pd.DataFrame(
-                {
-                    'id': [int(particle.id())],
-                    'status': [int(particle.status())],
-                    'mother1': [int(particle.mother1())],
-                    'mother2': [int(particle.mother2())],
-                    'daughter1': [int(particle.daughter1())],
-                    'daughter2': [int(particle.daughter2())],
-                    'col': [int(particle.col())],
-                    'acol': [int(particle.acol())],
-                    'px': [particle.px()],
-                    'py': [particle.py()],
-                    'pz': [particle.pz()],
-                    'pt': [particle.pT()],
-                    'e': [particle.e()],
-                    'm': [particle.m()],
-                    'scaleIn': [particle.scale()]
-                }
-            )
-
-            particles = pd.concat([particles, properties], axis=0)
-
-    return particles, weight
-
-
-# Function to generate a pp hard scattering at sqrt(s) = 5.02 TeV
-def pp_shower():
-    ############
-    # Settings #
-    ############
-    y_res = 0.5
-
-    # Generate scattering id
-    scattering_id = int(np.random.uniform(0, 1000000000000))
-
-    ############################
-    # Set up custom user hooks #
-    ############################
-    # Write own derived UserHooks class.
-    class MyUserHooks(pythia8.UserHooks):
-
-        # Constructor to make a user hook
-        def __init__(self):
-            pythia8.UserHooks.__init__(self)
 
-        # Allow process cross section to be modified...
-        def canModifySigma(self):
-            return True
+    # Don't pick up event particle or non-final state particles
+    particles = particle_frame(pythia_process.process,
+                               select=lambda columns: (columns['id'] != 90) & (columns['status'] > 0))
 
-        # ...which gives access to the event at the trial level, before selection.
-        def multiplySigmaBy(self, sigmaProcessPtr, phaseSpacePtr, inEvent):
-
-            # All events should be 2 -> 2, kill them if not.
-            if sigmaProcessPtr.nFinal() != 2: return 0.
-
-            # Here we do not modify 2 -> 2 cross sections.
-            return 1.
+    return particles, weight
 
-        # Allow a veto after process selection.
-        def canVetoProcessLevel(self):
-            return True
 
-        # Veto events that do not fit the desired requirements
-        def doVetoProcessLevel(self, process):
-            # Get info
-            info = pythia_process.infoPython()
+# Hadronizer engine already initialised in this process
+_hadronizer = None
 
-            # Get only events at mid-rapidity, within my chosen y_res
-            if np.abs(info.y()) < y_res:  # and np.abs(chosen_pt -np.abs(info.pTHat())) < pt_hat_res:
-                return False  # Do not veto the event
-            else:
-                return True  # Veto the event
 
+# Class to hadronize systems of partons from one persistent hadron-level Pythia instance
+# Pythia is set up and initialised once, then hadronizes any number of parton systems, given as arrays. It may be
+# reseeded between hadronizations. Event records are listed, for debugging, only if debug is set.
+class hadronizer():
+    # Instantiation statement
+    def __init__(self, seed=INIT_SEED, debug=False):
+        self.debug = debug
 
-    #################
-    # Set up Pythia #
-    #################
-    pythia_process = pythia8.Pythia("", False)  # Print header = False
+        # Instantiate Pythia
+        self.pythia_had = pythia8.Pythia("", False)  # Print header = False
 
-    # Use seed based on time
-    pythia_process.readString("Random:setSeed = on")
-    pythia_process.readString("Random:seed = 0")
+        # Use given seed
+        self.pythia_had.readString("Random:setSeed = on")
+        self.pythia_had.readString("Random:seed = {}".format(int(seed)))
 
-    # # Set beam energy - in GeV
-    pythia_process.readString("Beams:eCM = 5020.")
+        # Only do the hadron level stuff
+        self.pythia_had.readString("ProcessLevel:all = off")
+        self.pythia_had.readString("PartonLevel:all = off")
+        self.pythia_had.readString("HadronLevel:all = on")
 
-    # Set particles in each beam - defaults to proton (2212), if nothing set
-    pythia_process.readString("Beams:idA = 2212")
-    pythia_process.readString("Beams:idB = 2212")
+        # Don't allow pi^0 to decay:
+        self.pythia_had.readString("111:mayDecay = off")
 
-    # Only do the parton level stuff
-    pythia_process.readString("ProcessLevel:all = on")
-    pythia_process.readString("PartonLevel:all = on")
-    pythia_process.readString("HadronLevel:all = off")
+        # Allow color reconnection in hadronization
+        # self.pythia_had.readString("ColourReconnection:forceHadronLevelCR = on")
 
-    # Turn on all hard QCD processes
-    pythia_process.readString("HardQCD:all = on")
+        # Turn off event checks that enforce conservation of momentum in the event
+        self.pythia_had.readString("Check:event = on")
 
-    # Turn off all showers
-    # pythia_process.readString("PartonLevel:MPI = off")
-    # pythia_process.readString("PartonLevel:ISR = off")
-    # pythia_process.readString("PartonLevel:FSR = off")
-    # pythia_process.readString("PartonLevel:FSRinProcess = off")
-    # pythia_process.readString("PartonLevel:FSRinResonances = off")
-    # pythia_process.readString("PartonLevel:earlyResDec = off")
-    # pythia_process.readString("PartonLevel:Remnants = on")
+        # Tell Pythia to "do the thing" (run with the configurations above)
+        self.pythia_had.init()
 
-    # Set a phase space cut for particle pT.
-    '''
-    The HardQCD 2->2 processes are divergent as pT -> 0, so we need some cut here.
-    Note that this parton-level cut does not necessarily put a cut on jet phase space.
-    intermediate parton showers, MPIs, hadronization effects, and jet finders will distort the original simple process
-    '''
-    pythia_process.readString("PhaseSpace:pTHatMin = 1")  # Phase space cuts are on hard process pTHat
-    pythia_process.readString("PhaseSpace:pTHatMax = 100")
+    # Event record, holding the hadrons after a successful hadronization
+    @property
+    def event(self):
+        return self.pythia_had.event
 
-    # Here we bias the selection of pTHat for the process by a given power of pTHat (Here pTHat^4)
-    # This is more or less equivalent to sampling from a uniform distribution in pTHat
-    # and recording an appropriate true pTHat-dependent weight from a known weight distribution
-    pythia_process.readString("PhaseSpace:bias2Selection = on")
-    pythia_process.readString("PhaseSpace:bias2SelectionPow = 4")
+    # Method to reseed the Pythia random number generator
+    def reseed(self, seed):
+        self.pythia_had.rndm.init(int(seed))
 
-    # Set up to do a user veto and send it in.
-    myUserHooks = MyUserHooks()
-    pythia_process.setUserHooksPtr(myUserHooks)
+    # Method to hadronize a system of partons, given as arrays of ids, colors, anticolors, momenta, and masses
+    # status (default 23) and scaleIn may be arrays or single values. Energies are computed from momenta and masses.
+    # Returns True if hadronization succeeded, leaving the hadrons in self.event, or False if event checks failed.
+    def hadronize(self, ids, cols, acols, px, py, pz, m, scaleIn, status=23):
+        num_partons = len(ids)
+        px = np.asarray(px, dtype=float)
+        py = np.asarray(py, dtype=float)
+        pz = np.asarray(pz, dtype=float)
+        m = np.asarray(m, dtype=float)
+        e = np.sqrt(px ** 2 + py ** 2 + pz ** 2 + m ** 2)
+        status = np.broadcast_to(status, num_partons)
+        scaleIn = np.broadcast_to(scaleIn, num_partons)
 
-    # Tell Pythia to "do the thing" (run with the configurations above)
-    pythia_process.init()
+        # Clear the event and add in partons
+        self.event.reset()
+        for i in range(num_partons):
+            self.event.append(id=int(ids[i]), status=int(status[i]), col=int(cols[i]), acol=int(acols[i]),
+                              px=float(px[i]), py=float(py[i]), pz=float(pz[i]), e=float(e[i]), m=float(m[i]),
+                              scaleIn=float(scaleIn[i]))
 
-    ####################################
-    # Run the event generation routine #
-    ####################################
+        # List particles for debug
+        if self.debug:
+            self.event.list()
 
-    # Generate event. Skip if error.
-    """
-    This is the event loop. When we call pythia.next(), we generate the next event. If this returns "False",
-    an error occured, so we try again.
+        # hadronize
+        success = self.pythia_had.next()
 
-    We then check for a satisfactory particle. If it exists, we accept the event. If not, we generate a new one.
-    """
+        # List particles again for debug
+        if self.debug and success:
+            self.event.list()
 
-    failed_events = 0
-    success = False
-    while not success:
-        if not pythia_process.next():  # Note: Calling pythia.next() generates the next event in with the pythia object.
-            failed_events += 1
-        else:
-            break  # Do not check output particles
-            # for particle in pythia_process.process:
-            #     if particle.status() > 0:
-            #         if np.abs(float(particle.y())) < (y_res / 2):
-            #             # if np.abs(particle.id()) == 3 or np.abs(particle.id()) == 2 or np.abs(particle.id()) == 1  \
-            #             #         or particle.id() == 21:
-            #             # if np.abs(chosen_pt - np.abs(particle.pT())) < (pt_res/2):
-            #             id = particle.id()
-            #             if id == chosen_id:
-            #                 success = True
-            # failed_events += 1
+        return success
 
-    ################################
-    # Package and output particles #
-    ################################
-    weight = pythia_process.infoPython().weight()
-    particles = pd.DataFrame({})
-
-    for particle in pythia_process.process:
-        # Don't pick up event particle or non-final state particles
-        if (particle.id() != 90) & (particle.status() > 0):
-            properties = pd.DataFrame(
-                {
-                    'id': [int(particle.id())],
-                    'status': [int(particle.status())],
-                    'mother1': [int(particle.mother1())],
-                    'mother2': [int(particle.mother2())],
-                    'daughter1': [int(particle.daughter1())],
-                    'daughter2': [int(particle.daughter2())],
-                    'col': [int(particle.col())],
-                    'acol': [int(particle.acol())],
-                    'px': [particle.px()],
-                    'py': [particle.py()],
-                    'pz': [particle.pz()],
-                    'pt': [particle.pT()],
-                    'e': [particle.e()],
-                    'm': [particle.m()],
-                    'scaleIn': [particle.scale()]
-                }
-            )
-
-            particles = pd.concat([particles, properties], axis=0)
 
-    return particles, weight
+# Function to return the hadronizer engine, initialising it on first use in this process
+def get_hadronizer():
+    global _hadronizer
+    if _hadronizer is None:
+        _hadronizer = hadronizer()
+    return _hadronizer
 
 
 # Function to hadronize a pair of particles
-def fragment(jet1, jet2, scaleIn=2, weight=1):
+# Random choices, and the Pythia seed, are drawn from rng, if given. Otherwise Pythia is seeded based on time.
+def fragment(jet1, jet2, scaleIn=2, weight=1, rng=None):
     # Settings
     y_res = 1
     max_had_runs = 10000
@@ -443,33 +551,15 @@ def fragment(jet1, jet2, scaleIn=2, weight=1):
         col_array = np.append(col_array, rem2_col)
         acol_array = np.append(acol_array, rem2_acol)
 
-    ############################################
-    # Set up Pythia instance for hadronization #
-    ############################################
-
-    # Instantiate Pythia
-    pythia_had = pythia8.Pythia("", False)  # Print header = False
-
-    # Use seed based on time
-    pythia_had.readString("Random:setSeed = on")
-    pythia_had.readString("Random:seed = 0")
-
-    # Only do the hadron level stuff
-    pythia_had.readString("ProcessLevel:all = off")
-    pythia_had.readString("PartonLevel:all = off")
-    pythia_had.readString("HadronLevel:all = on")
-
-    # Don't allow pi^0 to decay:
-    pythia_had.readString("111:mayDecay = off")
-
-    # Allow color reconnection in hadronization
-    # pythia_had.readString("ColourReconnection:forceHadronLevelCR = on")
-
-    # Turn off event checks that enforce conservation of momentum in the event
-    pythia_had.readString("Check:event = on")
+    #######################################
+    # Set up persistent hadronizer engine #
+    #######################################
+    engine = get_hadronizer()
 
-    # Tell Pythia to "do the thing" (run with the configurations above)
-    pythia_had.init()
+    # Reseed from the given rng, or with a fresh random seed
+    if rng is None:
+        rng = np.random.default_rng()
+    engine.reseed(int(rng.integers(1, 900000000)))
 
     #################################
     # Run the hadronization routine #
@@ -479,121 +569,72 @@ def fragment(jet1, jet2, scaleIn=2, weight=1):
     total_pions = 0
     total_had_runs = 0
     success_had_runs = 0
+    hadron_columns = {name: np.empty(0, dtype=dtype) for name, dtype in PARTICLE_COLUMNS.items()}
+    hadron_accepted = np.empty(0, dtype=bool)
     while total_had_runs < max_had_runs:
 
-        # Clear the event
-        pythia_had.event.reset()
-
-        # Add in edited particles
-        part_i = -1
-        i = 0
-        # jet 1
-        pythia_had.event.append(id=int(id1), status=int(23),
-                                col=int(col_array[0]), acol=int(acol_array[0]),
-                                px=float(jet1.p_x), py=float(jet1.p_y), pz=0,
-                                e=float(np.sqrt(jet1.p_x**2 + jet1.p_y**2 + float(jet1.m)**2)),
-                                m=float(jet1.m),
-                                scaleIn=float(scaleIn))
-        i += 1
-        # jet 2
-        pythia_had.event.append(id=int(id2), status=int(23),
-                                col=int(col_array[1]), acol=int(acol_array[1]),
-                                px=float(jet2.p_x), py=float(jet2.p_y), pz=0,
-                                e=float(np.sqrt(jet2.p_x ** 2 + jet2.p_y ** 2 + float(jet2.m) ** 2)),
-                                m=float(jet2.m),
-                                scaleIn=float(scaleIn))
-        i += 1
+        # Collect jets
+        ids = [id1, id2]
+        px = [jet1.p_x, jet2.p_x]
+        py = [jet1.p_y, jet2.p_y]
+        pz = [0, 0]
+        m = [jet1.m, jet2.m]
 
+        # Collect beam remnants, drawing species for this attempt
         if remnant:
             if rem_col != 0:
-                rem_id = np.random.default_rng().choice([2, 2, 1])
+                rem_id = rng.choice([2, 2, 1])
                 if rem_id == 2:
                     rem_m = 0.0022
                 else:
                     rem_m = 0.0047
             else:
-                rem_id = np.random.default_rng().choice([-2, -2, -1])
+                rem_id = rng.choice([-2, -2, -1])
                 if rem_id == -2:
                     rem_m = 0.0022
                 else:
                     rem_m = 0.0047
-            pythia_had.event.append(id=int(rem_id), status=int(23),
-                                    col=int(col_array[2]), acol=int(acol_array[2]),
-                                    px=0, py=0, pz=10000,
-                                    e=float(np.sqrt(0 ** 2 + 0 ** 2 + 10000 **2 + rem_m ** 2)),
-                                    m=float(rem_m),
-                                    scaleIn=float(scaleIn))
-            i += 1
+            ids.append(rem_id)
+            px.append(0)
+            py.append(0)
+            pz.append(10000)
+            m.append(rem_m)
         if remnant2:
             if rem2_col != 0:
-                rem2_id = np.random.default_rng().choice([2, 2, 1])
+                rem2_id = rng.choice([2, 2, 1])
                 if rem2_id == 2:
                     rem2_m = 0.0022
                 else:
                     rem2_m = 0.0047
             else:
-                rem2_id = np.random.default_rng().choice([-2, -2, -1])
+                rem2_id = rng.choice([-2, -2, -1])
                 if rem2_id == -2:
                     rem2_m = 0.0022
                 else:
                     rem2_m = 0.0047
-            pythia_had.event.append(id=int(rem2_id), status=int(23),
-                                    col=int(col_array[3]), acol=int(acol_array[3]),
-                                    px=0, py=0, pz=-10000,
-                                    e=float(np.sqrt(0 ** 2 + 0 ** 2 + 10000 **2 + rem2_m ** 2)),
-                                    m=float(rem2_m),
-                                    scaleIn=float(scaleIn))
-            i += 1
-        # part_i = -1
-        # for particle in pythia_had.process:
-        #     part_i += 1
-        # # Force parton shower
-        # # Set all particles allowed to shower
-        # shower_pTmax = pythia_process.infoPython().pTHat()
-        # pythia_had.forceTimeShower(iBeg=part_i-1, iEnd=part_i, pTmax=shower_pTmax)  #, nBranchMax=10)
-
-        # List particles for debug
-        pythia_had.event.list()
+            ids.append(rem2_id)
+            px.append(0)
+            py.append(0)
+            pz.append(-10000)
+            m.append(rem2_m)
 
         # hadronize - restart if event checks fail
-        if not pythia_had.next():
+        num_partons = len(ids)
+        if not engine.hadronize(ids=ids, cols=col_array[:num_partons], acols=acol_array[:num_partons], px=px, py=py,
+                                pz=pz, m=m, scaleIn=scaleIn):
             total_had_runs += 1  # Add a total hadronization
             continue
         success_had_runs += 1  # Add a successful hadronization
         total_had_runs += 1  # Add a total hadronization
 
-        # List particles again for debug
-        pythia_had.event.list()
-
-        # Look for an acceptable pion
-        hadron_accepted_px = np.array([])
-        hadron_accepted_py = np.array([])
-        hadron_accepted_pz = np.array([])
-        hadron_accepted_y = np.array([])
-        hadron_accepted_e = np.array([])
-        hadron_accepted_pt = np.array([])
-        hadron_accepted_id = np.array([])
-        hadron_f_pt = np.array([])
-        pions_f = 0
-        for particle in pythia_had.event:
-            if particle.status() > 0:  # Particle exists in the final state
-                id = particle.id()
-                if id == 111 or np.abs(id) == 211:  # Collect pions
-                    pions_f += 1
-                    hadron_y = particle.y()
-                    hadron_pt = particle.pT()
-                    hadron_f_pt = np.append(hadron_f_pt, np.abs(hadron_pt))
-                    pions_f += 1
-                    if np.abs(hadron_y) < 1:  # Particle is at mid-rapidity
-                        if np.abs(hadron_pt) > 1:  # Particle is hard -- substantially above medium scale
-                            accepted = True
-                            hadron_accepted_px = np.append(hadron_accepted_px, particle.px())
-                            hadron_accepted_py = np.append(hadron_accepted_py, particle.py())
-                            hadron_accepted_pz = np.append(hadron_accepted_pz, particle.pz())
-                            hadron_accepted_y = np.append(hadron_accepted_y, hadron_y)
-                            hadron_accepted_e = np.append(hadron_accepted_e, particle.e())
-                            hadron_accepted_pt = np.append(hadron_accepted_pt, np.abs(particle.pT()))
-                            hadron_accepted_id = np.append(hadron_accepted_id, particle.id())
+        # Look for acceptable pions: in the final state, at mid-rapidity, and hard -- substantially above medium scale
+        hadron_columns = particle_columns(engine.event)
+        pions = (hadron_columns['status'] > 0) & ((hadron_columns['id'] == 111)
+                                                  | (np.abs(hadron_columns['id']) == 211))
+        pions_f = np.count_nonzero(pions)
+        hadron_accepted = pions & (np.abs(hadron_columns['y']) < 1) & (np.abs(hadron_columns['pt']) > 1)
+        if np.any(hadron_accepted):
+            accepted = True
 
         # Count pions and runs to determine weight of the final pion
         total_pions += pions_f
@@ -602,100 +643,46 @@ def fragment(jet1, jet2, scaleIn=2, weight=1):
             break
 
 
+    num_accepted = np.count_nonzero(hadron_accepted)
     hadrons = pd.DataFrame(
         {
-            'id': hadron_accepted_id.astype(int),
-            'px': hadron_accepted_px.astype(float),
-            'py': hadron_accepted_py.astype(float),
-            'pz': hadron_accepted_pz.astype(float),
-            'pt': hadron_accepted_pt.astype(float),
-            'y': hadron_accepted_y.astype(float),
-            'e': hadron_accepted_e.astype(float),
-            'weight': np.full_like(hadron_accepted_id, float(weight)).astype(float),
-            'num_hrz': np.full_like(hadron_accepted_id, int(success_had_runs)).astype(int),
-            'failures': np.full_like(hadron_accepted_id, int(total_had_runs - success_had_runs)).astype(int)
+            'id': hadron_columns['id'][hadron_accepted],
+            'px': hadron_columns['px'][hadron_accepted],
+            'py': hadron_columns['py'][hadron_accepted],
+            'pz': hadron_columns['pz'][hadron_accepted],
+            'pt': np.abs(hadron_columns['pt'][hadron_accepted]),
+            'y': hadron_columns['y'][hadron_accepted],
+            'e': hadron_columns['e'][hadron_accepted],
+            'weight': np.full(num_accepted, float(weight)),
+            'num_hrz': np.full(num_accepted, int(success_had_runs)),
+            'failures': np.full(num_accepted, int(total_had_runs - success_had_runs))
         })
 
     return hadrons
 
 
 # Function to hadronize a list of particles already including colors and anticolors and get pythia event
+# Uses the persistent hadronizer engine, so the returned event record is only valid until its next hadronization.
 def pp_shower_hadronize(particles):
     # Settings
-    y_res = 1
     max_had_runs = 10000
 
-    ############################################
-    # Set up Pythia instance for hadronization #
-    ############################################
-
-    # Instantiate Pythia
-    pythia_had = pythia8.Pythia("", False)  # Print header = False
-
-    # Use seed based on time
-    pythia_had.readString("Random:setSeed = on")
-    pythia_had.readString("Random:seed = 0")
-
-    # Only do the hadron level stuff
-    pythia_had.readString("ProcessLevel:all = off")
-    pythia_had.readString("PartonLevel:all = off")
-    pythia_had.readString("HadronLevel:all = on")
-
-    # Don't allow pi^0 to decay:
-    pythia_had.readString("111:mayDecay = off")
-
-    # Allow color reconnection in hadronization
-    # pythia_had.readString("ColourReconnection:forceHadronLevelCR = on")
-
-    # Turn off event checks that enforce conservation of momentum in the event
-    pythia_had.readString("Check:event = on")
-
-    # Tell Pythia to "do the thing" (run with the configurations above)
-    pythia_had.init()
+    # Get persistent hadronizer engine, with a fresh random seed
+    engine = get_hadronizer()
+    engine.reseed(int(np.random.default_rng().integers(1, 900000000)))
 
     #################################
     # Run the hadronization routine #
     #################################
-    # We repeatedly hadronize until we come out with a satisfactory pion, saving info on the statistical weight
-    accepted = False
-    total_pions = 0
+    # We hadronize until successful, restarting if event checks fail
     total_had_runs = 0
-    success_had_runs = 0
     while total_had_runs < max_had_runs:
-
-        # Clear the event
-        pythia_had.event.reset()
-
-        # Add in edited particles
-        for index, particle in particles.iterrows():
-            pythia_had.event.append(id=int(particle['id']), status=int(particle['status']),
-                                    col=int(particle['col']), acol=int(particle['acol']),
-                                    px=float(particle['px']), py=float(particle['py']), pz=float(particle['pz']),
-                                    e=float(np.sqrt(float(particle['px']) ** 2 + float(particle['py']) ** 2
-                                                    + float(particle['pz']) **2 + float(particle['m']) ** 2)),
-                                    m=float(particle['m']),
-                                    scaleIn=float(particle['scaleIn']))
-
-
-        # part_i = -1
-        # for particle in pythia_had.process:
-        #     part_i += 1
-        # # Force parton shower
-        # # Set all particles allowed to shower
-        # shower_pTmax = pythia_process.infoPython().pTHat()
-        # pythia_had.forceTimeShower(iBeg=part_i-1, iEnd=part_i, pTmax=shower_pTmax)  #, nBranchMax=10)
-
-        # List particles for debug
-        pythia_had.event.list()
-
-        # hadronize - restart if event checks fail
-        if not pythia_had.next():
-            total_had_runs += 1  # Add a total hadronization
-            continue
-        success_had_runs += 1  # Add a successful hadronization
         total_had_runs += 1  # Add a total hadronization
+        if engine.hadronize(ids=particles['id'].to_numpy(), status=particles['status'].to_numpy(),
+                            cols=particles['col'].to_numpy(), acols=particles['acol'].to_numpy(),
+                            px=particles['px'].to_numpy(), py=particles['py'].to_numpy(),
+                            pz=particles['pz'].to_numpy(), m=particles['m'].to_numpy(),
+                            scaleIn=particles['scaleIn'].to_numpy()):
+            break
 
-        # List particles again for debug
-        pythia_had.event.list()
-
-    return pythia_had.event
+    return engine.event
@@ -0,0 +1,122 @@
+import sys
+import logging
+import numpy as np
+import pandas as pd
+import config
+import utilities
+
+"""
+This module makes and reads banks of pre-generated hard scatterings.
+
+Hard scatterings do not depend on the medium, so they can be generated once, with Pythia, and drawn from by any
+number of jet transport jobs -- which then need neither Pythia nor its initialisation. A bank holds the two outgoing
+partons of each pythia.scattering output, with the scattering's pTHat-biased event weight, as columns in an npz file.
+
+Make a bank with:
+    python scattering_bank.py <number of scatterings> <bank file (.npz)> [seed]
+"""
+
+# Columns of the outgoing partons in a bank, with their types
+PARTON_COLUMNS = {
+    'id': np.int16,
+    'col': np.int16,
+    'acol': np.int16,
+    'px': np.float32,
+    'py': np.float32,
+    'pz': np.float32,
+    'pt': np.float32,
+    'e': np.float32,
+    'm': np.float32,
+    'scaleIn': np.float32
+}
+
+# Columns of the particle dataframes drawn from a bank, as output by pythia.scattering
+SCATTERING_COLUMNS = ['id', 'status', 'mother1', 'mother2', 'daughter1', 'daughter2', 'col', 'acol', 'px', 'py', 'pz',
+                      'pt', 'e', 'm', 'scaleIn']
+
+# Banks already loaded in this process, by file path
+_banks = {}
+
+
+# Function to generate a bank of num hard scatterings with Pythia and save it to file_path
+# Scattering i is generated with seed utilities.stream_seed(seed, i), so a bank is reproducible from its seed.
+def generate_bank(num, file_path, seed=None, pThatmin=config.jet.PTHATMIN, pThatmax=config.jet.PTHATMAX,
+                  log_every=10000):
+    import pythia
+
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    logging.info('Generating bank of {} scatterings, seed {}...'.format(num, seed))
+
+    partons = {name: np.zeros((num, 2), dtype=dtype) for name, dtype in PARTON_COLUMNS.items()}
+    weights = np.zeros(num, dtype=np.float64)
+
+    generator = pythia.scattering_generator(pThatmin=pThatmin, pThatmax=pThatmax)
+    for i in range(num):
+        particles, weight = generator.next(seed=utilities.stream_seed(seed, i))
+
+        # Keep the outgoing partons
+        outgoing = particles[particles['status'] == 23]
+        if len(outgoing) != 2:
+            raise ValueError('Scattering {} has {} outgoing partons, not 2'.format(i, len(outgoing)))
+        for name in PARTON_COLUMNS:
+            partons[name][i] = outgoing[name].to_numpy()
+        weights[i] = weight
+
+        if log_every and (i + 1) % log_every == 0:
+            logging.info('{} / {} scatterings generated'.format(i + 1, num))
+
+    np.savez_compressed(file_path, weight=weights, seed=str(seed), pthat_min=pThatmin, pthat_max=pThatmax,
+                        root_s=config.constants.ROOT_S, **partons)
+    logging.info('Saved bank to {}'.format(file_path))
+
+
+# Class for a bank of hard scatterings loaded from a file made by generate_bank
+class scattering_bank():
+    # Instantiation statement
+    def __init__(self, file_path):
+        with np.load(file_path) as bank_file:
+            self.partons = {name: bank_file[name] for name in PARTON_COLUMNS}
+            self.weight = bank_file['weight']
+            self.seed = str(bank_file['seed'])
+            self.pthat_min = float(bank_file['pthat_min'])
+            self.pthat_max = float(bank_file['pthat_max'])
+            self.root_s = float(bank_file['root_s'])
+        self.file_path = file_path
+
+        if self.pthat_min != config.jet.PTHATMIN or self.pthat_max != config.jet.PTHATMAX \
+                or self.root_s != config.constants.ROOT_S:
+            logging.warning('Scattering bank pTHat range [{}, {}] GeV at {} GeV does not match config'.format(
+                self.pthat_min, self.pthat_max, self.root_s))
+
+    def __len__(self):
+        return len(self.weight)
+
+    # Method to return the scattering at an index, as a dataframe of its outgoing partons and its weight
+    # The dataframe has the columns of pythia.scattering output. Mother and daughter indices are not kept.
+    def scattering(self, index):
+        particles = pd.DataFrame({name: np.zeros(2, dtype=int) for name in SCATTERING_COLUMNS})
+        particles['status'] = 23
+        for name in PARTON_COLUMNS:
+            particles[name] = self.partons[name][index].astype(int if name in ('id', 'col', 'acol') else float)
+        return particles, float(self.weight[index])
+
+    # Method to draw a scattering at a random index from rng, a numpy Generator (see utilities.stream_rng)
+    def draw(self, rng):
+        return self.scattering(int(rng.integers(0, len(self))))
+
+
+# Function to return the bank in a file, loading it on first use in this process
+def open_bank(file_path):
+    if file_path not in _banks:
+        logging.info('Loading scattering bank {}...'.format(file_path))
+        _banks[file_path] = scattering_bank(file_path)
+    return _banks[file_path]
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 3:
+        print('Usage: python scattering_bank.py <number of scatterings> <bank file (.npz)> [seed]')
+        sys.exit(1)
+    generate_bank(num=int(sys.argv[1]), file_path=sys.argv[2], seed=int(sys.argv[3]) if len(sys.argv) > 3 else None)
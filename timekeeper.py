@@ -3,15 +3,364 @@ import pandas as pd
 import logging
 import plasma_interaction as pi
 import config
-import xarray as xr
 from scipy import interpolate
+from scipy import optimize
 import os
 import traceback
+import copy
+import utilities
 
+# Phases a parton may see, in order of their integer codes in the trajectory record
+# qgp = Quark Gluon Plasma, hrg = HadRon Gas, unh = UNHydrodynamic hadron gas, vac = below unh cutoff / vacuum
+PHASES = np.array(['qgp', 'hrg', 'unh', 'vac'])
+PHASE_CODES = {phase: code for code, phase in enumerate(PHASES)}
 
+# Float-valued columns of the trajectory record, one entry per timestep
+RECORD_COLUMNS = ['time', 'x', 'y', 'q_drift', 'q_el', 'q_cel', 'q_fg_utau', 'q_fg_uperp', 'q_fg_utau_qhat',
+                  'q_fg_uperp_qhat', 'pT', 'temp', 'grad_perp_temp', 'grad_perp_utau', 'grad_perp_uperp',
+                  'u_perp', 'u_par', 'u']
+
+# Columns of the per-parton summary dataframe, with their types
+SUMMARY_COLUMNS = {
+    'partonNo': int,
+    'tag': int,
+    'weight': float,
+    'id': int,
+    'pt_0': float,
+    'pt_f': float,
+    'q_el': float,
+    'q_cel': float,
+    'q_drift': float,
+    'q_drift_abs': float,
+    'q_fg_utau': float,
+    'q_fg_utau_abs': float,
+    'q_fg_uperp': float,
+    'q_fg_uperp_abs': float,
+    'q_fg_utau_qhat': float,
+    'q_fg_utau_qhat_abs': float,
+    'q_fg_uperp_qhat': float,
+    'q_fg_uperp_qhat_abs': float,
+    'extinguished': bool,
+    'x_0': float,
+    'y_0': float,
+    'phi_0': float,
+    'phi_f': float,
+    't_qgp': float,
+    't_hrg': float,
+    't_unhydro': float,
+    'time_total_plasma': float,
+    'time_total_hrg': float,
+    'time_total_unhydro': float,
+    'Tmax_parton': float,
+    'Tavg_qgp_parton': float,
+    'initial_time': float,
+    'final_time': float,
+    'dtau': float,
+    'Tmax_event': float,
+    'drift': bool,
+    'el': bool,
+    'cel': bool,
+    'el_num': bool,
+    'fg': bool,
+    'fgqhat': bool,
+    'exit': int,
+    'g': float
+}
+
+
+# Structured dtype of a per-parton summary record
+SUMMARY_DTYPE = np.dtype([(column, column_type) for column, column_type in SUMMARY_COLUMNS.items()])
+
+
+# Function to build per-parton summary records from a dict of column values
+# Values may be scalars, for a single parton, or arrays with one entry per parton.
+# Returns a structured array with one SUMMARY_DTYPE record per parton.
+def summary_records(values):
+    num = max(np.size(values[column]) for column in SUMMARY_COLUMNS)
+    records = np.zeros(num, dtype=SUMMARY_DTYPE)
+    for column in SUMMARY_COLUMNS:
+        records[column] = values[column]
+    return records
+
+
+# Class to collect per-parton summary records for a whole event
+# Records are copied into a preallocated structured array, grown geometrically if the capacity is exceeded, so
+# that the summary dataframe is created once, when the event is written out, rather than once per parton.
+# extra_columns is a dict of further columns and their types, filled alongside each record, e.g. fragmentation
+# results or process tags.
+class summary_buffer():
+    # Instantiation statement. Capacity is the expected number of records.
+    def __init__(self, capacity=64, extra_columns=None):
+        if extra_columns is None:
+            extra_columns = {}
+        self.dtype = np.dtype(SUMMARY_DTYPE.descr + [(column, column_type)
+                                                      for column, column_type in extra_columns.items()])
+        self.data = np.zeros(max(int(capacity), 1), dtype=self.dtype)
+        self.length = 0
+
+    # Method to append summary records to the buffer
+    # Extra column values are given as keywords, and apply to every appended record.
+    def append(self, records, **values):
+        records = np.atleast_1d(records)
+        start = self.length
+        stop = start + len(records)
+        if stop > len(self.data):
+            grown = np.zeros(max(2 * len(self.data), stop), dtype=self.dtype)
+            grown[:self.length] = self.data[:self.length]
+            self.data = grown
+
+        rows = self.data[start:stop]
+        for column in records.dtype.names:
+            rows[column] = records[column]
+        for column, value in values.items():
+            rows[column] = value
+        self.length = stop
+
+    # Method to return the filled rows of the buffer as a structured array
+    def rows(self):
+        return self.data[:self.length]
+
+    def __len__(self):
+        return self.length
+
+    # Method to return the buffer as a dataframe
+    def to_dataframe(self):
+        return pd.DataFrame(self.data[:self.length])
+
+
+# Class to record the per-timestep history of a parton in the time loop
+# Rows are written into a preallocated columnar structured array, which is grown geometrically if the
+# capacity is exceeded and sliced to length only when the record is read out. Phases are stored as integer
+# codes into PHASES.
+class trajectory_recorder():
+    # Instantiation statement. Capacity is the expected number of timesteps.
+    def __init__(self, capacity=64):
+        self.dtype = np.dtype([(column, np.float64) for column in RECORD_COLUMNS] + [('phase', np.int8)])
+        self.data = np.zeros(max(int(capacity), 1), dtype=self.dtype)
+        self.length = 0
+
+    # Method to create a recorder with capacity for every timestep of the given event
+    @classmethod
+    def for_event(cls, event, dtau=None):
+        if dtau is None:
+            dtau = config.jet.DTAU
+        # Allow for a couple steps of round-off in the accumulated time
+        return cls(capacity=int(np.ceil((event.tf - event.t0) / dtau)) + 2)
+
+    # Method to append a timestep to the record
+    # Values are given as keywords from RECORD_COLUMNS, along with the phase name.
+    def record(self, phase, **values):
+        if self.length == len(self.data):
+            grown = np.zeros(2 * len(self.data), dtype=self.dtype)
+            grown[:self.length] = self.data
+            self.data = grown
+
+        row = self.data[self.length]
+        for column, value in values.items():
+            row[column] = value
+        row['phase'] = PHASE_CODES[phase]
+        self.length += 1
+
+    # Method to return the filled rows of the record as a structured array
+    def rows(self):
+        return self.data[:self.length]
+
+    # Method to return a recorded column, sliced to length
+    # The phase column is decoded back into phase names.
+    def column(self, column):
+        if column == 'phase':
+            return PHASES[self.data['phase'][:self.length]]
+        return self.data[column][:self.length]
+
+    # Method to return the integer phase codes of the record, sliced to length
+    def phase_codes(self):
+        return self.data['phase'][:self.length]
+
+    def __len__(self):
+        return self.length
+
+    # Method to return the record as an xarray dataset with variable attributes
+    # xarray is imported here, so that runs which keep no records never import it.
+    def to_xarray(self):
+        import xarray as xr
+
+        # define data with variable attributes
+        data_vars = {'x': (['time'], self.column('x'),
+                           {'units': 'fm',
+                            'long_name': 'x position coordinate'}),
+                     'y': (['time'], self.column('y'),
+                           {'units': 'fm',
+                            'long_name': 'y position coordinate'}),
+                     'q_drift': (['time'], self.column('q_drift'),
+                                 {'units': 'GeV',
+                                  'long_name': 'Momentum obtained by the parton at this timestep due to flow drift'}),
+                     'q_fg_utau': (['time'], self.column('q_fg_utau'),
+                              {'units': 'GeV',
+                               'long_name': 'Momentum obtained by the parton at this timestep due to flow-grad_utau drift'}),
+                     'q_fg_uperp': (['time'], self.column('q_fg_uperp'),
+                              {'units': 'GeV',
+                               'long_name': 'Momentum obtained by the parton at this timestep due to flow-grad_uperp drift'}),
+                     'q_el': (['time'], self.column('q_el'),
+                                {'units': 'GeV',
+                                 'long_name': 'Momentum obtained by the parton at this timestep due to radiative energy loss'}),
+                     'q_cel': (['time'], self.column('q_cel'),
+                              {'units': 'GeV',
+                               'long_name': 'Momentum obtained by the parton at this timestep due to collisional energy loss'}),
+                     'q_fg_utau_qhat': (['time'], self.column('q_fg_utau_qhat'),
+                              {'units': 'GeV',
+                               'long_name': 'Momentum obtained by the parton at this timestep due to fg_utau mod to energy loss'}),
+                     'q_fg_uperp_qhat': (['time'], self.column('q_fg_uperp_qhat'),
+                                  {'units': 'GeV',
+                                   'long_name': 'Momentum obtained by the parton at this timestep due to fg_uperp mod to energy loss'}),
+                     'pT': (['time'], self.column('pT'),
+                              {'units': 'GeV',
+                               'long_name': 'Transverse momentum of the parton at this timestep'}),
+                     'temp': (['time'], self.column('temp'),
+                              {'units': 'GeV',
+                               'long_name': 'Temperature seen by the parton at this timestep'}),
+                     'grad_perp_temp': (['time'], self.column('grad_perp_temp'),
+                              {'units': 'GeV/fm',
+                               'long_name': 'Gradient of Temperature perp. to parton seen by the parton at this timestep'}),
+                     'grad_perp_utau': (['time'], self.column('grad_perp_utau'),
+                                        {'units': 'GeV/fm',
+                                         'long_name': 'Gradient of utau perp. to parton seen by the parton at this timestep'}),
+                     'grad_perp_uperp': (['time'], self.column('grad_perp_uperp'),
+                                        {'units': 'GeV/fm',
+                                         'long_name': 'Gradient of uperp perp. to parton seen by the parton at this timestep'}),
+                     'u_perp': (['time'], self.column('u_perp'),
+                                {'units': 'GeV',
+                                 'long_name': 'Temperature seen by the parton at this timestep'}),
+                     'u_par': (['time'], self.column('u_par'),
+                               {'units': 'GeV',
+                                'long_name': 'Temperature seen by the parton at this timestep'}),
+                     'u': (['time'], self.column('u'),
+                           {'units': 'GeV',
+                            'long_name': 'Temperature seen by the parton at this timestep'}),
+                     'phase': (['time'], self.column('phase'),
+                               {'units': 'qgp = Quark Gluon Plasma, hrg = HadRon Gas, unh = UNHydrodynamic hadron gas, vac = below unh cutoff / vacuum',
+                                'long_name': 'Phase seen by the parton at this timestep'})
+                     }
+
+        # define coordinates
+        coords = {'time': (['time'], self.column('time'))}
+
+        # define global attributes
+        attrs = {'property_name': 'value'}
+
+        # create dataset
+        return xr.Dataset(data_vars=data_vars,
+                          coords=coords,
+                          attrs=attrs)
+
+
+# Function to decide the phase of the medium at a given temperature
+def temp_phase(temp, temp_hrg=config.jet.T_HRG, temp_unh=config.jet.T_UNHYDRO):
+    if temp > temp_hrg:
+        return 'qgp'
+    elif temp < temp_hrg and temp > temp_unh:
+        return 'hrg'
+    elif temp < temp_unh and temp > config.transport.hydro.T_SWITCH:
+        return 'unh'
+    else:
+        return 'vac'
+
+
+# Function to split a straight step into phases at the isotherms temp_hrg, temp_unh, and T_SWITCH
+# The step runs from (tau, x, y) at velocity (v_x, v_y) for dtau. The temperature along the step is bracketed at
+# num_brackets + 1 evenly spaced points, and each isotherm crossed between neighbouring points is located by Brent's
+# method on the interpolated temperature. Any part of the step beyond the event bounds is taken to stay in the phase
+# at the bounds.
+# Returns a list of (phase, start time, duration) pieces of the step, in time order.
+def phase_pieces(event, tau, x, y, v_x, v_y, dtau, temp_hrg=config.jet.T_HRG, temp_unh=config.jet.T_UNHYDRO,
+                 num_brackets=4):
+    # Find the fraction of the step within the event bounds
+    s_max = min(1, (event.tf - tau) / dtau)
+    for pos, vel, low, high in [(x, v_x, event.xmin, event.xmax), (y, v_y, event.ymin, event.ymax)]:
+        if vel > 0:
+            s_max = min(s_max, (high - pos) / (vel * dtau))
+        elif vel < 0:
+            s_max = min(s_max, (low - pos) / (vel * dtau))
+    s_max = max(s_max, 0)
+
+    def step_temp(s):
+        return event.temp(np.stack([tau + s * dtau, x + s * v_x * dtau, y + s * v_y * dtau], axis=-1))
+
+    # Locate isotherm crossings between bracket points
+    s_brackets = np.linspace(0, s_max, num_brackets + 1)
+    temp_brackets = step_temp(s_brackets)
+    isotherms = [temp_hrg, temp_unh, config.transport.hydro.T_SWITCH]
+    crossings = []
+    for i in range(num_brackets):
+        for isotherm in isotherms:
+            if (temp_brackets[i] - isotherm) * (temp_brackets[i + 1] - isotherm) < 0:
+                crossings.append(optimize.brentq(lambda s: float(step_temp(np.array([s]))[0]) - isotherm,
+                                                 s_brackets[i], s_brackets[i + 1]))
+
+    # Decide the phase of each piece from its temperature at the midpoint
+    bounds = np.concatenate([[0], np.sort(crossings), [1]])
+    s_mid = np.minimum((bounds[:-1] + bounds[1:]) / 2, s_max)
+    pieces = []
+    for start, stop, temp in zip(bounds[:-1], bounds[1:], step_temp(s_mid)):
+        phase = temp_phase(temp, temp_hrg=temp_hrg, temp_unh=temp_unh)
+        if pieces and pieces[-1][0] == phase:
+            pieces[-1] = (phase, pieces[-1][1], pieces[-1][2] + (stop - start) * dtau)
+        else:
+            pieces.append((phase, tau + start * dtau, (stop - start) * dtau))
+    return pieces
+
+
+# Function to return the lowest temperature at which a parton sees a phase other than vacuum
+def cold_threshold(temp_hrg=config.jet.T_HRG, temp_unh=config.jet.T_UNHYDRO):
+    return min(temp_hrg, temp_unh, config.transport.hydro.T_SWITCH)
+
+
+# Function to decide if a parton is beyond the event's cold horizon for the given threshold, moving away from it
+# Such a parton stays in vacuum along a straight line for the rest of the event.
+def beyond_cold_horizon(event, tau, x, y, p_x, p_y, threshold):
+    horizon = event.horizon_radius(time=tau, threshold=threshold)
+    if horizon is None:
+        return False
+    elif horizon == -np.inf:
+        return True
+    return (x ** 2 + y ** 2 > horizon ** 2) and (x * p_x + y * p_y >= 0)
+
+
+# Function to propagate a parton in a straight line until it leaves the grid or the event ends
+# Takes the parton's state at the start of a step at time tau which has passed the time loop's bounds checks, and
+# steps it exactly as the time loop would in vacuum. Returns the final position and exit code.
+def finish_straight(event, x, y, p_x, p_y, m, tau, dtau):
+    p_T = np.sqrt(p_x ** 2 + p_y ** 2)
+    phi = np.mod(np.arctan2(p_y, p_x), 2 * np.pi)
+    beta = p_T / np.sqrt(m ** 2 + p_T ** 2)
+
+    # Positions and times at the start of each following step
+    max_steps = int(np.ceil((event.tf - tau) / dtau)) + 2
+    taus = np.cumsum(np.concatenate([[tau], np.full(max_steps, dtau)]))[1:]
+    xs = np.cumsum(np.concatenate([[x], np.full(max_steps, beta * np.cos(phi) * dtau)]))[1:]
+    ys = np.cumsum(np.concatenate([[y], np.full(max_steps, beta * np.sin(phi) * dtau)]))[1:]
+
+    # Find the first step the time loop would not take
+    outside = (xs > event.xmax) | (ys > event.ymax) | (xs < event.xmin) | (ys < event.ymin)
+    last = int(np.argmax(outside | (taus > event.tf)))
+    if outside[last]:
+        exit_code = 0
+    else:
+        exit_code = 2
+    return float(xs[last]), float(ys[last]), exit_code
+
+
+# Function to propagate a single parton through the event
+# If keep_record is False, only running totals are kept for the summary dataframe -- no per-step trajectory record
+# is allocated and the returned record is None. The parton path is then also finished analytically once the parton is
+# beyond the event's cold horizon, as the remaining vacuum steps cannot change the summary.
+# If as_records is True, the summary is returned as SUMMARY_DTYPE structured records rather than a dataframe.
+# If phase_roots is True (default config.jet.PHASE_ROOTS), phase entry times and time totals are found by splitting
+# each step at its isotherm crossings (see phase_pieces), rather than counting the whole step in the phase at its start.
+# Medium interactions are still decided by the phase at the start of each step.
 def time_loop(event, parton, drift=True, el=True, fg=True, fgqhat=False, cel=False, scale_drift=1, scale_el=1, el_model='GLV',
-              temp_hrg=config.jet.T_HRG, temp_unh=config.jet.T_UNHYDRO):
-    parton_dataframe = pd.DataFrame({})  # Empty dataframe to return in case of issue.
+              temp_hrg=config.jet.T_HRG, temp_unh=config.jet.T_UNHYDRO, keep_record=True, as_records=False,
+              phase_roots=None):
+    parton_summary = np.zeros(0, dtype=SUMMARY_DTYPE)  # Empty summary to return in case of issue.
     # If using numerical energy loss, summon the interpolator
     if el_model == 'num_GLV':
         el_rate_interp = pi.num_eloss_interpolator()
@@ -25,6 +374,9 @@ def time_loop(event, parton, drift=True, el=True, fg=True, fgqhat=False, cel=Fal
     # Set loop parameters
     dtau = config.jet.DTAU  # dt for time loop in fm
     tau = event.t0  # Set current time in fm to initial time
+    horizon_threshold = cold_threshold(temp_hrg=temp_hrg, temp_unh=temp_unh)
+    if phase_roots is None:
+        phase_roots = config.jet.PHASE_ROOTS
 
     # Initialize counters & values
     t_qgp = -1
@@ -34,6 +386,8 @@ def time_loop(event, parton, drift=True, el=True, fg=True, fgqhat=False, cel=Fal
     hrg_time_total = 0
     unhydro_time_total = 0
     maxT = 0
+    qgp_temp_total = 0
+    qgp_steps = 0
     q_el_total = 0
     q_cel_total = 0
     q_drift_total = 0
@@ -55,26 +409,11 @@ def time_loop(event, parton, drift=True, el=True, fg=True, fgqhat=False, cel=Fal
     phase = None
     extinguished = False
 
-    # Initialize jet info storage arrays
-    time_array = np.array([])
-    xpos_array = np.array([])
-    ypos_array = np.array([])
-    q_drift_array = np.array([])
-    q_el_array = np.array([])
-    q_cel_array = np.array([])
-    q_fg_utau_array = np.array([])
-    q_fg_uperp_array = np.array([])
-    q_fg_utau_qhat_array = np.array([])
-    q_fg_uperp_qhat_array = np.array([])
-    pT_array = np.array([])
-    temp_seen_array = np.array([])
-    grad_perp_T_seen_array = np.array([])
-    grad_perp_utau_seen_array = np.array([])
-    grad_perp_uperp_seen_array = np.array([])
-    u_perp_array = np.array([])
-    u_par_array = np.array([])
-    u_array = np.array([])
-    phase_array = np.array([])
+    # Initialize jet info storage, if requested
+    if keep_record:
+        record = trajectory_recorder.for_event(event=event, dtau=dtau)
+    else:
+        record = None
 
     # Set failsafe values
     rho_final = 0
@@ -110,6 +449,15 @@ def time_loop(event, parton, drift=True, el=True, fg=True, fgqhat=False, cel=Fal
                 exit_code = 2
             break
 
+        # Finish analytically beyond the cold horizon, if no later temperature can change the max temperature seen
+        if (not keep_record and maxT >= horizon_threshold
+                and beyond_cold_horizon(event=event, tau=tau, x=parton.x, y=parton.y, p_x=parton.p_x, p_y=parton.p_y,
+                                        threshold=horizon_threshold)):
+            logging.info('Parton beyond cold horizon...')
+            parton.x, parton.y, exit_code = finish_straight(event=event, x=parton.x, y=parton.y, p_x=parton.p_x,
+                                                            p_y=parton.p_y, m=parton.m, tau=tau, dtau=dtau)
+            break
+
         # Record p_T at beginning of step for extinction check
         parton_og_p_T = parton.p_T()
 
@@ -117,22 +465,9 @@ def time_loop(event, parton, drift=True, el=True, fg=True, fgqhat=False, cel=Fal
         parton_point = parton.coords3(time=tau)
         parton_p_rho, parton_p_phi = parton.polar_mom_coords()
         temp = event.temp(parton_point)
-        grad_perp_T = event.grad_perp_T(point=parton_point, phi=parton_p_phi)
-        grad_perp_utau = event.grad_perp_u_par(point=parton_point, phi=parton_p_phi)
-        grad_perp_uperp = event.grad_perp_u_perp(point=parton_point, phi=parton_p_phi)
-        u_perp = event.u_perp(point=parton_point, phi=parton_p_phi)
-        u_par = event.u_par(point=parton_point, phi=parton_p_phi)
-        u = event.vel(parton_point)
 
         # Decide phase
-        if temp > temp_hrg:
-            phase = 'qgp'
-        elif temp < temp_hrg and temp > temp_unh:
-            phase = 'hrg'
-        elif temp < temp_unh and temp > config.transport.hydro.T_SWITCH:
-            phase = 'unh'
-        else:
-            phase = 'vac'
+        phase = temp_phase(temp, temp_hrg=temp_hrg, temp_unh=temp_unh)
 
         #################################
         # Perform partonic calculations #
@@ -253,50 +588,72 @@ def time_loop(event, parton, drift=True, el=True, fg=True, fgqhat=False, cel=Fal
         if temp > maxT:
             maxT = temp[0]
 
+        # Split the step into phases at isotherm crossings, if requested
+        if phase_roots:
+            p_rho = parton.p_T()
+            step_pieces = phase_pieces(event=event, tau=tau, x=parton.x, y=parton.y,
+                                       v_x=parton.beta() * parton.p_x / p_rho if p_rho > 0 else 0,
+                                       v_y=parton.beta() * parton.p_y / p_rho if p_rho > 0 else 0,
+                                       dtau=dtau, temp_hrg=temp_hrg, temp_unh=temp_unh)
+        else:
+            step_pieces = [(phase, tau, dtau)]
+
         # Decide phase for categorization & timekeeping
         if phase == 'qgp':
-            if qgp_first:
-                t_qgp = tau
-                qgp_first = False
+            qgp_temp_total += temp[0]
+            qgp_steps += 1
 
-            qgp_time_total += dtau
+        for piece_phase, piece_tau, piece_dtau in step_pieces:
+            if piece_phase == 'qgp':
+                if qgp_first:
+                    t_qgp = piece_tau
+                    qgp_first = False
 
-        # Decide phase for categorization & timekeeping
-        if phase == 'hrg':
-            if hrg_first:
-                t_hrg = tau
-                hrg_first = False
-
-            hrg_time_total += dtau
-
-        if phase == 'unh':
-            if unhydro_first:
-                t_unhydro = tau
-                unhydro_first = False
-
-            unhydro_time_total += dtau
-
-        # Record arrays of values from this step for the parton record
-        time_array = np.append(time_array, tau)
-        xpos_array = np.append(xpos_array, parton.x)
-        ypos_array = np.append(ypos_array, parton.y)
-        q_drift_array = np.append(q_drift_array, q_drift)
-        q_el_array = np.append(q_el_array, q_el)
-        q_cel_array = np.append(q_cel_array, q_cel)
-        #q_fg_T_array = np.append(q_fg_T_array, q_fg_T)
-        q_fg_utau_array = np.append(q_fg_utau_array, q_fg_utau)
-        q_fg_uperp_array = np.append(q_fg_uperp_array, q_fg_uperp)
-        q_fg_utau_qhat_array = np.append(q_fg_utau_qhat_array, q_fg_utau_qhat)
-        q_fg_uperp_qhat_array = np.append(q_fg_uperp_qhat_array, q_fg_uperp_qhat)
-        pT_array = np.append(pT_array, parton.p_T())
-        temp_seen_array = np.append(temp_seen_array, temp)
-        grad_perp_T_seen_array = np.append(grad_perp_T_seen_array, grad_perp_T)
-        grad_perp_utau_seen_array = np.append(grad_perp_utau_seen_array, grad_perp_utau)
-        grad_perp_uperp_seen_array = np.append(grad_perp_uperp_seen_array, grad_perp_uperp)
-        u_perp_array = np.append(u_perp_array, u_perp)
-        u_par_array = np.append(u_par_array, u_par)
-        u_array = np.append(u_array, u)
-        phase_array = np.append(phase_array, phase)
+                qgp_time_total += piece_dtau
+
+            if piece_phase == 'hrg':
+                if hrg_first:
+                    t_hrg = piece_tau
+                    hrg_first = False
+
+                hrg_time_total += piece_dtau
+
+            if piece_phase == 'unh':
+                if unhydro_first:
+                    t_unhydro = piece_tau
+                    unhydro_first = False
+
+                unhydro_time_total += piece_dtau
+
+        # Record values from this step for the parton record, if requested
+        if keep_record:
+            # Medium properties seen by the parton are only needed for the record
+            grad_perp_T = event.grad_perp_T(point=parton_point, phi=parton_p_phi)
+            grad_perp_utau = event.grad_perp_u_par(point=parton_point, phi=parton_p_phi)
+            grad_perp_uperp = event.grad_perp_u_perp(point=parton_point, phi=parton_p_phi)
+            u_perp = event.u_perp(point=parton_point, phi=parton_p_phi)
+            u_par = event.u_par(point=parton_point, phi=parton_p_phi)
+            u = event.vel(parton_point)
+
+            record.record(phase=phase,
+                          time=tau,
+                          x=parton.x,
+                          y=parton.y,
+                          q_drift=q_drift,
+                          q_el=q_el,
+                          q_cel=q_cel,
+                          q_fg_utau=q_fg_utau,
+                          q_fg_uperp=q_fg_uperp,
+                          q_fg_utau_qhat=q_fg_utau_qhat,
+                          q_fg_uperp_qhat=q_fg_uperp_qhat,
+                          pT=parton.p_T(),
+                          temp=temp[0],
+                          grad_perp_temp=grad_perp_T[0],
+                          grad_perp_utau=grad_perp_utau[0],
+                          grad_perp_uperp=grad_perp_uperp[0],
+                          u_perp=u_perp[0],
+                          u_par=u_par[0],
+                          u=u[0])
 
         ############################
         # Change Parton Parameters #
@@ -341,57 +698,62 @@ def time_loop(event, parton, drift=True, el=True, fg=True, fgqhat=False, cel=Fal
 
     logging.info('Time loop complete...')
 
-    mean_QGP_temp = np.mean(temp_seen_array[phase_array == 'qgp'])
+    if qgp_steps > 0:
+        mean_QGP_temp = qgp_temp_total / qgp_steps
+    else:
+        mean_QGP_temp = np.nan
     # Create momentPlasma results dataframe
     try:
         print('Making dataframe...')
-        parton_dataframe = pd.DataFrame(
+        parton_summary = summary_records(
             {
-                "partonNo": [int(parton.no)],
-                "tag": [int(parton.tag)],
-                "weight": [float(parton.weight)],
-                "id": [int(parton.id)],
-                "pt_0": [float(parton.p_T0)],
-                "pt_f": [float(pT_final)],
-                "q_el": [float(q_el_total)],
-                "q_cel": [float(q_cel_total)],
-                "q_drift": [float(q_drift_total)],
-                "q_drift_abs": [float(q_drift_abs_total)],
-                "q_fg_utau": [float(q_fg_utau_total)],
-                "q_fg_utau_abs": [float(q_fg_utau_abs_total)],
-                "q_fg_uperp": [float(q_fg_uperp_total)],
-                "q_fg_uperp_abs": [float(q_fg_uperp_abs_total)],
-                "q_fg_utau_qhat": [float(q_fg_utau_qhat_total)],
-                "q_fg_utau_qhat_abs": [float(q_fg_utau_qhat_abs_total)],
-                "q_fg_uperp_qhat": [float(q_fg_uperp_qhat_total)],
-                "q_fg_uperp_qhat_abs": [float(q_fg_uperp_qhat_abs_total)],
-                "extinguished": [bool(extinguished)],
-                "x_0": [float(parton.x_0)],
-                "y_0": [float(parton.y_0)],
-                "phi_0": [float(parton.phi_0)],
-                "phi_f": [float(phi_final)],
-                "t_qgp": [float(t_qgp)],
-                "t_hrg": [float(t_hrg)],
-                "t_unhydro": [float(t_unhydro)],
-                "time_total_plasma": [float(qgp_time_total)],
-                "time_total_hrg": [float(hrg_time_total)],
-                "time_total_unhydro": [float(unhydro_time_total)],
-                "Tmax_parton": [float(maxT)],
-                "Tavg_qgp_parton": [float(mean_QGP_temp)],
-                "initial_time": [float(event.t0)],
-                "final_time": [float(event.tf)],
-                "dtau": [float(config.jet.DTAU)],
-                "Tmax_event": [float(event.max_temp())],
-                "drift": [bool(drift)],
-                "el": [bool(el)],
-                "cel": [bool(cel)],
-                "el_num": [bool(el_num)],
-                "fg": [bool(fg)],
-                "fgqhat": [bool(fgqhat)],
-                "exit": [int(exit_code)],
-                "g": [float(config.constants.G)]
+                'partonNo': parton.no,
+                'tag': parton.tag,
+                'weight': parton.weight,
+                'id': parton.id,
+                'pt_0': parton.p_T0,
+                'pt_f': pT_final,
+                'q_el': q_el_total,
+                'q_cel': q_cel_total,
+                'q_drift': q_drift_total,
+                'q_drift_abs': q_drift_abs_total,
+                'q_fg_utau': q_fg_utau_total,
+                'q_fg_utau_abs': q_fg_utau_abs_total,
+                'q_fg_uperp': q_fg_uperp_total,
+                'q_fg_uperp_abs': q_fg_uperp_abs_total,
+                'q_fg_utau_qhat': q_fg_utau_qhat_total,
+                'q_fg_utau_qhat_abs': q_fg_utau_qhat_abs_total,
+                'q_fg_uperp_qhat': q_fg_uperp_qhat_total,
+                'q_fg_uperp_qhat_abs': q_fg_uperp_qhat_abs_total,
+                'extinguished': extinguished,
+                'x_0': parton.x_0,
+                'y_0': parton.y_0,
+                'phi_0': parton.phi_0,
+                'phi_f': phi_final,
+                't_qgp': t_qgp,
+                't_hrg': t_hrg,
+                't_unhydro': t_unhydro,
+                'time_total_plasma': qgp_time_total,
+                'time_total_hrg': hrg_time_total,
+                'time_total_unhydro': unhydro_time_total,
+                'Tmax_parton': maxT,
+                'Tavg_qgp_parton': mean_QGP_temp,
+                'initial_time': event.t0,
+                'final_time': event.tf,
+                'dtau': config.jet.DTAU,
+                'Tmax_event': event.max_temp(),
+                'drift': drift,
+                'el': el,
+                'cel': cel,
+                'el_num': el_num,
+                'fg': fg,
+                'fgqhat': fgqhat,
+                'exit': exit_code,
+                'g': config.constants.G
             }
         )
+        if not as_records:
+            parton_summary = pd.DataFrame(parton_summary)
 
         logging.info('Pandas dataframe generated...')
 
@@ -400,78 +762,619 @@ def time_loop(event, parton, drift=True, el=True, fg=True, fgqhat=False, cel=Fal
         logging.info('- Parton Dataframe Creation Failed -')
         traceback.print_exc()
 
-    # Create and store parton record xarray
-    # define data with variable attributes
-    logging.info('Creating xarray parton record...')
-    data_vars = {'x': (['time'], xpos_array,
-                       {'units': 'fm',
-                        'long_name': 'x position coordinate'}),
-                 'y': (['time'], ypos_array,
-                       {'units': 'fm',
-                        'long_name': 'y position coordinate'}),
-                 'q_drift': (['time'], q_drift_array,
-                             {'units': 'GeV',
-                              'long_name': 'Momentum obtained by the parton at this timestep due to flow drift'}),
-                 'q_fg_utau': (['time'], q_fg_utau_array,
-                          {'units': 'GeV',
-                           'long_name': 'Momentum obtained by the parton at this timestep due to flow-grad_utau drift'}),
-                 'q_fg_uperp': (['time'], q_fg_uperp_array,
-                          {'units': 'GeV',
-                           'long_name': 'Momentum obtained by the parton at this timestep due to flow-grad_uperp drift'}),
-                 'q_el': (['time'], q_el_array,
-                            {'units': 'GeV',
-                             'long_name': 'Momentum obtained by the parton at this timestep due to radiative energy loss'}),
-                 'q_cel': (['time'], q_cel_array,
-                          {'units': 'GeV',
-                           'long_name': 'Momentum obtained by the parton at this timestep due to collisional energy loss'}),
-                 'q_fg_utau_qhat': (['time'], q_fg_utau_qhat_array,
-                          {'units': 'GeV',
-                           'long_name': 'Momentum obtained by the parton at this timestep due to fg_utau mod to energy loss'}),
-                 'q_fg_uperp_qhat': (['time'], q_fg_uperp_qhat_array,
-                              {'units': 'GeV',
-                               'long_name': 'Momentum obtained by the parton at this timestep due to fg_uperp mod to energy loss'}),
-                 'pT': (['time'], pT_array,
-                          {'units': 'GeV',
-                           'long_name': 'Transverse momentum of the parton at this timestep'}),
-                 'temp': (['time'], temp_seen_array,
-                          {'units': 'GeV',
-                           'long_name': 'Temperature seen by the parton at this timestep'}),
-                 'grad_perp_temp': (['time'], grad_perp_T_seen_array,
-                          {'units': 'GeV/fm',
-                           'long_name': 'Gradient of Temperature perp. to parton seen by the parton at this timestep'}),
-                 'grad_perp_utau': (['time'], grad_perp_utau_seen_array,
-                                    {'units': 'GeV/fm',
-                                     'long_name': 'Gradient of utau perp. to parton seen by the parton at this timestep'}),
-                 'grad_perp_uperp': (['time'], grad_perp_uperp_seen_array,
-                                    {'units': 'GeV/fm',
-                                     'long_name': 'Gradient of uperp perp. to parton seen by the parton at this timestep'}),
-                 'u_perp': (['time'], u_perp_array,
-                            {'units': 'GeV',
-                             'long_name': 'Temperature seen by the parton at this timestep'}),
-                 'u_par': (['time'], u_par_array,
-                           {'units': 'GeV',
-                            'long_name': 'Temperature seen by the parton at this timestep'}),
-                 'u': (['time'], u_array,
-                       {'units': 'GeV',
-                        'long_name': 'Temperature seen by the parton at this timestep'}),
-                 'phase': (['time'], phase_array,
-                           {'units': 'qgp = Quark Gluon Plasma, hrg = HadRon Gas, unh = UNHydrodynamic hadron gas, vac = below unh cutoff / vacuum',
-                            'long_name': 'Phase seen by the parton at this timestep'})
-                 }
+    # Create and store parton record xarray, if requested
+    if keep_record:
+        logging.info('Creating xarray parton record...')
+        parton_xarray = record.to_xarray()
+        logging.info('Xarray dataframe generated...')
+    else:
+        parton_xarray = None
+
+    parton.record = parton_xarray
 
-    # define coordinates
-    coords = {'time': (['time'], time_array)}
+    return parton_summary, parton_xarray
 
-    # define global attributes
-    attrs = {'property_name': 'value'}
 
-    # create dataset
-    parton_xarray = xr.Dataset(data_vars=data_vars,
-                            coords=coords,
-                            attrs=attrs)
+# Function to propagate many partons through the event at once
+# Partons are held as arrays (structure-of-arrays) and all advanced one dtau step at a time, with the medium sampled
+# for every active parton in batched interpolator calls (see the batched kernels in plasma_interaction). Partons are
+# retired on escape, extinction, or time-out with the same exit codes as time_loop, and finished analytically beyond
+# the event's cold horizon.
+# Physics flags, scales, and the coupling g (default config.constants.G) may be given per parton as arrays, or as
+# scalars for all partons. If share_tol is given, partons whose positions and momentum angles agree within share_tol
+# share medium lookups -- e.g. copies of one parton run with different physics cases, until their paths diverge.
+# phase_roots (default config.jet.PHASE_ROOTS) splits each step's phase timekeeping at isotherm crossings, as in
+# time_loop.
+# Returns the per-parton summary dataframe, with the same columns as time_loop, and updates the partons' final
+# positions and momenta in place. No per-step trajectory records are kept. If as_records is True, the summary is
+# returned as SUMMARY_DTYPE structured records rather than a dataframe.
+def time_loop_batch(event, partons, drift=True, el=True, fg=True, fgqhat=False, cel=False, scale_drift=1,
+                    scale_el=1, el_model='GLV', temp_hrg=config.jet.T_HRG, temp_unh=config.jet.T_UNHYDRO, g=None,
+                    share_tol=None, as_records=False, phase_roots=None):
+    num = len(partons)
 
-    parton.record = parton_xarray
+    # Set per-parton coupling
+    if g is None:
+        g = config.constants.G
+    g = np.broadcast_to(np.asarray(g, dtype=float), (num,))
+
+    # If using numerical energy loss, summon the interpolators for each coupling
+    if el_model == 'num_GLV':
+        el_rate_interps = {g_val: pi.num_eloss_interpolator(g=g_val) for g_val in np.unique(g)}
+        el_num = True
+    else:
+        el_num = False
+
+    # Set per-parton physics flags
+    drift = np.broadcast_to(np.asarray(drift, dtype=bool), (num,))
+    el = np.broadcast_to(np.asarray(el, dtype=bool), (num,))
+    fg = np.broadcast_to(np.asarray(fg, dtype=bool), (num,))
+    fgqhat = np.broadcast_to(np.asarray(fgqhat, dtype=bool), (num,))
+    cel = np.broadcast_to(np.asarray(cel, dtype=bool), (num,))
+    scale_drift = np.broadcast_to(np.asarray(scale_drift, dtype=float), (num,))
+    scale_el = np.broadcast_to(np.asarray(scale_el, dtype=float), (num,))
+
+    # Load parton state into arrays
+    x = np.array([parton.x for parton in partons], dtype=float)
+    y = np.array([parton.y for parton in partons], dtype=float)
+    p_x = np.array([parton.p_x for parton in partons], dtype=float)
+    p_y = np.array([parton.p_y for parton in partons], dtype=float)
+    m = np.array([parton.m for parton in partons], dtype=float)
+    pid = np.array([parton.id for parton in partons], dtype=int)
+    active = np.ones(num, dtype=bool)
+
+    #############
+    # Time Loop #
+    #############
+    # Set loop parameters
+    dtau = config.jet.DTAU  # dt for time loop in fm
+    tau = event.t0  # Set current time in fm to initial time
+    horizon_threshold = cold_threshold(temp_hrg=temp_hrg, temp_unh=temp_unh)
+    if phase_roots is None:
+        phase_roots = config.jet.PHASE_ROOTS
+
+    # Initialize counters & values
+    t_qgp = np.full(num, -1.0)
+    t_hrg = np.full(num, -1.0)
+    t_unhydro = np.full(num, -1.0)
+    qgp_time_total = np.zeros(num)
+    hrg_time_total = np.zeros(num)
+    unhydro_time_total = np.zeros(num)
+    phase_times = {PHASE_CODES['qgp']: (t_qgp, qgp_time_total),
+                   PHASE_CODES['hrg']: (t_hrg, hrg_time_total),
+                   PHASE_CODES['unh']: (t_unhydro, unhydro_time_total)}
+    maxT = np.zeros(num)
+    qgp_temp_total = np.zeros(num)
+    qgp_steps = np.zeros(num, dtype=int)
+    totals = {key: np.zeros(num) for key in ['q_el', 'q_cel', 'q_drift', 'q_drift_abs', 'q_fg_utau', 'q_fg_utau_abs',
+                                             'q_fg_uperp', 'q_fg_uperp_abs', 'q_fg_utau_qhat',
+                                             'q_fg_utau_qhat_abs', 'q_fg_uperp_qhat', 'q_fg_uperp_qhat_abs']}
+    phase = np.full(num, -1)
+    extinguished = np.zeros(num, dtype=bool)
+    exit_code = np.zeros(num, dtype=int)
+
+    # Set failsafe values
+    phi_final = np.zeros(num)
+    pT_final = np.zeros(num)
+
+    # Initiate loop
+    logging.info('Initiating batched time loop for {} partons...'.format(num))
+    while np.any(active):
+        #########################
+        # Set Current Step Data #
+        #########################
+        # Retire partons out of bounds of the grid
+        escaped = active & ((x > event.xmax) | (y > event.ymax) | (x < event.xmin) | (y < event.ymin))
+        exit_code[escaped] = 0
+        active &= ~escaped
+        if tau > event.tf:
+            exit_code[active] = np.where(phase[active] == PHASE_CODES['qgp'], 3, 2)
+            active[:] = False
+
+        # Finish analytically beyond the cold horizon, if no later temperature can change the max temperature seen
+        horizon = event.horizon_radius(time=tau, threshold=horizon_threshold)
+        if horizon is not None:
+            cold = active & (maxT >= horizon_threshold) & ((horizon == -np.inf)
+                                                           | ((x ** 2 + y ** 2 > horizon ** 2)
+                                                              & (x * p_x + y * p_y >= 0)))
+            for row in np.flatnonzero(cold):
+                x[row], y[row], exit_code[row] = finish_straight(event=event, x=x[row], y=y[row], p_x=p_x[row],
+                                                                 p_y=p_y[row], m=m[row], tau=tau, dtau=dtau)
+            active &= ~cold
+        if not np.any(active):
+            break
+        rows = np.flatnonzero(active)
+
+        # Compute parton kinematics at beginning of step
+        p_T = np.sqrt(p_x[rows]**2 + p_y[rows]**2)
+        beta = p_T / np.sqrt(m[rows]**2 + p_T**2)
+        p_phi = np.mod(np.arctan2(p_y[rows], p_x[rows]), 2 * np.pi)
+
+        # For timekeeping in phases, we approximate all time in one step as in one phase
+        points = np.stack([np.full(len(rows), tau), x[rows], y[rows]], axis=-1)
+        if share_tol is not None:
+            unique, inverse = utilities.unique_rows(points, tol=share_tol)
+            temp = event.temp(points[unique])[inverse]
+        else:
+            temp = event.temp(points)
+
+        # Decide phase
+        step_phase = np.full(len(rows), PHASE_CODES['vac'])
+        step_phase[(temp < temp_unh) & (temp > config.transport.hydro.T_SWITCH)] = PHASE_CODES['unh']
+        step_phase[(temp < temp_hrg) & (temp > temp_unh)] = PHASE_CODES['hrg']
+        step_phase[temp > temp_hrg] = PHASE_CODES['qgp']
+        phase[rows] = step_phase
+
+        #################################
+        # Perform partonic calculations #
+        #################################
+        # If not in QGP, don't compute any parton-medium interactions
+        q = {key: np.zeros(len(rows)) for key in ['q_drift', 'q_el', 'q_cel', 'q_fg_utau', 'q_fg_uperp',
+                                                  'q_fg_utau_qhat', 'q_fg_uperp_qhat']}
+        qgp = step_phase == PHASE_CODES['qgp']
+        if np.any(qgp):
+            q_rows = rows[qgp]
+            q_E, q_beta, q_phi = p_T[qgp], beta[qgp], p_phi[qgp]
+            fields = pi.MEDIUM_FIELDS
+            if np.any(fg[q_rows] | fgqhat[q_rows]):
+                fields = fields + pi.FG_MEDIUM_FIELDS
+            medium = pi.sample_medium(event=event, t=tau, x=x[q_rows], y=y[q_rows], phi=q_phi, beta=q_beta,
+                                      fields=fields, share_tol=share_tol)
+            kernel_args = {'event': event, 'E': q_E, 'beta': q_beta, 'phi': q_phi, 'x': x[q_rows], 'y': y[q_rows],
+                           't': tau, 'pid': pid[q_rows], 'g': g[q_rows], 'medium': medium}
+
+            # Compute drift, if enabled
+            q_drift = np.zeros(len(q_rows))
+            if np.any(drift[q_rows]):
+                int_drift = pi.drift_integrand_batch(**kernel_args)
+                q_drift = np.where(drift[q_rows], q_beta * dtau * int_drift * scale_drift[q_rows], 0)
+
+            # Compute energy loss, if enabled
+            int_el = np.zeros(len(q_rows))
+            if np.any(el[q_rows]):
+                if el_model == 'num_GLV':
+                    for g_val, el_rate_interp in el_rate_interps.items():
+                        g_rows = g[q_rows] == g_val
+                        if np.any(g_rows):
+                            int_el[g_rows] = el_rate_interp.eloss_rate_batch(
+                                event=event, E=q_E[g_rows], beta=q_beta[g_rows], phi=q_phi[g_rows],
+                                x=x[q_rows][g_rows], y=y[q_rows][g_rows], t=tau, pid=pid[q_rows][g_rows],
+                                medium={key: value[g_rows] for key, value in medium.items()})
+                else:
+                    int_el = pi.energy_loss_integrand_batch(model=el_model, **kernel_args)
+                int_el = np.where(el[q_rows], int_el, 0)
+            q_el = q_beta * dtau * int_el * scale_el[q_rows]
+
+            # Compute collisional energy loss, if enabled
+            q_cel = np.zeros(len(q_rows))
+            if np.any(cel[q_rows]):
+                int_cel = pi.coll_energy_loss_integrand_batch(**kernel_args)
+                q_cel = np.where(cel[q_rows], q_beta * dtau * int_cel, 0)
+
+            # Compute mixed flow-gradient drift, if enabled
+            q_fg_utau = np.zeros(len(q_rows))
+            q_fg_uperp = np.zeros(len(q_rows))
+            if np.any(fg[q_rows]):
+                int_fg_utau = pi.flowgrad_utau_integrand_batch(**kernel_args)
+                int_fg_uperp = pi.flowgrad_uperp_integrand_batch(**kernel_args)
+                q_fg_utau = np.where(fg[q_rows], q_beta * dtau * int_fg_utau, 0)
+                q_fg_uperp = np.where(fg[q_rows], q_beta * dtau * int_fg_uperp, 0)
+
+            # Compute correction to energy loss due to flow-gradient modification, if enabled
+            q_fg_utau_qhat = np.zeros(len(q_rows))
+            q_fg_uperp_qhat = np.zeros(len(q_rows))
+            if np.any(fgqhat[q_rows]):
+                int_fg_utau_qhat = int_el * pi.fg_utau_qhat_mod_factor_batch(event=event, beta=q_beta, phi=q_phi,
+                                                                             x=x[q_rows], y=y[q_rows], t=tau,
+                                                                             medium=medium)
+                int_fg_uperp_qhat = int_el * pi.fg_uperp_qhat_mod_factor_batch(event=event, beta=q_beta, phi=q_phi,
+                                                                               x=x[q_rows], y=y[q_rows], t=tau,
+                                                                               medium=medium)
+                q_fg_utau_qhat = np.where(fgqhat[q_rows], q_beta * dtau * int_fg_utau_qhat * scale_el[q_rows], 0)
+                q_fg_uperp_qhat = np.where(fgqhat[q_rows], q_beta * dtau * int_fg_uperp_qhat * scale_el[q_rows], 0)
+
+            q['q_drift'][qgp] = q_drift
+            q['q_el'][qgp] = q_el
+            q['q_cel'][qgp] = q_cel
+            q['q_fg_utau'][qgp] = q_fg_utau
+            q['q_fg_uperp'][qgp] = q_fg_uperp
+            q['q_fg_utau_qhat'][qgp] = q_fg_utau_qhat
+            q['q_fg_uperp_qhat'][qgp] = q_fg_uperp_qhat
+
+        ###################
+        # Data Accounting #
+        ###################
+        # Log momentum transfers
+        for key in q:
+            totals[key][rows] += q[key]
+        for key in ['q_drift', 'q_fg_utau', 'q_fg_uperp', 'q_fg_utau_qhat', 'q_fg_uperp_qhat']:
+            totals[key + '_abs'][rows] += np.abs(q[key])
+
+        # Check for max temperature
+        maxT[rows] = np.maximum(maxT[rows], temp)
+
+        # Decide phase for categorization & timekeeping
+        if phase_roots:
+            # Split each parton's step into phases at isotherm crossings
+            for row, row_beta, row_phi in zip(rows, beta, p_phi):
+                for piece_phase, piece_tau, piece_dtau in phase_pieces(
+                        event=event, tau=tau, x=x[row], y=y[row], v_x=row_beta * np.cos(row_phi),
+                        v_y=row_beta * np.sin(row_phi), dtau=dtau, temp_hrg=temp_hrg, temp_unh=temp_unh):
+                    if PHASE_CODES[piece_phase] in phase_times:
+                        t_first, time_total = phase_times[PHASE_CODES[piece_phase]]
+                        if t_first[row] == -1:
+                            t_first[row] = piece_tau
+                        time_total[row] += piece_dtau
+        else:
+            for code, (t_first, time_total) in phase_times.items():
+                in_phase = rows[step_phase == code]
+                t_first[in_phase[t_first[in_phase] == -1]] = tau
+                time_total[in_phase] += dtau
+        qgp_temp_total[rows[qgp]] += temp[qgp]
+        qgp_steps[rows[qgp]] += 1
+
+        ############################
+        # Change Parton Parameters #
+        ############################
+        # Note -- We propagate FIRST in order to travel over the timestep whose medium properties we're averaging.
+        # Propagate parton position
+        x[rows] = x[rows] + beta * np.cos(p_phi) * dtau
+        y[rows] = y[rows] + beta * np.sin(p_phi) * dtau
+
+        # Change parton momentum to reflect energy loss, then drift effects
+        # If not computed, q values go to zero.
+        step_p_x, step_p_y = p_x[rows], p_y[rows]
+        for key, angle_shift in [('q_el', 0), ('q_cel', 0), ('q_fg_utau_qhat', 0), ('q_fg_uperp_qhat', 0),
+                                 ('q_drift', np.pi / 2), ('q_fg_utau', np.pi / 2), ('q_fg_uperp', np.pi / 2)]:
+            angle = np.mod(np.arctan2(step_p_y, step_p_x), 2 * np.pi) + angle_shift
+            step_p_x = step_p_x + q[key] * np.cos(angle)
+            step_p_y = step_p_y + q[key] * np.sin(angle)
+        p_x[rows] = step_p_x
+        p_y[rows] = step_p_y
+
+        # Check if the "jet" would be extinguished (prevents flipping directions
+        # when T >> p_T, since q_el has no p_T dependence):
+        # If the parton lost more energy this step than it had
+        # at the beginning of the step, we extinguish the "jet" and end things
+        out = np.abs(q['q_el']) >= p_T
+        if np.any(out):
+            logging.info('{} partons extinguished'.format(np.sum(out)))
+            p_x[rows[out]] = 0
+            p_y[rows[out]] = 0
+            extinguished[rows[out]] = True
+            exit_code[rows[out]] = 1
+            active[rows[out]] = False
+
+        ###############
+        # Timekeeping #
+        ###############
+        tau += dtau
+
+        # Get final parton parameters
+        kept = rows[~out]
+        phi_final[kept] = np.mod(np.arctan2(p_y[kept], p_x[kept]), 2 * np.pi)
+        pT_final[kept] = np.sqrt(p_x[kept]**2 + p_y[kept]**2)
+
+    logging.info('Batched time loop complete...')
+
+    # Write final state back to partons
+    for i, parton in enumerate(partons):
+        parton.x = float(x[i])
+        parton.y = float(y[i])
+        parton.p_x = float(p_x[i])
+        parton.p_y = float(p_y[i])
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_QGP_temp = qgp_temp_total / qgp_steps
+
+    # Create momentPlasma results dataframe
+    values = {
+        'partonNo': [parton.no for parton in partons],
+        'tag': [parton.tag for parton in partons],
+        'weight': [parton.weight for parton in partons],
+        'id': pid,
+        'pt_0': [parton.p_T0 for parton in partons],
+        'pt_f': pT_final,
+        'extinguished': extinguished,
+        'x_0': [parton.x_0 for parton in partons],
+        'y_0': [parton.y_0 for parton in partons],
+        'phi_0': [parton.phi_0 for parton in partons],
+        'phi_f': phi_final,
+        't_qgp': t_qgp,
+        't_hrg': t_hrg,
+        't_unhydro': t_unhydro,
+        'time_total_plasma': qgp_time_total,
+        'time_total_hrg': hrg_time_total,
+        'time_total_unhydro': unhydro_time_total,
+        'Tmax_parton': maxT,
+        'Tavg_qgp_parton': mean_QGP_temp,
+        'initial_time': np.full(num, event.t0),
+        'final_time': np.full(num, event.tf),
+        'dtau': np.full(num, config.jet.DTAU),
+        'Tmax_event': np.full(num, float(np.squeeze(event.max_temp()))),
+        'drift': drift,
+        'el': el,
+        'cel': cel,
+        'el_num': np.full(num, el_num),
+        'fg': fg,
+        'fgqhat': fgqhat,
+        'exit': exit_code,
+        'g': g
+    }
+    values.update(totals)
+    parton_summary = summary_records(values)
+    if not as_records:
+        parton_summary = pd.DataFrame(parton_summary)
+
+    logging.info('Pandas dataframe generated...')
+
+    return parton_summary
+
+
+# Function to propagate a single parton through the event along a straight (eikonal) path
+# Without drift or flow-gradient drift, only parallel momentum transfers are applied, so the parton travels along a
+# fixed ray. We sample the medium along the whole ray in one call and integrate the energy loss as a cumulative sum
+# along the path, stopping at extinction. As the loss rates (and, for massive partons, the velocity) depend on the
+# parton momentum, the momentum profile along the path is found by fixed-point (Picard) iteration, resampling the
+# medium only if the path moves. Falls back to time_loop if the iteration does not converge, or if the parton
+# momentum would flip direction without extinguishing the parton.
+# phase_roots (default config.jet.PHASE_ROOTS) splits each step's phase timekeeping at isotherm crossings, as in
+# time_loop.
+# Returns the same summary dataframe (or, if as_records, structured records) as time_loop, with no trajectory record.
+def time_loop_eikonal(event, parton, el=True, fgqhat=False, cel=False, scale_el=1, el_model='GLV',
+                      temp_hrg=config.jet.T_HRG, temp_unh=config.jet.T_UNHYDRO, max_iter=50, rtol=1e-12,
+                      as_records=False, phase_roots=None):
+    # If using numerical energy loss, summon the interpolator
+    if el_model == 'num_GLV':
+        el_rate_interp = pi.num_eloss_interpolator()
+        el_num = True
+    else:
+        el_num = False
+
+    # Set path parameters
+    dtau = config.jet.DTAU  # dt for time loop in fm
+    if phase_roots is None:
+        phase_roots = config.jet.PHASE_ROOTS
+    p_0 = parton.p_T()
+    phi = parton.polar_mom_coords()[1]
+    cos_phi = np.cos(phi)
+    sin_phi = np.sin(phi)
+
+    # Times of each step the parton may take before the event ends, accumulated as in time_loop
+    max_steps = int(np.ceil((event.tf - event.t0) / dtau)) + 2
+    taus = np.cumsum(np.concatenate([[event.t0], np.full(max_steps, dtau)]))
+    num_time = int(np.sum(taus <= event.tf))
+    taus = taus[:num_time + 1]
+
+    # Fixed-point iteration over the momentum profile at the start of each step
+    pT = np.full(num_time + 1, p_0)
+    path = None
+    converged = False
+    for iteration in range(max_iter):
+        # Compute path positions from the current momentum profile
+        beta = pT / np.sqrt(parton.m**2 + pT**2)
+        x = np.cumsum(np.concatenate([[parton.x], beta[:-1] * cos_phi * dtau]))
+        y = np.cumsum(np.concatenate([[parton.y], beta[:-1] * sin_phi * dtau]))
+
+        # Decide how many steps the parton takes before leaving the grid or running out of time
+        outside = (x > event.xmax) | (y > event.ymax) | (x < event.xmin) | (y < event.ymin)
+        if np.any(outside):
+            num_run = int(np.argmax(outside))
+            exit_code = 0
+        else:
+            num_run = num_time
+            exit_code = None
+
+        # Sample the medium along the path, if it has moved
+        if path is None or path[0] != num_run or not (np.array_equal(path[1], x[:num_run])
+                                                    and np.array_equal(path[2], y[:num_run])):
+            if num_run > 0:
+                temp = event.temp(np.stack([taus[:num_run], x[:num_run], y[:num_run]], axis=-1))
+            else:
+                temp = np.zeros(0)
+
+            # Decide phase
+            phase = np.full(num_run, PHASE_CODES['vac'])
+            phase[(temp < temp_unh) & (temp > config.transport.hydro.T_SWITCH)] = PHASE_CODES['unh']
+            phase[(temp < temp_hrg) & (temp > temp_unh)] = PHASE_CODES['hrg']
+            phase[temp > temp_hrg] = PHASE_CODES['qgp']
+            qgp = phase == PHASE_CODES['qgp']
+
+            fields = pi.MEDIUM_FIELDS + pi.FG_MEDIUM_FIELDS if fgqhat else pi.MEDIUM_FIELDS
+            medium = pi.sample_medium(event=event, t=taus[:num_run][qgp], x=x[:num_run][qgp], y=y[:num_run][qgp],
+                                      phi=np.full(np.sum(qgp), phi), beta=beta[:num_run][qgp], fields=fields)
+            path = (num_run, x[:num_run], y[:num_run])
+
+        # Compute momentum transfers in the QGP
+        q_el = np.zeros(num_run)
+        q_cel = np.zeros(num_run)
+        q_fg_utau_qhat = np.zeros(num_run)
+        q_fg_uperp_qhat = np.zeros(num_run)
+        if np.any(qgp):
+            q_beta = beta[:num_run][qgp]
+            kernel_args = {'event': event, 'E': pT[:num_run][qgp], 'beta': q_beta, 'phi': np.full(np.sum(qgp), phi),
+                           'x': x[:num_run][qgp], 'y': y[:num_run][qgp], 't': taus[:num_run][qgp],
+                           'pid': np.full(np.sum(qgp), parton.id), 'medium': medium}
+            int_el = np.zeros(np.sum(qgp))
+            if el:
+                if el_model == 'num_GLV':
+                    int_el = el_rate_interp.eloss_rate_batch(**kernel_args)
+                else:
+                    int_el = pi.energy_loss_integrand_batch(model=el_model, **kernel_args)
+                q_el[qgp] = q_beta * dtau * int_el * scale_el
+            if cel:
+                q_cel[qgp] = q_beta * dtau * pi.coll_energy_loss_integrand_batch(**kernel_args)
+            if fgqhat:
+                mod_args = {key: kernel_args[key] for key in ['event', 'beta', 'phi', 'x', 'y', 't', 'medium']}
+                q_fg_utau_qhat[qgp] = (q_beta * dtau * (int_el * pi.fg_utau_qhat_mod_factor_batch(**mod_args))
+                                       * scale_el)
+                q_fg_uperp_qhat[qgp] = (q_beta * dtau * (int_el * pi.fg_uperp_qhat_mod_factor_batch(**mod_args))
+                                        * scale_el)
+
+        # Check for extinction
+        extinct = np.abs(q_el) >= pT[:num_run]
+        if np.any(extinct):
+            num_steps = int(np.argmax(extinct)) + 1
+            exit_code = 1
+        else:
+            num_steps = num_run
+
+        # Accumulate momentum profile along the path, in the order time_loop applies the transfers
+        # Momentum flips from the remaining transfers are pathological -- we leave them to time_loop.
+        num_kept = num_steps - 1 if exit_code == 1 else num_steps
+        partial = pT[:num_kept] + q_el[:num_kept]
+        flipped = partial <= 0
+        partial = partial + q_cel[:num_kept]
+        flipped |= partial <= 0
+        partial = partial + q_fg_utau_qhat[:num_kept]
+        flipped |= partial <= 0
+        partial = partial + q_fg_uperp_qhat[:num_kept]
+        flipped |= partial <= 0
+        if np.any(flipped):
+            logging.info('Parton momentum flips along eikonal path...')
+            break
+        step_q = q_el + q_cel + q_fg_utau_qhat + q_fg_uperp_qhat
+        pT_new = np.concatenate([[p_0], p_0 + np.cumsum(step_q[:num_kept])])
+        pT_new = np.concatenate([pT_new, np.full(num_time + 1 - len(pT_new), pT_new[-1])])
+
+        # Early iterates may overshoot to unphysical momenta, so we keep the profile used for the next
+        # iterate positive. The converged profile is unaffected.
+        change = np.max(np.abs(pT_new - pT))
+        pT = np.maximum(pT_new, p_0 * rtol)
+        if change <= rtol * p_0:
+            converged = True
+            break
+
+    if not converged:
+        logging.info('No eikonal solution, falling back to time_loop...')
+        parton_summary, parton_xarray = time_loop(event=event, parton=parton, drift=False, el=el, fg=False,
+                                                  fgqhat=fgqhat, cel=cel, scale_el=scale_el, el_model=el_model,
+                                                  temp_hrg=temp_hrg, temp_unh=temp_unh, keep_record=False,
+                                                  as_records=as_records, phase_roots=phase_roots)
+        return parton_summary
+
+    # Decide time-out exit code from the last phase seen
+    if exit_code is None:
+        if num_steps > 0 and phase[num_steps - 1] == PHASE_CODES['qgp']:
+            exit_code = 3
+        else:
+            exit_code = 2
+    extinguished = exit_code == 1
+
+    # Get final parton parameters
+    # As in time_loop, extinguished partons report the momentum from the start of their final step.
+    num_final = num_steps - 1 if extinguished else num_steps
+    if num_final > 0:
+        pT_final = pT[num_final]
+        phi_final = phi
+    else:
+        pT_final = 0
+        phi_final = 0
+    parton.x = float(x[num_steps])
+    parton.y = float(y[num_steps])
+    if extinguished:
+        parton.p_x = 0
+        parton.p_y = 0
+    else:
+        parton.p_x = float(pT[num_steps] * cos_phi)
+        parton.p_y = float(pT[num_steps] * sin_phi)
+
+    # Phase timekeeping
+    step_phase = phase[:num_steps]
+    step_temp = temp[:num_steps]
+    times = {}
+    if phase_roots:
+        # Split each step into phases at isotherm crossings
+        times = {code: [-1, 0] for code in [PHASE_CODES['qgp'], PHASE_CODES['hrg'], PHASE_CODES['unh']]}
+        for i in range(num_steps):
+            for piece_phase, piece_tau, piece_dtau in phase_pieces(
+                    event=event, tau=taus[i], x=x[i], y=y[i], v_x=beta[i] * cos_phi, v_y=beta[i] * sin_phi,
+                    dtau=dtau, temp_hrg=temp_hrg, temp_unh=temp_unh):
+                if PHASE_CODES[piece_phase] in times:
+                    phase_time = times[PHASE_CODES[piece_phase]]
+                    if phase_time[0] == -1:
+                        phase_time[0] = piece_tau
+                    phase_time[1] += piece_dtau
+    else:
+        for code in [PHASE_CODES['qgp'], PHASE_CODES['hrg'], PHASE_CODES['unh']]:
+            in_phase = step_phase == code
+            times[code] = (taus[np.argmax(in_phase)] if np.any(in_phase) else -1, np.sum(in_phase) * dtau)
+    in_qgp = step_phase == PHASE_CODES['qgp']
+    mean_QGP_temp = np.mean(step_temp[in_qgp]) if np.any(in_qgp) else np.nan
+
+    logging.info('Eikonal path complete after {} iterations...'.format(iteration + 1))
+
+    parton_summary = summary_records(
+        {
+            'partonNo': parton.no,
+            'tag': parton.tag,
+            'weight': parton.weight,
+            'id': parton.id,
+            'pt_0': parton.p_T0,
+            'pt_f': pT_final,
+            'q_el': np.sum(q_el[:num_steps]),
+            'q_cel': np.sum(q_cel[:num_steps]),
+            'q_drift': 0,
+            'q_drift_abs': 0,
+            'q_fg_utau': 0,
+            'q_fg_utau_abs': 0,
+            'q_fg_uperp': 0,
+            'q_fg_uperp_abs': 0,
+            'q_fg_utau_qhat': np.sum(q_fg_utau_qhat[:num_steps]),
+            'q_fg_utau_qhat_abs': np.sum(np.abs(q_fg_utau_qhat[:num_steps])),
+            'q_fg_uperp_qhat': np.sum(q_fg_uperp_qhat[:num_steps]),
+            'q_fg_uperp_qhat_abs': np.sum(np.abs(q_fg_uperp_qhat[:num_steps])),
+            'extinguished': extinguished,
+            'x_0': parton.x_0,
+            'y_0': parton.y_0,
+            'phi_0': parton.phi_0,
+            'phi_f': phi_final,
+            't_qgp': times[PHASE_CODES['qgp']][0],
+            't_hrg': times[PHASE_CODES['hrg']][0],
+            't_unhydro': times[PHASE_CODES['unh']][0],
+            'time_total_plasma': times[PHASE_CODES['qgp']][1],
+            'time_total_hrg': times[PHASE_CODES['hrg']][1],
+            'time_total_unhydro': times[PHASE_CODES['unh']][1],
+            'Tmax_parton': np.max(step_temp, initial=0),
+            'Tavg_qgp_parton': mean_QGP_temp,
+            'initial_time': event.t0,
+            'final_time': event.tf,
+            'dtau': config.jet.DTAU,
+            'Tmax_event': np.squeeze(event.max_temp()),
+            'drift': False,
+            'el': el,
+            'cel': cel,
+            'el_num': el_num,
+            'fg': False,
+            'fgqhat': fgqhat,
+            'exit': exit_code,
+            'g': config.constants.G
+        }
+    )
+    if not as_records:
+        parton_summary = pd.DataFrame(parton_summary)
+
+    logging.info('Pandas dataframe generated...')
+
+    return parton_summary
 
-    logging.info('Xarray dataframe generated...')
 
-    return parton_dataframe, parton_xarray
+# Function to propagate one parton through the event under several physics cases at once
+# cases is a list of dicts of time_loop physics flags (drift, el, cel, fg, fgqhat) and the coupling g for each case.
+# Copies of the parton for each case are advanced together by time_loop_batch, sharing medium lookups wherever
+# the cases' paths agree within share_tol, so only diverging cases sample the medium separately.
+# Returns the summary dataframe (or, if as_records, structured records), with one row per case in order, and the list
+# of propagated parton copies.
+def time_loop_cases(event, parton, cases, el_model='GLV', temp_hrg=config.jet.T_HRG,
+                    temp_unh=config.jet.T_UNHYDRO, share_tol=1e-6, as_records=False, phase_roots=None):
+    case_partons = [copy.deepcopy(parton) for case in cases]
+    parton_summary = time_loop_batch(event=event, partons=case_partons,
+                                     drift=[case['drift'] for case in cases],
+                                     el=[case['el'] for case in cases],
+                                     fg=[case['fg'] for case in cases],
+                                     fgqhat=[case['fgqhat'] for case in cases],
+                                     cel=[case['cel'] for case in cases],
+                                     g=[case['g'] for case in cases],
+                                     el_model=el_model, temp_hrg=temp_hrg, temp_unh=temp_unh,
+                                     share_tol=share_tol, as_records=as_records, phase_roots=phase_roots)
+    return parton_summary, case_partons
@@ -1,6 +1,8 @@
 import logging
 import math
 import os
+import pickle
+import shutil
 import subprocess
 import tempfile
 
@@ -138,10 +140,19 @@ def resultsFrameOG():
 
 # Creates a temporary directory and moves to it.
 # Returns tempfile.TemporaryDirectory object.
-def tempDir(location=None):
+def tempDir(location=None, name=None, persistent=False):
+    # Adopt and move to an existing directory, e.g. one made by another process, if name supplied
+    if name is not None:
+        temp_dir = adoptedTempDir(name)
+        logging.info('Adopted temp directory {}'.format(temp_dir.name))
+        os.chdir(temp_dir.name)
+        return temp_dir
     # Get current directory if no location supplied
     if location is None:
         location = os.getcwd()
+    # Create a directory that survives the interpreter exiting, if persistent -- it is only deleted by cleanup()
+    if persistent:
+        return tempDir(name=tempfile.mkdtemp(prefix='JMA_', dir=str(location)))
     # Create and move to temp directory
     temp_dir = tempfile.TemporaryDirectory(prefix='JMA_', dir=str(location))
     logging.info('Created temp directory {}'.format(temp_dir.name))
@@ -150,10 +161,78 @@ def tempDir(location=None):
     return temp_dir
 
 
+# Class for an existing directory taken over as a temp directory, cleaned up like a TemporaryDirectory
+class adoptedTempDir():
+    def __init__(self, name):
+        self.name = name
+
+    def cleanup(self):
+        shutil.rmtree(self.name, ignore_errors=True)
+
+
+# Class to checkpoint the progress of a run as named pickles in a directory, so an interrupted run can resume
+# Each item is saved to its own file, written atomically, so the cost of a save does not grow with the run and a
+# run killed mid-save leaves the previous version of the item intact.
+class checkpoint():
+    # Instantiation statement
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(self.path, exist_ok=True)
+
+    # Method to return the file path of an item
+    def file(self, name):
+        return os.path.join(self.path, '{}.pickle'.format(name))
+
+    # Method to save an item
+    def save(self, name, obj):
+        file_path = self.file(name)
+        with open(file_path + '.tmp', 'wb') as f:
+            pickle.dump(obj, f)
+        os.replace(file_path + '.tmp', file_path)
+
+    # Method to load an item, or return default if there is none
+    def load(self, name, default=None):
+        try:
+            with open(self.file(name), 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return default
+
+    # Method to return the names of the saved items starting with prefix
+    def names(self, prefix=''):
+        return sorted(file[:-len('.pickle')] for file in os.listdir(self.path)
+                      if file.startswith(prefix) and file.endswith('.pickle'))
+
+    # Method to delete the saved items starting with prefix
+    def clear(self, prefix=''):
+        for name in self.names(prefix=prefix):
+            os.remove(self.file(name))
+
+    # Method to delete the checkpoint entirely, e.g. once the run is complete
+    def remove(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+# Function to return an independent random generator for one unit of work
+# The stream is a counter-based Philox generator keyed by the integer seed and keys identifying the work, e.g.
+# (event seed, process number, angle index, case). The same seed and keys always give the same stream, whatever
+# order or process the work is run in, and different keys give statistically independent streams.
+def stream_rng(seed, *keys):
+    seed_seq = np.random.SeedSequence(entropy=int(seed), spawn_key=tuple(int(key) for key in keys))
+    return np.random.Generator(np.random.Philox(seed_seq))
+
+
+# Function to return an integer seed for one unit of work, e.g. for an external generator
+# Drawn from stream_rng for the seed and keys, in [1, high). The default range suits Pythia's Random:seed.
+def stream_seed(seed, *keys, high=900000000):
+    return int(stream_rng(seed, *keys).integers(1, high))
+
+
 # Generate a random (x, y, z) coordinate in a 3D box of l = w = boxSize and h = maxProb
 # Origin at cent of bottom of box.
-def cube_random(num=1, boxSize=1, maxProb=1):
-    rng = np.random.default_rng()
+def cube_random(num=1, boxSize=1, maxProb=1, rng=None):
+    if rng is None:
+        rng = np.random.default_rng()
     pointArray = np.array([])
     for i in np.arange(0, num):
         x = (boxSize * rng.random()) - (boxSize / 2)
@@ -169,17 +248,12 @@ def cube_random(num=1, boxSize=1, maxProb=1):
 
 # Generate a random (x, y) coordinate in a 2D box of w = boxSize and h = maxProb
 # Origin at bottom left of box.
-def random_2d(num=1, boxSize=1.0, maxProb=1.0):
-    rng = np.random.default_rng()
-    pointArray = np.array([])
-    for i in np.arange(0, num):
-        x = boxSize * rng.random()
-        y = maxProb * rng.random()
-        newPoint = np.array([x,y])
-        if i == 0:
-            pointArray = newPoint
-        else:
-            pointArray = np.vstack((pointArray, newPoint))
+def random_2d(num=1, boxSize=1.0, maxProb=1.0, rng=None):
+    if rng is None:
+        rng = np.random.default_rng()
+    pointArray = rng.random((num, 2)) * np.array([boxSize, maxProb])
+    if num == 1:
+        return pointArray[0]
     return pointArray
 
 
@@ -228,3 +302,139 @@ def dtau_avg(func, point, phi, dtau, beta, num_samples=10):
     return value
 
 
+
+
+# Function to generate the sample points used by dtau_avg for many straight steps at once
+# t, x, y, phi, and beta are arrays (or scalars) broadcast against one another.
+# Returns an array of shape (N, num_samples, 3) of (t, x, y) sample points, with the same offsets as dtau_avg.
+def dtau_sample_points(t, x, y, phi, beta, dtau, num_samples=10):
+    t, x, y, phi, beta = np.broadcast_arrays(*[np.atleast_1d(np.asarray(val, dtype=float))
+                                               for val in [t, x, y, phi, beta]])
+    delta_tau = np.concatenate([np.array([0]), np.arange(dtau/num_samples, dtau, dtau/num_samples)])
+    sample_tau = t[:, np.newaxis] + delta_tau
+    sample_x = x[:, np.newaxis] + (beta[:, np.newaxis] * delta_tau * np.cos(phi)[:, np.newaxis])
+    sample_y = y[:, np.newaxis] + (beta[:, np.newaxis] * delta_tau * np.sin(phi)[:, np.newaxis])
+    return np.stack([sample_tau, sample_x, sample_y], axis=-1)
+
+
+# Function to generate quadrature points along many straight steps through a rectilinear (t, x, y) grid
+# Each step is split where it crosses a grid plane, so that each piece lies within one grid cell, and each piece
+# is given 2-point Gauss-Legendre nodes. Within a cell a trilinear interpolant is cubic along a straight line, so the
+# weighted sum of a linearly interpolated field over the points is its exact mean over the step.
+# grid is the tuple of (t, x, y) grid coordinates, e.g. the grid of a RegularGridInterpolator. Pieces shorter than
+# min_frac of the step (e.g. from a step starting on a grid plane up to round-off) are dropped.
+# Returns an array of shape (N, S, 3) of (t, x, y) points, and an array of shape (N, S) of weights summing to one
+# for each step. Unused points are given zero weight.
+def cell_traversal_points(t, x, y, phi, beta, dtau, grid, min_frac=1e-9):
+    t, x, y, phi, beta = np.broadcast_arrays(*[np.atleast_1d(np.asarray(val, dtype=float))
+                                               for val in [t, x, y, phi, beta]])
+    start = np.stack([t, x, y], axis=-1)
+    delta = np.stack([np.full(t.shape, float(dtau)), beta * dtau * np.cos(phi), beta * dtau * np.sin(phi)], axis=-1)
+    end = start + delta
+
+    # Walk the grid planes crossed along each axis, as fractions of the step
+    fracs = [np.zeros((len(t), 1)), np.ones((len(t), 1))]
+    for axis, coords in enumerate(grid):
+        coords = np.asarray(coords, dtype=float)
+        first = np.searchsorted(coords, np.minimum(start[:, axis], end[:, axis]), side='right')
+        last = np.searchsorted(coords, np.maximum(start[:, axis], end[:, axis]), side='left')
+        max_crossings = np.max(last - first, initial=0)
+        if max_crossings == 0:
+            continue
+        index = first[:, np.newaxis] + np.arange(max_crossings)
+        crossed = index < last[:, np.newaxis]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frac = ((coords[np.minimum(index, len(coords) - 1)] - start[:, axis, np.newaxis])
+                    / delta[:, axis, np.newaxis])
+        fracs.append(np.where(crossed, frac, 1))
+    bounds = np.sort(np.concatenate(fracs, axis=1), axis=1)
+
+    # Gauss-Legendre nodes and weights on each piece
+    mid = (bounds[:, 1:] + bounds[:, :-1]) / 2
+    half = (bounds[:, 1:] - bounds[:, :-1]) / 2
+    half = np.where(half > min_frac / 2, half, 0)
+    nodes = np.concatenate([mid - half / np.sqrt(3), mid + half / np.sqrt(3)], axis=1)
+    weights = np.concatenate([half, half], axis=1)
+    weights = weights / np.sum(weights, axis=1, keepdims=True)
+
+    points = start[:, np.newaxis, :] + nodes[..., np.newaxis] * delta[:, np.newaxis, :]
+    return points, weights
+
+
+# Function to find rows of an array which agree within a tolerance
+# Rows are binned on a grid of spacing tol in each column, so rows sharing a bin differ by less than tol.
+# Returns the indices of one representative row per bin, and the index of each row's representative in that list.
+def unique_rows(values, tol):
+    keys = np.round(np.asarray(values, dtype=float) / tol)
+    keys, unique, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    return unique, np.reshape(inverse, -1)
+
+
+# Function to return the name of the available Parquet engine for pandas, if any, preferring fastparquet
+def parquet_engine():
+    try:
+        import fastparquet
+        return 'fastparquet'
+    except ImportError:
+        pass
+    try:
+        import pyarrow
+        return 'pyarrow'
+    except ImportError:
+        return None
+
+
+# Class to write a results dataframe incrementally, one block of rows (e.g. one event) at a time
+# Each block is cast to a fixed schema, set by the first block -- floats are stored as float32, integers as int64,
+# booleans as bool, and anything else as strings -- so that the cost of a write depends only on the size of the block.
+# Blocks are written as part files of a <path>/<name>.parquet dataset directory, read back whole by pandas.read_parquet.
+# Without a Parquet engine, each block is pickled to its own <path>/<name>_<part>.pickle file.
+# Part files are numbered by the writer's count of blocks, so a writer restored from a checkpoint overwrites, rather
+# than duplicates, any blocks written after the checkpoint was saved.
+class results_writer():
+    # Instantiation statement
+    def __init__(self, path, name):
+        self.path = path
+        self.name = name
+        self.engine = parquet_engine()
+        self.schema = None
+        self.parts = 0
+        self.rows = 0
+        if self.engine is None:
+            logging.warning('No Parquet engine found -- writing results blocks to separate pickles')
+
+    # Method to cast a block of rows to the fixed schema, setting the schema from the first block
+    # Later blocks must have the same columns as the first, in any order.
+    def cast(self, df):
+        if self.schema is None:
+            self.schema = {}
+            for column, dtype in df.dtypes.items():
+                if pd.api.types.is_bool_dtype(dtype):
+                    self.schema[column] = 'bool'
+                elif pd.api.types.is_float_dtype(dtype):
+                    self.schema[column] = 'float32'
+                elif pd.api.types.is_integer_dtype(dtype):
+                    self.schema[column] = 'int64'
+                else:
+                    self.schema[column] = 'str'
+        missing = [column for column in self.schema if column not in df.columns]
+        extra = [column for column in df.columns if column not in self.schema]
+        if missing or extra:
+            raise ValueError('Block for {} does not match its results schema -- missing columns {}, unexpected '
+                             'columns {}'.format(self.name, missing, extra))
+        return df.reset_index(drop=True)[list(self.schema)].astype(self.schema)
+
+    # Method to append a block of rows to the results
+    def append(self, df):
+        if df is None or len(df) == 0:
+            return
+        df = self.cast(df)
+        if self.engine is not None:
+            file_path = os.path.join(self.path, '{}.parquet'.format(self.name))
+            os.makedirs(file_path, exist_ok=True)
+            df.to_parquet(os.path.join(file_path, 'part_{:05d}.parquet'.format(self.parts)), engine=self.engine,
+                          index=False)
+        else:
+            df.to_pickle(os.path.join(self.path, '{}_{}.pickle'.format(self.name, self.parts)))
+        self.parts += 1
+        self.rows += len(df)